@@ -9,7 +9,9 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 from routers import documents, chat, connectors, settings, auth, conversations, models, api_keys, files
-from services.vector_store import VectorStoreService
+from dependencies import get_vector_store, get_async_vector_store, get_ingestion_jobs, get_conversation_service
+from services.http_clients import get_http_clients
+from services.document_processor import start_pdf_pool, shutdown_pdf_pool
 from middleware.error_handler import register_exception_handlers
 from logging_config import setup_logging
 from config import get_settings
@@ -24,13 +26,38 @@ async def lifespan(app: FastAPI):
     logger = setup_logging(level="INFO")
     logger.info("Application starting up", extra={"version": "1.0.0"})
     
-    # Startup: Initialize vector store
-    app.state.vector_store = VectorStoreService()
+    # Startup: Initialize vector store (the same instance the routers use)
+    app.state.vector_store = get_vector_store()
     logger.info("Vector store initialized")
+
+    # Shared keep-alive HTTP clients for LLM providers
+    http_clients = get_http_clients()
+
+    # Worker processes for page-parallel PDF extraction
+    settings = get_settings()
+    start_pdf_pool(settings.pdf_extract_workers)
+
+    # Start background ingestion workers (resumes jobs interrupted by a restart)
+    ingestion_jobs = get_ingestion_jobs()
+    await ingestion_jobs.start()
+
+    # Chat messages are buffered and written in batches off the request path
+    conversation_service = get_conversation_service()
+    if settings.conversation_write_behind:
+        conversation_service.start_write_behind(
+            settings.conversation_flush_interval_ms, settings.conversation_flush_max_batch
+        )
     
     yield
     
     # Shutdown: Cleanup if needed
+    await ingestion_jobs.stop()
+    # Stops the embedding and search thread pools
+    get_async_vector_store().shutdown()
+    shutdown_pdf_pool()
+    await http_clients.aclose()
+    # Drains the write-behind buffer before closing connections
+    conversation_service.close()
     logger.info("Application shutting down")
 
 app = FastAPI(
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import Dict, Literal
 
 class Settings(BaseSettings):
     # LLM Settings
@@ -13,16 +14,88 @@ class Settings(BaseSettings):
     openrouter_frequency_penalty: float = 0.2
     openrouter_presence_penalty: float = 0.0
     openrouter_repetition_penalty: float = 1.1
+    # Pooled HTTP clients for LLM providers
+    llm_http_max_connections: int = 20
+    llm_http_max_keepalive: int = 10
+    llm_http_keepalive_expiry: float = 30.0
+    llm_http_connect_timeout: float = 5.0
+    llm_http_read_timeout: float = 120.0
+    # Worker processes serving the app (gunicorn's default -w); the local
+    # llama.cpp server's slots are divided between them
+    web_concurrency: int = 1
+    # llama.cpp prompt (KV) cache reuse for the local provider: stable-first
+    # prompt layout and cache_prompt
+    llama_prompt_cache: bool = True
+    # Pin each conversation to one llama.cpp slot (id_slot); needs --parallel
+    # set to the local max_concurrency
+    llama_slot_pinning: bool = False
     
     # Vector DB
+    vector_backend: Literal["chroma", "numpy"] = "chroma"
     chroma_persist_dir: str = "../vectorstore/chroma"
+    # In-process flat index (vector_backend="numpy"); float16 halves memory
+    numpy_index_dir: str = "../vectorstore/flat"
+    numpy_index_dtype: Literal["float32", "float16"] = "float32"
     
     # Embedding model
     embedding_model: str = "all-MiniLM-L6-v2"
+    # Query embedding micro-batching
+    embedding_batch_max_size: int = 32
+    embedding_batch_wait_ms: float = 5.0
+    # Thread pools for off-loop vector search and ingestion
+    vector_query_workers: int = 4
+    vector_ingest_workers: int = 1
+    # Background ingestion jobs
+    ingestion_db_path: str = "../vectorstore/ingestion_jobs.db"
+    ingestion_workers: int = 2
+    ingestion_embed_batch_size: int = 64
+    # A running job whose process stops renewing its claim for this long is taken over
+    ingestion_job_lease_seconds: float = 60.0
+    # Persistent embedding cache (stored next to chroma_persist_dir)
+    embedding_cache_enabled: bool = True
+    embedding_cache_memory_items: int = 10000
+    embedding_cache_max_mb: int = 512
+    # Retrieval: "vector" or "hybrid" (BM25 + vector, fused by reciprocal rank)
+    retrieval_mode: Literal["vector", "hybrid"] = "hybrid"
+    hybrid_candidates: int = 20
+    # Semantic answer cache for repeated questions
+    answer_cache_enabled: bool = True
+    answer_cache_threshold: float = 0.95
+    answer_cache_ttl_seconds: int = 3600
+    answer_cache_max_entries: int = 1000
+    # Exact-match LLM completion cache (stored next to chroma_persist_dir);
+    # temperature > 0 requests bypass it unless completion_cache_sampled is set
+    completion_cache_enabled: bool = True
+    completion_cache_ttl_seconds: int = 86400
+    completion_cache_max_entries: int = 10000
+    completion_cache_max_mb: int = 64
+    completion_cache_sampled: bool = False
+    # Chat WebSocket: send a token frame every N ms or M buffered characters (0 ms = per token)
+    ws_token_flush_ms: float = 40.0
+    ws_token_flush_chars: int = 64
+    # Identical chat questions asked at the same time share one retrieval and generation
+    chat_coalesce_requests: bool = True
+    # Chat message write-behind: flush after this many ms or this many buffered messages
+    conversation_write_behind: bool = True
+    conversation_flush_interval_ms: int = 50
+    conversation_flush_max_batch: int = 100
     
     # Chunking settings
     chunk_size: int = 500
     chunk_overlap: int = 50
+    # Worker processes for page-parallel PDF extraction (1 = in-process)
+    pdf_extract_workers: int = 4
+    
+    # Per-tool deadline for external data in chat (seconds); tool_timeouts overrides
+    # individual tools, e.g. TOOL_TIMEOUTS='{"gmail": 10}'
+    tool_timeout_seconds: float = 5.0
+    tool_timeouts: Dict[str, float] = {}
+    # Tool result cache: per-tool TTL (seconds) and how long past it stale results may be served
+    tool_cache_ttls: Dict[str, float] = {"crypto": 60, "weather": 600, "hackernews": 300, "github": 300}
+    tool_cache_stale_seconds: float = 300.0
+    # Hacker News: concurrent item requests and how long item payloads are reused
+    hackernews_fanout: int = 5
+    hackernews_item_ttl_seconds: float = 300.0
     
     # API Keys (loaded from .env)
     github_token: str = ""
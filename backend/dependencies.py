@@ -6,8 +6,14 @@ Using FastAPI's dependency injection system improves testability and maintainabi
 """
 
 from functools import lru_cache
+from pathlib import Path
+from typing import Optional
 from services.llm_service import LLMService
 from services.vector_store import VectorStoreService
+from services.async_vector_store import AsyncVectorStore
+from services.ingestion_jobs import IngestionJobService
+from services.answer_cache import SemanticAnswerCache
+from services.completion_cache import CompletionCache
 from services.conversation_service import ConversationService
 from services.api_tools import APIToolsService
 from services.config_service import get_config_service, ConfigService
@@ -15,6 +21,29 @@ from services.model_manager import get_model_manager, ModelManager
 from config import get_settings
 
 
+@lru_cache()
+def get_completion_cache() -> Optional[CompletionCache]:
+    """
+    Dependency for the exact-match LLM completion cache.
+
+    Returns a cached CompletionCache stored next to the Chroma directory,
+    or None when disabled.
+
+    Returns:
+        Optional[CompletionCache]: Singleton completion cache, or None
+    """
+    settings = get_settings()
+    if not settings.completion_cache_enabled:
+        return None
+    return CompletionCache(
+        str(Path(settings.chroma_persist_dir).parent / "completion_cache.db"),
+        ttl_seconds=settings.completion_cache_ttl_seconds,
+        max_entries=settings.completion_cache_max_entries,
+        max_mb=settings.completion_cache_max_mb,
+        cache_sampled=settings.completion_cache_sampled,
+    )
+
+
 @lru_cache()
 def get_llm_service() -> LLMService:
     """
@@ -26,7 +55,7 @@ def get_llm_service() -> LLMService:
     Returns:
         LLMService: Singleton instance of the LLM service
     """
-    return LLMService()
+    return LLMService(completion_cache=get_completion_cache())
 
 
 @lru_cache()
@@ -42,6 +71,65 @@ def get_vector_store() -> VectorStoreService:
     return VectorStoreService()
 
 
+@lru_cache()
+def get_async_vector_store() -> AsyncVectorStore:
+    """
+    Dependency for the async vector store facade.
+
+    Wraps the shared vector store so embedding and Chroma calls run on
+    dedicated thread pools instead of the event loop. The pools are shut
+    down in the application lifespan.
+
+    Returns:
+        AsyncVectorStore: Singleton async facade over the vector store
+    """
+    return AsyncVectorStore(get_vector_store())
+
+
+@lru_cache()
+def get_ingestion_jobs() -> IngestionJobService:
+    """
+    Dependency for the background ingestion job service.
+
+    Returns a cached IngestionJobService backed by the shared async vector store.
+    Its workers are started and stopped in the application lifespan.
+
+    Returns:
+        IngestionJobService: Singleton instance of the ingestion job service
+    """
+    settings = get_settings()
+    return IngestionJobService(
+        settings.ingestion_db_path,
+        get_async_vector_store(),
+        workers=settings.ingestion_workers,
+        embed_batch_size=settings.ingestion_embed_batch_size,
+        lease_seconds=settings.ingestion_job_lease_seconds,
+    )
+
+
+@lru_cache()
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """
+    Dependency for the semantic answer cache.
+
+    Returns a cached SemanticAnswerCache that is invalidated whenever the
+    shared vector store adds or deletes a document, or None when disabled.
+
+    Returns:
+        Optional[SemanticAnswerCache]: Singleton answer cache, or None
+    """
+    settings = get_settings()
+    if not settings.answer_cache_enabled:
+        return None
+    cache = SemanticAnswerCache(
+        threshold=settings.answer_cache_threshold,
+        ttl_seconds=settings.answer_cache_ttl_seconds,
+        max_entries=settings.answer_cache_max_entries,
+    )
+    get_async_vector_store().on_document_changed(cache.invalidate_document)
+    return cache
+
+
 @lru_cache()
 def get_conversation_service() -> ConversationService:
     """
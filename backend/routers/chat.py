@@ -1,21 +1,51 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request, Depends
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, List, Tuple
+import asyncio
+import functools
+import hashlib
 import json
+import uuid
 
 from services.llm_service import LLMService
 from services.api_tools import APIToolsService
 from services.conversation_service import ConversationService
-from services.vector_store import VectorStoreService
+from services.async_vector_store import AsyncVectorStore
+from services.answer_cache import SemanticAnswerCache
+from services.completion_cache import CompletionCache
+from services.chat_stream import ClientWatcher, FrameSender, TokenCoalescer, generation_stats
+from services.llm_limiter import get_llm_limiters
+from services.llm_router import get_llm_router
+from services.llama_slots import get_llama_slots
+from services.singleflight import Broadcast, SingleFlight
+from config import get_settings
 from dependencies import (
     get_llm_service,
     get_api_tools,
     get_conversation_service,
-    get_vector_store
+    get_async_vector_store,
+    get_answer_cache,
+    get_completion_cache,
 )
 
 router = APIRouter()
 
+# In-flight streamed answers, shared by identical concurrent questions
+answer_flights = SingleFlight()
+
+SYSTEM_PROMPT = (
+    "You are an AI assistant with access to documents and external data. "
+    "When 'External Data' is provided, treat it as fresh, authoritative information (e.g., Hacker News, Weather, Crypto). "
+    "Incorporate it directly into your answer and do not claim lack of internet access—use the data given. "
+    "Provide accurate, helpful answers based on the context provided.\n\n"
+    "FILE GENERATION:\n"
+    "If the user asks to generate a file (PDF, Markdown, HTML, CV, Report, Plan, etc.), you MUST wrap the content "
+    "in a special block like this:\n"
+    "<file-artifact filename=\"proposed_filename.pdf\" title=\"Document Title\" format=\"pdf\">\n"
+    "... content of the file (markdown supported) ...\n"
+    "</file-artifact>\n"
+    "Do not just output the text, use this tag so the user can download it."
+)
 
 class ChatRequest(BaseModel):
     message: str
@@ -24,71 +54,71 @@ class ChatRequest(BaseModel):
     tools: Optional[List[str]] = None  # e.g., ["github", "crypto", "weather"]
     tool_params: Optional[dict] = None
     conversation_id: Optional[str] = None  # Track conversation for history
+    temperature: Optional[float] = None  # 0 for repeatable answers (served from the completion cache)
 
 @router.post("/query")
 async def chat_query(
     chat_request: ChatRequest,
     llm_service: LLMService = Depends(get_llm_service),
-    vector_store: VectorStoreService = Depends(get_vector_store),
+    vector_store: AsyncVectorStore = Depends(get_async_vector_store),
     conversation_service: ConversationService = Depends(get_conversation_service),
-    api_tools: APIToolsService = Depends(get_api_tools)
+    api_tools: APIToolsService = Depends(get_api_tools),
+    answer_cache: Optional[SemanticAnswerCache] = Depends(get_answer_cache)
 ):
     """Non-streaming chat endpoint"""
     # Get or create conversation ID
     conv_id = chat_request.conversation_id or conversation_service.create_conversation()
 
-    # Retrieve conversation history
-    history = conversation_service.get_history(conv_id, limit=10)
+    # Answers that use live tool data are never cached
+    use_cache = answer_cache is not None and not chat_request.tools
+    sampling = {} if chat_request.temperature is None else {"temperature": chat_request.temperature}
+
+    # History, retrieval and tool calls are independent, so run them concurrently
+    history, (query_embedding, context_chunks), api_data = await asyncio.gather(
+        asyncio.to_thread(conversation_service.get_history, conv_id, limit=10),
+        _retrieve_context(
+            vector_store,
+            chat_request.message,
+            chat_request.use_documents,
+            chat_request.selected_documents,
+            embed=use_cache
+        ),
+        _fetch_tool_data(chat_request.tools or [], chat_request.tool_params or {}, api_tools)
+    )
 
     # Save user message
     conversation_service.add_message(conv_id, "user", chat_request.message)
 
-    # Retrieve relevant context
-    context_chunks = []
-    if chat_request.use_documents:
-        context_chunks = vector_store.search(
-            chat_request.message, 
-            n_results=5,
-            file_filters=chat_request.selected_documents
-        )
-
-    # Fetch external API data if requested
-    api_data = {}
-    if chat_request.tools:
-        api_data = await _fetch_tool_data(
-            chat_request.tools,
-            chat_request.tool_params or {},
-            api_tools
-        )
+    cache_key = None
+    if use_cache:
+        cache_key = answer_cache.context_key(context_chunks, llm_service.generation_params(**sampling), history)
+        cached = answer_cache.lookup(query_embedding, cache_key)
+        if cached:
+            conversation_service.add_message(conv_id, "assistant", cached["response"])
+            return {
+                "response": cached["response"],
+                "sources": _sources(context_chunks),
+                "api_data_used": [],
+                "conversation_id": conv_id,
+                "cached": True,
+            }
 
     # Build RAG prompt with history
     prompt = llm_service.build_rag_prompt(
-        chat_request.message, context_chunks, api_data if api_data else None, history
+        chat_request.message, context_chunks, api_data if api_data else None, history, SYSTEM_PROMPT
     )
 
     # Generate response
-    system_prompt = (
-        "You are an AI assistant with access to documents and external data. "
-        "When 'External Data' is provided, treat it as fresh, authoritative information (e.g., Hacker News, Weather, Crypto). "
-        "Incorporate it directly into your answer and do not claim lack of internet access—use the data given. "
-        "Provide accurate, helpful answers based on the context provided.\n\n"
-        "FILE GENERATION:\n"
-        "If the user asks to generate a file (PDF, Markdown, HTML, CV, Report, Plan, etc.), you MUST wrap the content "
-        "in a special block like this:\n"
-        "<file-artifact filename=\"proposed_filename.pdf\" title=\"Document Title\" format=\"pdf\">\n"
-        "... content of the file (markdown supported) ...\n"
-        "</file-artifact>\n"
-        "Do not just output the text, use this tag so the user can download it."
-    )
-
-    response = await llm_service.generate(prompt, system_prompt)
+    response = await llm_service.generate(prompt, SYSTEM_PROMPT, conversation_id=conv_id, **sampling)
 
     # Save assistant response
     conversation_service.add_message(conv_id, "assistant", response)
+    if cache_key is not None and _is_cacheable(response):
+        answer_cache.store(query_embedding, cache_key, response, _sources(context_chunks))
 
     return {
         "response": response,
-        "sources": [c["metadata"]["filename"] for c in context_chunks],
+        "sources": _sources(context_chunks),
         "api_data_used": list(api_data.keys()) if api_data else [],
         "conversation_id": conv_id,
     }
@@ -97,18 +127,25 @@ async def chat_query(
 async def websocket_chat(
     websocket: WebSocket,
     llm_service: LLMService = Depends(get_llm_service),
-    vector_store: VectorStoreService = Depends(get_vector_store),
+    vector_store: AsyncVectorStore = Depends(get_async_vector_store),
     conversation_service: ConversationService = Depends(get_conversation_service),
-    api_tools: APIToolsService = Depends(get_api_tools)
+    api_tools: APIToolsService = Depends(get_api_tools),
+    answer_cache: Optional[SemanticAnswerCache] = Depends(get_answer_cache)
 ):
     """WebSocket endpoint for streaming chat"""
     await websocket.accept()
+    settings = get_settings()
+    frames = FrameSender(websocket)
+    # Reads one message ahead so a cancel or disconnect can stop generation
+    client = ClientWatcher(websocket)
 
     try:
         while True:
             # Receive message
-            data = await websocket.receive_text()
+            data = await client.receive()
             message_data = json.loads(data)
+            if message_data.get("type") == "cancel":
+                continue  # Arrived after the answer finished; nothing to stop
 
             user_message = message_data.get("message", "")
             use_documents = message_data.get("use_documents", True)
@@ -118,131 +155,376 @@ async def websocket_chat(
             conv_id = message_data.get("conversation_id")
 
             # Get or create conversation
+            continued = bool(conv_id)
             if not conv_id:
                 conv_id = conversation_service.create_conversation()
+            # Read alongside retrieval and tool calls; the user message is saved once it's read
+            history = asyncio.ensure_future(
+                asyncio.to_thread(conversation_service.get_history, conv_id, limit=10)
+            )
 
-            # Get conversation history
-            history = conversation_service.get_history(conv_id, limit=10)
+            # Identical questions asked while one is being answered share its
+            # retrieval, tool calls and generation; each client gets the same
+            # stream and keeps its own conversation
+            produce = functools.partial(
+                _produce_answer,
+                llm_service,
+                vector_store,
+                api_tools,
+                answer_cache,
+                user_message,
+                use_documents,
+                selected_documents,
+                tools,
+                tool_params,
+                history,
+                conv_id,
+            )
+            if settings.chat_coalesce_requests:
+                key = _flight_key(
+                    user_message, use_documents, selected_documents, tools, tool_params,
+                    llm_service.generation_params(), conv_id if continued else None,
+                )
+            else:
+                key = uuid.uuid4().hex  # Every request answered on its own
+            subscription = answer_flights.join(key, produce)
+
+            # Relay the answer, coalescing tokens into fewer frames
+            tokens = TokenCoalescer(frames, settings.ws_token_flush_ms, settings.ws_token_flush_chars)
+            relay = _AnswerRelay(frames, tokens)
+            generation_stopped = False
+            try:
+                await history
+                # Save user message
+                conversation_service.add_message(conv_id, "user", user_message)
+                completed = await client.run(relay.run(subscription.events()))
+                if not client.disconnected:
+                    await tokens.flush()
+            finally:
+                tokens.cancel()
+                generation_stopped = await subscription.leave()
+            full_response = tokens.text()
+
+            if not completed:
+                # Stopped by the client: keep what was generated. A shared answer
+                # keeps generating for the others, so only the last to leave stops it.
+                if generation_stopped:
+                    generation_stats.record_stopped(tokens.count, client.disconnected)
+                if full_response:
+                    conversation_service.add_message(conv_id, "assistant", full_response)
+                if not client.disconnected:
+                    await frames.send(
+                        {
+                            "type": "end",
+                            "sources": relay.sources,
+                            "conversation_id": conv_id,
+                            "cancelled": True,
+                        }
+                    )
+                continue
 
-            # Save user message
-            conversation_service.add_message(conv_id, "user", user_message)
+            # Save assistant response
+            if not relay.cached:
+                generation_stats.record_completed(tokens.count)
+            conversation_service.add_message(conv_id, "assistant", full_response)
 
-            # Retrieve context
-            context_chunks = []
-            if use_documents:
-                context_chunks = vector_store.search(
-                    user_message, 
-                    n_results=5,
-                    file_filters=selected_documents
-                )
+            # Send completion signal with sources and conversation ID
+            end = {"type": "end", "sources": relay.sources, "conversation_id": conv_id}
+            if relay.cached:
+                end["cached"] = True
+            await frames.send(end)
+    except WebSocketDisconnect:
+        print(f"Client disconnected ({frames.frames_sent} frames, {frames.bytes_sent} bytes sent)")
+    finally:
+        client.close()
+        frames.close()
+
+
+def _flight_key(
+    message: str,
+    use_documents: bool,
+    selected_documents: Optional[List[str]],
+    tools: Optional[List[str]],
+    tool_params: Optional[dict],
+    generation_params: dict,
+    conversation_id: Optional[str],
+) -> str:
+    """Requests with the same key get the same answer and can share one generation.
+
+    The message is compared case- and whitespace-insensitively. The answer
+    depends on the history, so a question that continues a conversation
+    (conversation_id set) is only shared within that conversation; questions
+    that open one have no history and are shared across conversations.
+    """
+    key = {
+        "message": " ".join(message.lower().split()),
+        "use_documents": use_documents,
+        "selected_documents": sorted(selected_documents) if selected_documents else None,
+        "tools": sorted(set(tools or [])),
+        "tool_params": tool_params or {},
+        "generation": generation_params,
+        "conversation": conversation_id,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+async def _produce_answer(
+    llm_service: LLMService,
+    vector_store: AsyncVectorStore,
+    api_tools: APIToolsService,
+    answer_cache: Optional[SemanticAnswerCache],
+    user_message: str,
+    use_documents: bool,
+    selected_documents: Optional[List[str]],
+    tools: Optional[List[str]],
+    tool_params: Optional[dict],
+    history: Awaitable[List[dict]],
+    conversation_id: str,
+    channel: Broadcast,
+):
+    """Retrieve context, call tools and generate one answer, publishing it to every subscriber.
 
-            # Fetch API data
-            api_data = {}
-            if tools:
-                api_data = await _fetch_tool_data(tools, tool_params, api_tools)
-                # Send API data first
-                await websocket.send_json({"type": "api_data", "data": api_data})
+    Events are ("frame", payload) to send as-is, ("sources", filenames),
+    ("token", text) and ("cached", answer) for an answer cache hit.
+    """
+    # Answers that use live tool data are never cached
+    use_cache = answer_cache is not None and not tools
+
+    # History, retrieval and tool calls are independent, so run them concurrently.
+    # Tools that stream items (Hacker News) send them as partial api_data frames meanwhile.
+    partial_frames = _PartialToolFrames(channel)
+    history, (query_embedding, context_chunks), api_data = await asyncio.gather(
+        history,
+        _retrieve_context(
+            vector_store, user_message, use_documents, selected_documents, embed=use_cache
+        ),
+        _fetch_tool_data(tools or [], tool_params or {}, api_tools, partial_frames.send)
+    )
+    partial_frames.close()
+    channel.publish(("sources", _sources(context_chunks)))
+
+    if tools:
+        # Send API data first
+        channel.publish(("frame", {"type": "api_data", "data": api_data}))
+
+    cache_key = None
+    if use_cache:
+        cache_key = answer_cache.context_key(context_chunks, llm_service.generation_params(), history)
+        cached = answer_cache.lookup(query_embedding, cache_key)
+        if cached:
+            channel.publish(("frame", {"type": "start"}))
+            channel.publish(("cached", cached["response"]))
+            return
+
+    # Build prompt with history
+    prompt = llm_service.build_rag_prompt(
+        user_message, context_chunks, api_data if api_data else None, history, SYSTEM_PROMPT
+    )
 
-            # Build prompt with history
-            prompt = llm_service.build_rag_prompt(
-                user_message, context_chunks, api_data if api_data else None, history
-            )
+    channel.publish(("frame", {"type": "start"}))
+    # A shared answer runs on the first asker's llama.cpp slot; the history is the same for all
+    stream = llm_service.generate_stream(
+        prompt,
+        SYSTEM_PROMPT,
+        on_queued=functools.partial(_publish_queued, channel),
+        conversation_id=conversation_id,
+    )
+    parts = []
+    try:
+        async for token in stream:
+            parts.append(token)
+            channel.publish(("token", token))
+    finally:
+        # Closing the generator drops the upstream connection when every client has left
+        await stream.aclose()
+
+    response = "".join(parts)
+    if cache_key is not None and _is_cacheable(response):
+        answer_cache.store(query_embedding, cache_key, response, _sources(context_chunks))
+
+
+class _AnswerRelay:
+    """Sends the events of a shared answer to one client's WebSocket"""
+
+    def __init__(self, frames: FrameSender, tokens: TokenCoalescer):
+        self.frames = frames
+        self.tokens = tokens
+        self.sources: List[str] = []
+        self.cached = False
+
+    async def run(self, events: AsyncIterator[Tuple[str, Any]]):
+        async for kind, value in events:
+            if kind == "frame":
+                await self.tokens.flush()
+                await self.frames.send(value)
+            elif kind == "sources":
+                self.sources = value
+            elif kind == "token":
+                await self.tokens.add(value)
+            elif kind == "cached":
+                # Replay the cached answer as a single token frame
+                self.cached = True
+                await self.tokens.add(value)
+                await self.tokens.flush()
+
+
+async def _publish_queued(channel: Broadcast, position: int, estimated_wait_ms: Optional[float]):
+    """Tell the clients their request is waiting for an LLM slot"""
+    channel.publish(("frame", {"type": "queued", "position": position, "estimated_wait_ms": estimated_wait_ms}))
+
+
+def _sources(context_chunks: List[dict]) -> List[str]:
+    return [c["metadata"]["filename"] for c in context_chunks]
+
+
+def _is_cacheable(response: str) -> bool:
+    """Empty answers and provider errors (returned as JSON by LLMService.generate) are not cached"""
+    return bool(response.strip()) and not response.startswith('{"error"')
+
+
+async def _retrieve_context(
+    vector_store: AsyncVectorStore,
+    message: str,
+    use_documents: bool,
+    selected_documents: Optional[List[str]],
+    embed: bool = False
+) -> Tuple[Optional[List[float]], List[dict]]:
+    """Embed the message (when searching or when embed is set) and retrieve document chunks"""
+    if not (use_documents or embed):
+        return None, []
+
+    query_embedding = await vector_store.embed_query(message)
+    context_chunks = []
+    if use_documents:
+        context_chunks = await vector_store.search(
+            message,
+            n_results=5,
+            file_filters=selected_documents,
+            query_embedding=query_embedding
+        )
+    return query_embedding, context_chunks
 
-            system_prompt = (
-                "You are an AI assistant with access to documents and external data. "
-                "When 'External Data' is provided, treat it as fresh, authoritative information (e.g., Hacker News, Weather, Crypto). "
-                "Incorporate it directly into your answer and do not claim lack of internet access—use the data given. "
-                "Provide accurate, helpful answers based on the context provided.\n\n"
-                "FILE GENERATION:\n"
-                "If the user asks to generate a file (PDF, Markdown, HTML, CV, Report, Plan, etc.), you MUST wrap the content "
-                "in a special block like this:\n"
-                "<file-artifact filename=\"proposed_filename.pdf\" title=\"Document Title\" format=\"pdf\">\n"
-                "... content of the file (markdown supported) ...\n"
-                "</file-artifact>\n"
-                "Do not just output the text, use this tag so the user can download it."
-            )
 
-            # Stream response
-            await websocket.send_json({"type": "start"})
+class _PartialToolFrames:
+    """Forwards items streamed by a tool to the clients as partial api_data frames.
 
-            full_response = ""
-            async for token in llm_service.generate_stream(prompt, system_prompt):
-                full_response += token
-                await websocket.send_json({"type": "token", "content": token})
+    Closed once the full api_data frame is sent, so a background refresh that
+    outlives the turn can't write into a later one.
+    """
 
-            # Save assistant response
-            conversation_service.add_message(conv_id, "assistant", full_response)
+    def __init__(self, channel: Broadcast):
+        self.channel = channel
+        self.open = True
 
-            # Send completion signal with sources and conversation ID
-            await websocket.send_json(
-                {
-                    "type": "end",
-                    "sources": [c["metadata"]["filename"] for c in context_chunks],
-                    "conversation_id": conv_id,
-                }
-            )
+    async def send(self, tool: str, rank: int, item: dict):
+        if not self.open:
+            return
+        self.channel.publish(
+            ("frame", {"type": "api_data", "partial": True, "tool": tool, "rank": rank, "data": item})
+        )
 
-    except WebSocketDisconnect:
-        print("Client disconnected")
+    def close(self):
+        self.open = False
+
+
+def _tool_call(
+    tool: str,
+    params: dict,
+    api_tools: APIToolsService,
+    on_partial: Optional[Callable[[str, int, dict], Awaitable[None]]] = None
+):
+    """Return the coroutine fetching data for a tool, or None for unknown tools"""
+    if tool == "github":
+        return api_tools.github_search_commits(params.get("github_repo", "facebook/react"))
+    if tool == "crypto":
+        return api_tools.get_crypto_price(params.get("crypto_symbol", "bitcoin"))
+    if tool == "weather":
+        return api_tools.get_weather(params.get("weather_city", "London"))
+    if tool == "hackernews":
+        if on_partial is not None:
+            return api_tools.get_hacker_news_top(on_story=functools.partial(on_partial, "hackernews"))
+        return api_tools.get_hacker_news_top()
+    if tool == "drive":
+        return api_tools.drive_search(params.get("drive_query", ""))
+    if tool == "slack":
+        return api_tools.slack_search_messages(params.get("slack_query", ""))
+    if tool == "gmail":
+        return api_tools.gmail_search(params.get("gmail_query", ""))
+    if tool == "notion":
+        return api_tools.notion_search(params.get("notion_query", ""))
+    return None
 
 
 async def _fetch_tool_data(
     tools: List[str],
     params: dict,
-    api_tools: APIToolsService
+    api_tools: APIToolsService,
+    on_partial: Optional[Callable[[str, int, dict], Awaitable[None]]] = None
 ) -> dict:
-    """Fetch data from requested tools"""
-    data = {}
+    """Fetch data from requested tools concurrently.
+
+    Each tool has its own deadline; a tool that fails or times out contributes
+    an error entry instead of holding up the others. Tools that stream items
+    pass each one to on_partial(tool, rank, item) as it arrives.
+    """
+    settings = get_settings()
 
-    for tool in tools:
+    async def fetch(tool: str):
+        timeout = settings.tool_timeouts.get(tool, settings.tool_timeout_seconds)
         try:
-            if tool == "github":
-                repo = params.get("github_repo", "facebook/react")
-                data["github"] = await api_tools.github_search_commits(repo)
-            elif tool == "crypto":
-                symbol = params.get("crypto_symbol", "bitcoin")
-                data["crypto"] = await api_tools.get_crypto_price(symbol)
-            elif tool == "weather":
-                city = params.get("weather_city", "London")
-                data["weather"] = await api_tools.get_weather(city)
-            elif tool == "hackernews":
-                data["hackernews"] = await api_tools.get_hacker_news_top()
-            elif tool == "drive":
-                q = params.get("drive_query", "")
-                data["drive"] = await api_tools.drive_search(q)
-            elif tool == "slack":
-                q = params.get("slack_query", "")
-                data["slack"] = await api_tools.slack_search_messages(q)
-            elif tool == "gmail":
-                q = params.get("gmail_query", "")
-                data["gmail"] = await api_tools.gmail_search(q)
-            elif tool == "notion":
-                q = params.get("notion_query", "")
-                data["notion"] = await api_tools.notion_search(q)
+            call = _tool_call(tool, params, api_tools, on_partial)
+            return await asyncio.wait_for(call, timeout) if call is not None else None
+        except asyncio.TimeoutError:
+            return {"error": f"Timed out after {timeout:g}s"}
         except Exception as e:
-            data[tool] = {"error": str(e)}
+            return {"error": str(e)}
+
+    tools = list(dict.fromkeys(tools))
+    results = await asyncio.gather(*(fetch(tool) for tool in tools))
+    return {tool: result for tool, result in zip(tools, results) if result is not None}
+
 
-    return data
+@router.get("/stats")
+async def chat_stats(
+    answer_cache: Optional[SemanticAnswerCache] = Depends(get_answer_cache),
+    completion_cache: Optional[CompletionCache] = Depends(get_completion_cache),
+    api_tools: APIToolsService = Depends(get_api_tools),
+):
+    """Cache, WebSocket frame, generation, request coalescing, LLM limiter, provider health and llama.cpp prompt cache counters"""
+    return {
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "completion_cache": completion_cache.stats() if completion_cache is not None else None,
+        "tool_cache": api_tools.cache.stats(),
+        "websocket": FrameSender.summary(),
+        "generation": generation_stats.stats(),
+        "llm_limits": get_llm_limiters().stats(),
+        "llm_routing": get_llm_router().stats(),
+        "coalescing": answer_flights.stats(),
+        "llama_prompt_cache": get_llama_slots().stats(),
+    }
 
 
 @router.get("/conversations")
 async def list_conversations(
     search: Optional[str] = None,
     limit: int = 50,
+    offset: int = 0,
     conversation_service: ConversationService = Depends(get_conversation_service)
 ):
     """
     List or search conversations.
     
     Query Parameters:
-        search: Optional search term to filter conversations
+        search: Optional full-text search over message content, best matches first
         limit: Maximum number of conversations to return (default: 50)
+        offset: Number of search results to skip (default: 0)
     
     Returns:
-        List of conversations with id, title, preview, and created_at
+        List of conversations with id, title, preview, and created_at;
+        search results also include a highlighted snippet
     """
     if search:
-        conversations = conversation_service.search_conversations(search, limit)
+        conversations = conversation_service.search_conversations(search, limit, offset)
     else:
         conversations = conversation_service.list_conversations(limit)
 
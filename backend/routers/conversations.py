@@ -1,29 +1,54 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from typing import Optional
-from services.conversation_service import ConversationService
+from typing import List, Dict, Optional
+from dependencies import get_conversation_service
 
 router = APIRouter()
-service = ConversationService()
+# Same instance as chat, so listings see messages still in the write-behind buffer
+service = get_conversation_service()
+
+def _next_cursor(rows: List[Dict], limit: Optional[int]) -> Optional[str]:
+    """Cursor for the following page, or None when this page is the last"""
+    if limit is None or len(rows) < limit:
+        return None
+    return service.cursor_for(rows[-1])
 
 @router.get("/")
-async def list_conversations():
-    return {"conversations": service.list_conversations()}
+async def list_conversations(
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    search: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+):
+    if search:
+        # Search results are ranked by relevance, so they page by offset rather than cursor
+        rows = service.search_conversations(search, limit or 50, offset)
+        return {"conversations": rows, "next_cursor": None}
+    try:
+        rows = service.list_conversations(limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"conversations": rows, "next_cursor": _next_cursor(rows, limit)}
 
 @router.get("/{conversation_id}")
 async def get_conversation(conversation_id: str):
-    exists = service.conversation_exists(conversation_id)
-    if not exists:
+    conversation = service.get_conversation(conversation_id)
+    if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    msgs = service.get_messages(conversation_id)
-    return {"id": conversation_id, "messages_count": len(msgs)}
+    return {"id": conversation_id, "messages_count": conversation["message_count"]}
 
 @router.get("/{conversation_id}/messages")
-async def get_messages(conversation_id: str):
+async def get_messages(
+    conversation_id: str, limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None
+):
     exists = service.conversation_exists(conversation_id)
     if not exists:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return {"messages": service.get_messages(conversation_id)}
+    try:
+        rows = service.get_messages(conversation_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"messages": rows, "next_cursor": _next_cursor(rows, limit)}
 
 @router.post("/")
 async def create_conversation():
@@ -1,21 +1,21 @@
+import asyncio
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from config import get_settings
 from typing import List
 
-from services.document_processor import DocumentProcessor
-from services.vector_store import VectorStoreService
-from dependencies import get_vector_store
+from services.async_vector_store import AsyncVectorStore
+from services.ingestion_jobs import IngestionJobService
+from dependencies import get_async_vector_store, get_ingestion_jobs
 from exceptions import ValidationError, NotFoundError
 
 router = APIRouter()
-processor = DocumentProcessor()
 
-@router.post("/upload")
+@router.post("/upload", status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
-    vector_store: VectorStoreService = Depends(get_vector_store)
+    ingestion_jobs: IngestionJobService = Depends(get_ingestion_jobs)
 ):
-    """Upload and process a document"""
+    """Upload a document and queue it for background ingestion"""
     # Validate file type
     allowed_extensions = ["pdf", "docx", "txt"]
     extension = file.filename.lower().split(".")[-1]
@@ -38,37 +38,50 @@ async def upload_document(
         if len(content) > max_bytes:
             raise ValidationError("File too large")
 
-        # Extract text
-        text = processor.extract_text(content, file.filename)
-
-        # Chunk the text
-        chunks, metadata = processor.chunk_text(text, file.filename)
-
-        # Add to vector store
-        num_chunks = vector_store.add_documents(chunks, metadata)
+        # Extract, chunk, embed and store in the background
+        job_id = await ingestion_jobs.submit(file.filename, content)
 
         return {
             "filename": file.filename,
-            "chunks_created": num_chunks,
-            "status": "success"
+            "job_id": job_id,
+            "status": "queued"
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(
+    job_id: str,
+    ingestion_jobs: IngestionJobService = Depends(get_ingestion_jobs)
+):
+    """Report an ingestion job's stage, progress and per-stage timings"""
+    job = await asyncio.to_thread(ingestion_jobs.get_job, job_id)
+    if job is None:
+        raise NotFoundError("Ingestion job")
+    return job
+
 @router.get("/list")
 async def list_documents(
-    vector_store: VectorStoreService = Depends(get_vector_store)
+    vector_store: AsyncVectorStore = Depends(get_async_vector_store)
 ):
     """List all uploaded documents"""
-    documents = vector_store.list_documents()
+    documents = await vector_store.list_documents()
     return {"documents": documents}
 
 
 @router.delete("/{filename}")
 async def delete_document(
     filename: str,
-    vector_store: VectorStoreService = Depends(get_vector_store)
+    vector_store: AsyncVectorStore = Depends(get_async_vector_store)
 ):
     """Delete a document from the vector store"""
-    vector_store.delete_document(filename)
+    await vector_store.delete_document(filename)
     return {"status": "deleted", "filename": filename}
+
+
+@router.get("/stats")
+async def vector_store_stats(
+    vector_store: AsyncVectorStore = Depends(get_async_vector_store)
+):
+    """Report vector store thread pool saturation (queue depth, wait times)"""
+    return {"pools": vector_store.stats()}
@@ -47,7 +47,8 @@ async def update_llm_settings(
     if not success:
         raise HTTPException(500, "Failed to save settings")
 
-    return {"status": "ok", "message": "Settings updated. Restart backend for changes to take effect."}
+    # LLMService picks up the new settings version on its next request
+    return {"status": "ok", "message": "Settings updated."}
 
 @router.get("/cloud-providers")
 async def get_cloud_providers(config: ConfigService = Depends(get_config)):
@@ -11,6 +11,9 @@ class CloudProviderConfig(BaseModel):
     model: str = Field(..., description="Model identifier")
     temperature: float = Field(default=0.7, ge=0.0, le=2.0)
     max_tokens: int = Field(default=1024, ge=1, le=100000)
+    context_length: Optional[int] = Field(
+        default=None, ge=512, description="Context window in tokens (defaults to the provider registry)"
+    )
     top_p: Optional[float] = Field(default=0.9, ge=0.0, le=1.0)
     frequency_penalty: Optional[float] = Field(default=0.2, ge=0.0, le=2.0)
     presence_penalty: Optional[float] = Field(default=0.0, ge=0.0, le=2.0)
@@ -23,6 +26,9 @@ class CustomProviderConfig(BaseModel):
     model: str = Field(..., description="Model identifier")
     temperature: float = Field(default=0.7, ge=0.0, le=2.0)
     max_tokens: int = Field(default=1024, ge=1, le=100000)
+    context_length: Optional[int] = Field(
+        default=None, ge=512, description="Context window in tokens (defaults to the provider registry)"
+    )
 
 
 class LocalProviderConfig(BaseModel):
@@ -30,6 +36,9 @@ class LocalProviderConfig(BaseModel):
     base_url: str = Field(default="http://localhost:8080", description="Local server URL")
     temperature: float = Field(default=0.7, ge=0.0, le=2.0)
     max_tokens: int = Field(default=1024, ge=1, le=100000)
+    context_length: Optional[int] = Field(
+        default=None, ge=512, description="Context window in tokens (defaults to the provider registry)"
+    )
 
 
 class LLMSettings(BaseModel):
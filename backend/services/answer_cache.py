@@ -0,0 +1,128 @@
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """In-memory cache of generated answers for semantically repeated questions.
+
+    Entries are grouped by a context key covering everything besides the
+    question that shapes the answer: retrieved chunk IDs, model, sampling
+    parameters and conversation history. Within a context, a cached answer is
+    reused when the new question's embedding is within ``threshold`` cosine
+    similarity of the cached one. Entries expire after ``ttl_seconds``, the
+    least recently used are evicted beyond ``max_entries``, and entries built
+    from a document are dropped when it is deleted or re-uploaded.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 1000):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._by_context: Dict[str, Set[str]] = {}
+        self._by_filename: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def context_key(
+        context_chunks: List[Dict], generation_params: Dict, history: Optional[List[Dict]] = None
+    ) -> str:
+        """Hash of the retrieved chunks, model, sampling parameters and history"""
+        chunk_ids = sorted(c.get("id") or c["content"] for c in context_chunks)
+        history = [(m["role"], m["content"]) for m in history or []]
+        payload = json.dumps([chunk_ids, generation_params, history], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding: List[float], context_key: str) -> Optional[Dict[str, Any]]:
+        """Return the best cached {"response", "sources"} for this question and context, if any"""
+        query = self._normalize(embedding)
+        now = time.time()
+        best_id, best_score = None, self.threshold
+
+        for entry_id in list(self._by_context.get(context_key, ())):
+            entry = self._entries[entry_id]
+            if now - entry["created_at"] > self.ttl_seconds:
+                self._remove(entry_id)
+                continue
+            score = float(entry["embedding"] @ query)
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(best_id)
+        entry = self._entries[best_id]
+        return {"response": entry["response"], "sources": entry["sources"], "similarity": best_score}
+
+    def store(self, embedding: List[float], context_key: str, response: str, sources: List[str]):
+        """Cache an answer; sources are the filenames it was generated from"""
+        entry_id = str(uuid.uuid4())
+        self._entries[entry_id] = {
+            "embedding": self._normalize(embedding),
+            "context_key": context_key,
+            "response": response,
+            "sources": sources,
+            "created_at": time.time(),
+        }
+        self._by_context.setdefault(context_key, set()).add(entry_id)
+        for filename in set(sources):
+            self._by_filename.setdefault(filename, set()).add(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate_document(self, filename: str):
+        """Drop every answer generated from a document"""
+        for entry_id in self._by_filename.pop(filename, set()):
+            if entry_id in self._entries:
+                self._remove(entry_id)
+                self.invalidations += 1
+
+    def _remove(self, entry_id: str):
+        entry = self._entries.pop(entry_id)
+        siblings = self._by_context.get(entry["context_key"])
+        if siblings is not None:
+            siblings.discard(entry_id)
+            if not siblings:
+                del self._by_context[entry["context_key"]]
+        for filename in set(entry["sources"]):
+            ids = self._by_filename.get(filename)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._by_filename[filename]
+
+    def clear(self):
+        self._entries.clear()
+        self._by_context.clear()
+        self._by_filename.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
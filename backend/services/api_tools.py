@@ -1,13 +1,26 @@
+import asyncio
 import httpx
-from typing import Dict, Any, Optional
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
 from config import get_settings
 import os
 from datetime import datetime
 from services.oauth_tokens import get_token
+from services.tool_cache import ToolResultCache
+
+logger = logging.getLogger(__name__)
 
 class APIToolsService:
     def __init__(self):
         self.settings = get_settings()
+        # Public-data tools are cached per tool/params and refreshed in the background
+        self.cache = ToolResultCache(
+            ttls=self.settings.tool_cache_ttls,
+            stale_seconds=self.settings.tool_cache_stale_seconds,
+        )
+        # Hacker News item payloads by story id: (fetched_at, story)
+        self._hn_items: Dict[int, Tuple[float, Dict[str, Any]]] = {}
     
     async def github_search_commits(
         self,
@@ -16,6 +29,13 @@ class APIToolsService:
         limit: int = 10
     ) -> Dict[str, Any]:
         """Search recent commits in a GitHub repository"""
+        return await self.cache.get_or_fetch(
+            "github",
+            {"repo": repo, "limit": limit},
+            lambda: self._github_search_commits(repo, limit),
+        )
+
+    async def _github_search_commits(self, repo: str, limit: int) -> Dict[str, Any]:
         headers = {}
         gh_token = os.getenv("GITHUB_TOKEN") or self.settings.github_token
         if gh_token:
@@ -50,6 +70,11 @@ class APIToolsService:
     
     async def get_crypto_price(self, symbol: str = "bitcoin") -> Dict[str, Any]:
         """Get current cryptocurrency price"""
+        return await self.cache.get_or_fetch(
+            "crypto", {"symbol": symbol}, lambda: self._get_crypto_price(symbol)
+        )
+
+    async def _get_crypto_price(self, symbol: str) -> Dict[str, Any]:
         async with httpx.AsyncClient() as client:
             response = await client.get(
                 f"https://api.coingecko.com/api/v3/simple/price",
@@ -74,6 +99,11 @@ class APIToolsService:
     
     async def get_weather(self, city: str) -> Dict[str, Any]:
         """Get current weather for a city"""
+        return await self.cache.get_or_fetch(
+            "weather", {"city": city}, lambda: self._get_weather(city)
+        )
+
+    async def _get_weather(self, city: str) -> Dict[str, Any]:
         api_key = os.getenv("OPENWEATHER_API_KEY") or self.settings.openweather_api_key
         if not api_key:
             return {"error": "Weather API key not configured"}
@@ -162,27 +192,81 @@ class APIToolsService:
                 return {"error": resp.text}
             return {"results": resp.json().get("results", [])}
     
-    async def get_hacker_news_top(self, limit: int = 10) -> Dict[str, Any]:
-        """Get top Hacker News stories"""
+    async def get_hacker_news_top(
+        self,
+        limit: int = 10,
+        on_story: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """Get top Hacker News stories
+
+        on_story(rank, story) is awaited for each story as it arrives when the
+        result has to be fetched; cached results are returned without it.
+        """
+        return await self.cache.get_or_fetch(
+            "hackernews", {"limit": limit}, lambda: self._get_hacker_news_top(limit, on_story)
+        )
+
+    async def _get_hacker_news_top(
+        self,
+        limit: int,
+        on_story: Optional[Callable[[int, Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        ranked = {}
+        async for rank, story in self.stream_hacker_news_top(limit):
+            ranked[rank] = story
+            if on_story is not None:
+                await on_story(rank, story)
+        return {"stories": [ranked[rank] for rank in sorted(ranked)]}
+
+    async def stream_hacker_news_top(self, limit: int = 10) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (rank, story) for the top stories in the order they arrive"""
         async with httpx.AsyncClient() as client:
             # Get top story IDs
             response = await client.get(
                 "https://hacker-news.firebaseio.com/v0/topstories.json"
             )
             story_ids = response.json()[:limit]
-            
-            # Fetch each story
-            stories = []
-            for sid in story_ids:
-                resp = await client.get(
-                    f"https://hacker-news.firebaseio.com/v0/item/{sid}.json"
-                )
-                story = resp.json()
-                stories.append({
-                    "title": story.get("title"),
-                    "url": story.get("url", ""),
-                    "score": story.get("score"),
-                    "comments": story.get("descendants", 0)
-                })
-            
-            return {"stories": stories}
+
+            # Fetch stories concurrently, at most hackernews_fanout at a time
+            semaphore = asyncio.Semaphore(max(1, int(self.settings.hackernews_fanout)))
+
+            async def fetch(rank: int, sid: int):
+                async with semaphore:
+                    return rank, await self._get_hacker_news_item(client, sid)
+
+            tasks = [asyncio.ensure_future(fetch(rank, sid)) for rank, sid in enumerate(story_ids)]
+            try:
+                for next_story in asyncio.as_completed(tasks):
+                    try:
+                        rank, story = await next_story
+                    except Exception as e:
+                        # One missing story shouldn't sink the rest of the list
+                        logger.warning("Hacker News item fetch failed: %s", e)
+                        continue
+                    yield rank, story
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    async def _get_hacker_news_item(self, client: httpx.AsyncClient, sid: int) -> Dict[str, Any]:
+        """Fetch a story by id; stories repeat across refreshes, so they are cached briefly"""
+        cached = self._hn_items.get(sid)
+        if cached is not None and time.time() - cached[0] < float(self.settings.hackernews_item_ttl_seconds):
+            return cached[1]
+
+        resp = await client.get(
+            f"https://hacker-news.firebaseio.com/v0/item/{sid}.json"
+        )
+        story = resp.json()
+        story = {
+            "title": story.get("title"),
+            "url": story.get("url", ""),
+            "score": story.get("score"),
+            "comments": story.get("descendants", 0)
+        }
+        now = time.time()
+        self._hn_items[sid] = (now, story)
+        if len(self._hn_items) > 1000:
+            ttl = float(self.settings.hackernews_item_ttl_seconds)
+            self._hn_items = {k: v for k, v in self._hn_items.items() if now - v[0] < ttl}
+        return story
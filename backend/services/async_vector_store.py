@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from config import get_settings
+from services.bm25_index import reciprocal_rank_fusion
+from services.embedding_batcher import EmbeddingBatcher
+from services.vector_store import VectorStoreService
+
+
+class InstrumentedExecutor(Executor):
+    """Bounded thread pool that tracks queue depth and time spent waiting for a worker"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"vector-{name}"
+        )
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        enqueued_at = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+
+        def run():
+            waited = time.perf_counter() - enqueued_at
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        return self._executor.submit(run)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.completed + self.active
+            return {
+                "workers": self.max_workers,
+                "queue_depth": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "avg_wait_ms": round(self.total_wait / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+            }
+
+
+class AsyncVectorStore:
+    """Async facade over VectorStoreService.
+
+    Embedding and Chroma calls run on dedicated thread pools so they never
+    block the event loop: one for chat queries and one for ingestion, so a
+    large upload cannot starve searches. Query embeddings are micro-batched.
+    """
+
+    def __init__(self, store: VectorStoreService):
+        settings = get_settings()
+        self.store = store
+        self.query_executor = InstrumentedExecutor("query", settings.vector_query_workers)
+        self.ingest_executor = InstrumentedExecutor("ingest", settings.vector_ingest_workers)
+        # Concurrent query embeddings are coalesced into batched encode calls
+        self.query_batcher = EmbeddingBatcher(
+            store.embed,
+            max_batch_size=settings.embedding_batch_max_size,
+            max_wait_ms=settings.embedding_batch_wait_ms,
+            executor=self.query_executor,
+        )
+        self.retrieval_mode = settings.retrieval_mode
+        self.hybrid_candidates = settings.hybrid_candidates
+        # Called with a filename whenever that document's chunks are added or deleted
+        self._document_listeners: List[Callable[[str], None]] = []
+
+    async def _run(self, executor: Executor, fn: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    def on_document_changed(self, callback: Callable[[str], None]):
+        """Register a callback invoked with the filename of every added or deleted document"""
+        self._document_listeners.append(callback)
+
+    def _notify(self, filenames):
+        for filename in filenames:
+            for callback in self._document_listeners:
+                callback(filename)
+
+    async def embed_query(self, query: str) -> List[float]:
+        """Embed a search query (micro-batched with concurrent queries)"""
+        return await self.query_batcher.embed(query)
+
+    async def search(
+        self,
+        query: str,
+        n_results: int = 5,
+        file_filters: List[str] = None,
+        mode: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
+    ) -> List[Dict]:
+        """Search for relevant chunks; hybrid mode runs BM25 and vector retrieval concurrently.
+
+        Pass ``query_embedding`` to reuse an embedding from ``embed_query``.
+        """
+        if (mode or self.retrieval_mode) != "hybrid":
+            if query_embedding is None:
+                query_embedding = await self.query_batcher.embed(query)
+            return await self._run(
+                self.query_executor, self.store.search_by_embedding, [query_embedding], n_results, file_filters
+            )
+
+        candidates = max(n_results, self.hybrid_candidates)
+        # Keyword retrieval doesn't need the embedding, so it overlaps with batching and encoding
+        lexical = asyncio.ensure_future(
+            self._run(self.query_executor, self.store.lexical_search, query, candidates, file_filters)
+        )
+        try:
+            if query_embedding is None:
+                query_embedding = await self.query_batcher.embed(query)
+            vector_hits = await self._run(
+                self.query_executor, self.store.search_by_embedding, [query_embedding], candidates, file_filters
+            )
+        except BaseException:
+            lexical.cancel()
+            raise
+        return reciprocal_rank_fusion([vector_hits, await lexical], n_results)
+
+    async def embed_documents(self, chunks: List[str]) -> List[List[float]]:
+        """Embed document chunks on the ingestion pool"""
+        return await self._run(self.ingest_executor, self.store.embed, chunks)
+
+    async def add_documents(
+        self, chunks: List[str], metadata: List[Dict], embeddings: Optional[List[List[float]]] = None
+    ) -> int:
+        """Add document chunks to vector store"""
+        added = await self._run(self.ingest_executor, self.store.add_documents, chunks, metadata, embeddings)
+        self._notify(dict.fromkeys(m.get("filename", "unknown") for m in metadata))
+        return added
+
+    async def delete_document(self, filename: str):
+        """Delete all chunks from a document"""
+        result = await self._run(self.ingest_executor, self.store.delete_document, filename)
+        self._notify([filename])
+        return result
+
+    async def list_documents(self) -> List[str]:
+        """List all unique document names"""
+        return await self._run(self.query_executor, self.store.list_documents)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "query": self.query_executor.stats(),
+            "ingest": self.ingest_executor.stats(),
+            "query_batches": self.query_batcher.batches_run,
+        }
+
+    def shutdown(self):
+        self.query_executor.shutdown(wait=False)
+        self.ingest_executor.shutdown(wait=False)
@@ -0,0 +1,232 @@
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Keeps identifiers like "ERR-1042", "v2.3.1" or "snake_case" together as one token
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+(?:[-.][a-z0-9_]+)*")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; compound identifiers also contribute their parts"""
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(match)
+        if "-" in match or "." in match:
+            tokens.extend(p for p in re.split(r"[-.]", match) if p)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[Dict]], n_results: int, k: int = RRF_K) -> List[Dict]:
+    """Merge ranked result lists by reciprocal rank fusion, keyed on result "id".
+
+    The fused score goes in "rrf_score"; each result keeps the scores its
+    retrievers gave it (the vector similarity stays in "score").
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    results: Dict[str, Dict] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking):
+            key = result.get("id") or result["content"]
+            scores[key] += 1.0 / (k + rank + 1)
+            results[key] = {**result, **results.get(key, {})}
+
+    fused = sorted(scores, key=scores.get, reverse=True)[:n_results]
+    return [{**results[key], "rrf_score": scores[key]} for key in fused]
+
+
+class BM25Index:
+    """Incremental BM25 inverted index over document chunks.
+
+    Postings are written to SQLite as chunks are added or deleted; the
+    in-memory index used for scoring is only loaded on the first search.
+    Every write bumps a generation number in the database, so a process
+    sharing it (another Gunicorn worker) reloads its in-memory index on its
+    next search after the other process has changed it.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._generation: Optional[int] = None  # database generation the in-memory index reflects
+        self._conn: Optional[sqlite3.Connection] = None
+        # In-memory state, populated by _load()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._doc_filenames: Dict[str, str] = {}
+        self._total_length = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """The index's connection, opened on first use (callers hold the lock)"""
+        if self._conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bm25_docs (
+                    doc_id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    length INTEGER NOT NULL
+                )
+            """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bm25_postings (
+                    term TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, doc_id)
+                ) WITHOUT ROWID
+            """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bm25_postings_doc ON bm25_postings(doc_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_bm25_docs_filename ON bm25_docs(filename)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bm25_state (id INTEGER PRIMARY KEY CHECK (id = 1), generation INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO bm25_state (id, generation) VALUES (1, 0)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._loaded:
+                return len(self._doc_lengths)
+            with self._connect() as conn:
+                return conn.execute("SELECT COUNT(*) FROM bm25_docs").fetchone()[0]
+
+    def add(self, ids: Sequence[str], chunks: Sequence[str], metadata: Sequence[Dict]):
+        """Index chunks under their vector store IDs"""
+        docs = []
+        postings = []
+        for doc_id, chunk, meta in zip(ids, chunks, metadata):
+            counts = Counter(tokenize(chunk))
+            filename = meta.get("filename", "unknown")
+            docs.append((doc_id, filename, sum(counts.values()), counts))
+            postings.extend((term, doc_id, tf) for term, tf in counts.items())
+
+        with self._lock:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO bm25_docs (doc_id, filename, length) VALUES (?, ?, ?)",
+                    [(d[0], d[1], d[2]) for d in docs],
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO bm25_postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                    postings,
+                )
+                in_sync = self._bump_generation(conn)
+                conn.commit()
+
+            if in_sync:
+                for doc_id, filename, length, counts in docs:
+                    self._add_to_memory(doc_id, filename, length, counts.items())
+
+    def remove_filename(self, filename: str):
+        """Drop every chunk belonging to a document"""
+        with self._lock:
+            with self._connect() as conn:
+                doc_ids = [
+                    r[0]
+                    for r in conn.execute("SELECT doc_id FROM bm25_docs WHERE filename = ?", (filename,))
+                ]
+                conn.executemany("DELETE FROM bm25_postings WHERE doc_id = ?", [(d,) for d in doc_ids])
+                conn.execute("DELETE FROM bm25_docs WHERE filename = ?", (filename,))
+                in_sync = self._bump_generation(conn)
+                conn.commit()
+
+            if in_sync:
+                removed = set(doc_ids)
+                for doc_id in removed:
+                    self._total_length -= self._doc_lengths.pop(doc_id, 0)
+                    self._doc_filenames.pop(doc_id, None)
+                for term in list(self._postings):
+                    docs = self._postings[term]
+                    for doc_id in removed.intersection(docs):
+                        del docs[doc_id]
+                    if not docs:
+                        del self._postings[term]
+
+    def _bump_generation(self, conn: sqlite3.Connection) -> bool:
+        """Record a write; True if the loaded in-memory index can apply it incrementally.
+
+        Otherwise another process wrote since the index was loaded, and it is
+        reloaded in full on the next search.
+        """
+        conn.execute("UPDATE bm25_state SET generation = generation + 1")
+        generation = conn.execute("SELECT generation FROM bm25_state").fetchone()[0]
+        if self._loaded and self._generation == generation - 1:
+            self._generation = generation
+            return True
+        self._loaded = False
+        return False
+
+    def _read_generation(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT generation FROM bm25_state").fetchone()[0]
+
+    def _add_to_memory(self, doc_id: str, filename: str, length: int, counts: Iterable[Tuple[str, int]]):
+        if doc_id in self._doc_lengths:
+            self._total_length -= self._doc_lengths[doc_id]
+        self._doc_lengths[doc_id] = length
+        self._doc_filenames[doc_id] = filename
+        self._total_length += length
+        for term, tf in counts:
+            self._postings.setdefault(term, {})[doc_id] = tf
+
+    def _load(self):
+        if self._loaded and self._read_generation() == self._generation:
+            return
+        self._postings = {}
+        self._doc_lengths = {}
+        self._doc_filenames = {}
+        self._total_length = 0
+        with self._connect() as conn:
+            # Read in one transaction so the generation matches the rows
+            conn.execute("BEGIN")
+            self._generation = conn.execute("SELECT generation FROM bm25_state").fetchone()[0]
+            for doc_id, filename, length in conn.execute("SELECT doc_id, filename, length FROM bm25_docs"):
+                self._doc_lengths[doc_id] = length
+                self._doc_filenames[doc_id] = filename
+                self._total_length += length
+            for term, doc_id, tf in conn.execute("SELECT term, doc_id, tf FROM bm25_postings"):
+                self._postings.setdefault(term, {})[doc_id] = tf
+            conn.rollback()
+        self._loaded = True
+
+    def search(
+        self, query: str, n_results: int = 5, file_filters: Optional[List[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """Return (doc_id, bm25 score) pairs, best first"""
+        terms = set(tokenize(query))
+        with self._lock:
+            self._load()
+            n_docs = len(self._doc_lengths)
+            if not n_docs or not terms:
+                return []
+            avgdl = self._total_length / n_docs or 1.0
+            allowed: Optional[Set[str]] = set(file_filters) if file_filters else None
+
+            scores: Dict[str, float] = defaultdict(float)
+            for term in terms:
+                docs = self._postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    if allowed is not None and self._doc_filenames.get(doc_id) not in allowed:
+                        continue
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[doc_id] / avgdl)
+                    scores[doc_id] += idf * tf * (BM25_K1 + 1) / norm
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
@@ -0,0 +1,243 @@
+import asyncio
+import itertools
+import json
+from contextlib import suppress
+from typing import Any, Awaitable, Dict, List, Optional
+
+from fastapi import WebSocket
+
+
+class FrameSender:
+    """Sends JSON frames on a chat WebSocket and counts frames and bytes sent.
+
+    Live senders are tracked so /api/chat/stats can report per-connection
+    counters alongside totals for connections that have closed.
+    """
+
+    _ids = itertools.count(1)
+    _active: Dict[int, "FrameSender"] = {}
+    _closed_totals = {"connections": 0, "frames_sent": 0, "bytes_sent": 0, "tokens_streamed": 0}
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.id = next(self._ids)
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.tokens_streamed = 0
+        FrameSender._active[self.id] = self
+
+    async def send(self, payload: Dict[str, Any]):
+        # Same encoding as WebSocket.send_json
+        text = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+        await self.websocket.send_text(text)
+        self.frames_sent += 1
+        self.bytes_sent += len(text.encode("utf-8"))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "id": self.id,
+            "frames_sent": self.frames_sent,
+            "bytes_sent": self.bytes_sent,
+            "tokens_streamed": self.tokens_streamed,
+        }
+
+    def close(self):
+        if FrameSender._active.pop(self.id, None) is None:
+            return
+        totals = FrameSender._closed_totals
+        totals["connections"] += 1
+        totals["frames_sent"] += self.frames_sent
+        totals["bytes_sent"] += self.bytes_sent
+        totals["tokens_streamed"] += self.tokens_streamed
+
+    @classmethod
+    def summary(cls) -> Dict[str, Any]:
+        active = [sender.stats() for sender in cls._active.values()]
+        totals = dict(cls._closed_totals)
+        totals["connections"] += len(active)
+        for key in ("frames_sent", "bytes_sent", "tokens_streamed"):
+            totals[key] += sum(s[key] for s in active)
+        return {"totals": totals, "active": active}
+
+
+class TokenCoalescer:
+    """Batches streamed tokens into fewer ``token`` frames.
+
+    Buffered text is sent once ``flush_chars`` characters are pending, or
+    ``flush_ms`` after the first pending token, whichever comes first. Frames
+    keep the ``{"type": "token", "content": ...}`` shape, so clients that
+    append each frame's content see the same text. ``flush_ms <= 0`` sends
+    every token as it arrives.
+    """
+
+    def __init__(self, sender: FrameSender, flush_ms: float, flush_chars: int):
+        self.sender = sender
+        self.flush_ms = flush_ms
+        self.flush_chars = flush_chars
+        self._parts: List[str] = []  # full response so far
+        self._pending_from = 0  # index into _parts of the first unsent token
+        self._pending_chars = 0
+        self._timer: Optional[asyncio.Task] = None
+        self._error: Optional[Exception] = None  # send error from a timed flush
+        self._lock = asyncio.Lock()
+
+    @property
+    def count(self) -> int:
+        """Tokens received so far"""
+        return len(self._parts)
+
+    async def add(self, token: str):
+        self._raise_send_error()
+        self._parts.append(token)
+        self._pending_chars += len(token)
+        self.sender.tokens_streamed += 1
+        if self.flush_ms <= 0 or self._pending_chars >= self.flush_chars:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_ms / 1000)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            # Nothing awaits the timer, so the next add() or flush() raises it instead
+            self._error = e
+
+    def _raise_send_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    async def flush(self):
+        """Send whatever is buffered now"""
+        self._raise_send_error()
+        timer, self._timer = self._timer, None
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        async with self._lock:
+            if self._pending_from == len(self._parts):
+                return
+            content = "".join(self._parts[self._pending_from:])
+            self._pending_from = len(self._parts)
+            self._pending_chars = 0
+            await self.sender.send({"type": "token", "content": content})
+
+    def cancel(self):
+        """Drop a pending timed flush (e.g. the stream failed or the socket closed)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def text(self) -> str:
+        """The full response streamed so far"""
+        return "".join(self._parts)
+
+
+def _is_cancel(text: str) -> bool:
+    try:
+        message = json.loads(text)
+    except json.JSONDecodeError:
+        return False
+    return isinstance(message, dict) and message.get("type") == "cancel"
+
+
+class ClientWatcher:
+    """Reads a chat WebSocket one message ahead.
+
+    The next client message is always being received in the background, so a
+    ``{"type": "cancel"}`` message or a disconnect is seen while an answer is
+    still being generated, and ``run`` can stop the generation.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self._next = asyncio.create_task(websocket.receive_text())
+
+    async def receive(self) -> str:
+        """The next client message; raises WebSocketDisconnect once the client is gone"""
+        text = await self._next
+        self._next = asyncio.create_task(self.websocket.receive_text())
+        return text
+
+    @property
+    def disconnected(self) -> bool:
+        return self._next.done() and (self._next.cancelled() or self._next.exception() is not None)
+
+    @property
+    def stop_requested(self) -> bool:
+        """The client sent a cancel message or went away"""
+        if not self._next.done():
+            return False
+        return self.disconnected or _is_cancel(self._next.result())
+
+    async def run(self, work: Awaitable) -> bool:
+        """Run work until it finishes or the client stops it.
+
+        Returns True if work completed, False if it was cancelled. A message
+        other than cancel is left for the next ``receive``.
+        """
+        if self.stop_requested:
+            work.close()
+            return False
+        task = asyncio.ensure_future(work)
+        try:
+            while not self._next.done():
+                await asyncio.wait({task, self._next}, return_when=asyncio.FIRST_COMPLETED)
+                if task.done():
+                    break
+            if not task.done() and self.stop_requested:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+                return False
+            await task
+            return True
+        finally:
+            if not task.done():
+                task.cancel()
+
+    def close(self):
+        self._next.cancel()
+
+
+class GenerationStats:
+    """Counts streamed answers that finished or were stopped by the client.
+
+    Tokens saved is an estimate: the mean length of completed answers minus
+    what had been generated when the answer was stopped.
+    """
+
+    def __init__(self):
+        self.completed = 0
+        self.completed_tokens = 0
+        self.cancelled = 0
+        self.disconnected = 0
+        self.tokens_before_stop = 0
+        self.tokens_saved = 0
+
+    def record_completed(self, tokens: int):
+        self.completed += 1
+        self.completed_tokens += tokens
+
+    def record_stopped(self, tokens: int, disconnected: bool):
+        if disconnected:
+            self.disconnected += 1
+        else:
+            self.cancelled += 1
+        self.tokens_before_stop += tokens
+        if self.completed:
+            self.tokens_saved += max(0, round(self.completed_tokens / self.completed) - tokens)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "disconnected": self.disconnected,
+            "tokens_before_stop": self.tokens_before_stop,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+generation_stats = GenerationStats()
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class CompletionCache:
+    """Exact-match cache of LLM completions in SQLite.
+
+    Entries are keyed by a hash of the provider, endpoint and the full request
+    body (model, messages or prompt, sampling parameters), so only
+    byte-identical requests share a completion. Sampled requests
+    (temperature > 0) are not cached unless ``cache_sampled`` is set, since
+    their answers are meant to vary. Entries expire after ``ttl_seconds``; past
+    ``max_entries`` rows or ``max_mb`` of text the least recently used are
+    evicted.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        ttl_seconds: float = 86400,
+        max_entries: int = 10000,
+        max_mb: int = 64,
+        cache_sampled: bool = False,
+    ):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_mb * 1024 * 1024
+        self.cache_sampled = cache_sampled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_completions_last_used ON completions(last_used)"
+        )
+        self._conn.commit()
+        row = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        self._rows, self._bytes = row[0], row[1]
+
+    def key_for(self, provider: str, url: str, request: Dict[str, Any]) -> Optional[str]:
+        """Cache key for a request body, or None if the request shouldn't be cached"""
+        if request.get("temperature") and not self.cache_sampled:
+            with self._lock:
+                self.bypassed += 1
+            return None
+        payload = json.dumps([provider, url, request], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached completion for key, if present and not expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, size, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._conn.commit()
+                self._rows -= 1
+                self._bytes -= row[1]
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, provider: str, model: str, response: str):
+        """Store a completion and evict old rows if over a size cap"""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, provider, model, response, size, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, response, size, now, now),
+            )
+            self._conn.commit()
+            if previous is None:
+                self._rows += 1
+            else:
+                self._bytes -= previous[0]
+            self._bytes += size
+            self.stores += 1
+            self._evict_if_needed()
+
+    def _evict_if_needed(self):
+        if self._rows <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+        # Evict least recently used down to 90% of the caps so we don't evict on every insert
+        target_rows = int(self.max_entries * 0.9)
+        target_bytes = self.max_bytes * 0.9
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM completions ORDER BY last_used ASC, rowid ASC"):
+            if self._rows <= target_rows and self._bytes <= target_bytes:
+                break
+            victims.append((key,))
+            self._rows -= 1
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM completions WHERE key = ?", victims)
+        self._conn.commit()
+        self.evictions += len(victims)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "stored_entries": self._rows,
+            "stored_bytes": self._bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
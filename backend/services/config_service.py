@@ -1,21 +1,60 @@
 import json
 import os
+import time
 from pathlib import Path
 from typing import Dict, Any, Optional
 from config import Settings, get_settings
 from services.provider_registry import get_all_cloud_providers, get_openrouter_models
 
 SETTINGS_FILE = Path(__file__).parent.parent / "settings.json"
+# How often settings.json is checked for edits made outside the app
+MTIME_CHECK_INTERVAL = 1.0
 
 class ConfigService:
     """Manages user settings via settings.json, merged with .env secrets"""
 
     def __init__(self):
         self.env_settings = get_settings()
+        self._version = 0
+        self._mtime = self._settings_mtime()
+        self._mtime_checked = time.monotonic()
         self.user_settings = self._load_user_settings()
         # Auto-migrate old settings format if needed
         self._migrate_if_needed()
 
+    @property
+    def version(self) -> int:
+        """Increases whenever user settings change, saved here or edited in settings.json"""
+        now = time.monotonic()
+        if now - self._mtime_checked >= MTIME_CHECK_INTERVAL:
+            self._mtime_checked = now
+            mtime = self._settings_mtime()
+            if mtime != self._mtime:
+                self._mtime = mtime
+                self._reload()
+        return self._version
+
+    def _settings_mtime(self) -> Optional[float]:
+        try:
+            return SETTINGS_FILE.stat().st_mtime
+        except OSError:
+            return None
+
+    def _reload(self):
+        """Pick up an edited settings.json, keeping the current settings if it doesn't parse"""
+        if SETTINGS_FILE.exists():
+            try:
+                with open(SETTINGS_FILE, 'r') as f:
+                    user_settings = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Ignoring unreadable settings.json: {e}")
+                return
+        else:
+            user_settings = {}
+        self.user_settings = user_settings
+        self._migrate_if_needed()
+        self._version += 1
+
     def _load_user_settings(self) -> Dict[str, Any]:
         """Load settings.json, return empty dict if not found"""
         if not SETTINGS_FILE.exists():
@@ -39,6 +78,8 @@ class ConfigService:
 
             # Reload in-memory settings
             self.user_settings = current
+            self._mtime = self._settings_mtime()
+            self._version += 1
             return True
         except Exception as e:
             print(f"Error saving settings: {e}")
@@ -57,32 +98,7 @@ class ConfigService:
         # Check if using new format
         if "llm" in self.user_settings and "provider_type" in self.user_settings["llm"]:
             llm_settings = self.user_settings["llm"]
-            provider_type = llm_settings["provider_type"]
-
-            config = {
-                "provider_type": provider_type
-            }
-
-            if provider_type == "cloud":
-                cloud_provider = llm_settings.get("cloud_provider")
-                config["cloud_provider"] = cloud_provider
-
-                # Get provider-specific config
-                if "cloud_service_config" in llm_settings:
-                    provider_config = llm_settings["cloud_service_config"].get(cloud_provider, {})
-                    config.update(provider_config)
-
-                    # Get API key from api_keys or env
-                    if cloud_provider == "openrouter":
-                        config["api_key"] = self.get_api_key("openrouter") or self.env_settings.openrouter_api_key
-                    elif cloud_provider == "openai":
-                        config["api_key"] = self.get_api_key("openai") or ""
-
-            else:  # local
-                local_config = llm_settings.get("local", {})
-                config.update(local_config)
-
-            return config
+            return self.get_provider_config(llm_settings["provider_type"], llm_settings.get("cloud_provider"))
 
         # Fallback to old format / env defaults
         env = get_settings()
@@ -99,6 +115,33 @@ class ConfigService:
             "repetition_penalty": env.openrouter_repetition_penalty
         }
 
+    def get_provider_config(self, provider_type: str, cloud_provider: Optional[str] = None) -> Dict[str, Any]:
+        """Configuration of one provider from settings.json (the selected one or a fallback)"""
+        llm_settings = self.user_settings.get("llm", {})
+        config = {
+            "provider_type": provider_type
+        }
+
+        if provider_type == "cloud":
+            config["cloud_provider"] = cloud_provider
+
+            # Get provider-specific config
+            if "cloud_service_config" in llm_settings:
+                provider_config = llm_settings["cloud_service_config"].get(cloud_provider, {})
+                config.update(provider_config)
+
+                # Get API key from api_keys or env
+                if cloud_provider == "openrouter":
+                    config["api_key"] = self.get_api_key("openrouter") or self.env_settings.openrouter_api_key
+                elif cloud_provider == "openai":
+                    config["api_key"] = self.get_api_key("openai") or ""
+
+        else:  # local
+            local_config = llm_settings.get("local", {})
+            config.update(local_config)
+
+        return config
+
     def get_embedding_config(self) -> Dict[str, str]:
         """Get embedding model configuration"""
         default = {"model": self.env_settings.embedding_model}
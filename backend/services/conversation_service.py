@@ -1,10 +1,32 @@
+import base64
+import logging
+import re
 import sqlite3
+import threading
 import uuid
 import os
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 
+SEARCH_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Applied to every connection. WAL lets readers run alongside a writer (also
+# across worker processes), and NORMAL sync is durable in WAL except on power loss.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -16000",  # KiB, i.e. 16 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # 256 MB
+    "PRAGMA temp_store = MEMORY",
+)
+STATEMENT_CACHE_SIZE = 256
+
+MESSAGE_ROLES = ("user", "assistant")
+
+logger = logging.getLogger(__name__)
+
 
 class ConversationService:
     """Service for managing conversation history with SQLite storage"""
@@ -13,13 +35,60 @@ class ConversationService:
         if db_path is None:
             db_path = os.getenv("CONVERSATIONS_DB_PATH", "backend/conversations.db")
         self.db_path = db_path
+        self.fts_enabled = False
+        # One long-lived connection per thread (and process, in case of fork);
+        # reusing it also reuses sqlite3's cache of prepared statements
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # Write-behind buffer for add_message (see start_write_behind)
+        self._pending: List[Tuple[str, str, str]] = []
+        self._pending_changed = threading.Condition()
+        self._unflushed: Dict[str, int] = {}  # buffered or being written, by conversation
+        self._flush_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._flush_max_batch = 100
         self._init_database()
 
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use.
+
+        Use as ``with self._connection() as conn:`` — the block commits on
+        success and rolls back on error, but leaves the connection open.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = sqlite3.connect(
+            self.db_path, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Drain buffered writes and close every connection opened by this service (call on shutdown)"""
+        self.stop_write_behind()
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
     def _init_database(self):
         """Initialize database schema"""
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
 
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS conversations (
@@ -51,11 +120,73 @@ class ConversationService:
             except Exception:
                 pass
 
+            # Message lookups by conversation (history, previews, pagination) use this index
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_messages_conversation "
+                "ON messages(conversation_id, created_at, id)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conversations_created "
+                "ON conversations(created_at, id)"
+            )
+            conn.commit()
+
+            # Last message and count are denormalized onto conversations so the
+            # list doesn't scan messages; existing databases are backfilled once
+            cols = [r[1] for r in conn.execute("PRAGMA table_info(conversations)").fetchall()]
+            if "message_count" not in cols:
+                conn.execute("ALTER TABLE conversations ADD COLUMN last_message TEXT")
+                conn.execute("ALTER TABLE conversations ADD COLUMN last_message_at TIMESTAMP")
+                conn.execute(
+                    "ALTER TABLE conversations ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0"
+                )
+                conn.execute(
+                    """
+                    UPDATE conversations SET
+                        message_count = (SELECT COUNT(*) FROM messages m WHERE m.conversation_id = conversations.id),
+                        last_message = (SELECT content FROM messages m WHERE m.conversation_id = conversations.id
+                                        ORDER BY m.created_at DESC, m.id DESC LIMIT 1),
+                        last_message_at = (SELECT created_at FROM messages m WHERE m.conversation_id = conversations.id
+                                           ORDER BY m.created_at DESC, m.id DESC LIMIT 1)
+                    """
+                )
+                conn.commit()
+
+            # Full-text index over message content, kept in sync by triggers.
+            # Builds without FTS5 fall back to a LIKE scan in search_conversations.
+            try:
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+                ).fetchone()
+                conn.executescript(
+                    """
+                    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                        content, content='messages', content_rowid='id', tokenize='porter unicode61'
+                    );
+                    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+                        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+                    END;
+                    """
+                )
+                if not exists:
+                    conn.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+                conn.commit()
+                self.fts_enabled = True
+            except sqlite3.OperationalError:
+                pass
+
     def create_conversation(self) -> str:
         """Create a new conversation and return its ID"""
         conversation_id = str(uuid.uuid4())
 
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             conn.execute(
                 "INSERT INTO conversations (id) VALUES (?)", (conversation_id,)
             )
@@ -64,32 +195,140 @@ class ConversationService:
         return conversation_id
 
     def add_message(self, conversation_id: str, role: str, content: str):
-        """Add a message to a conversation"""
-        with sqlite3.connect(self.db_path) as conn:
-            # Create conversation if it doesn't exist
-            conn.execute(
-                "INSERT OR IGNORE INTO conversations (id) VALUES (?)",
-                (conversation_id,),
-            )
-            # Add message
-            conn.execute(
-                "INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)",
-                (conversation_id, role, content),
-            )
+        """Add a message to a conversation
+
+        With write-behind running the message is buffered and written by the
+        background flusher; reads of the conversation still see it.
+        """
+        if role not in MESSAGE_ROLES:
+            raise ValueError(f"Invalid role: {role}")
+        if self._flusher is None:
+            self._write_messages([(conversation_id, role, content)])
+            return
+        with self._pending_changed:
+            self._pending.append((conversation_id, role, content))
+            self._unflushed[conversation_id] = self._unflushed.get(conversation_id, 0) + 1
+            # Wake the flusher to start a batch, or to write one that just filled up
+            if len(self._pending) == 1 or len(self._pending) >= self._flush_max_batch:
+                self._pending_changed.notify()
+
+    def _write_messages(self, messages: List[Tuple[str, str, str]]):
+        """Insert messages and update conversation summaries in one transaction"""
+        with self._connection() as conn:
+            for conversation_id, role, content in messages:
+                # Create conversation if it doesn't exist
+                conn.execute(
+                    "INSERT OR IGNORE INTO conversations (id) VALUES (?)",
+                    (conversation_id,),
+                )
+                # Add message
+                cursor = conn.execute(
+                    "INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)",
+                    (conversation_id, role, content),
+                )
+                conn.execute(
+                    """
+                    UPDATE conversations SET
+                        last_message = ?,
+                        last_message_at = (SELECT created_at FROM messages WHERE id = ?),
+                        message_count = message_count + 1
+                    WHERE id = ?
+                    """,
+                    (content, cursor.lastrowid, conversation_id),
+                )
             conn.commit()
 
+    def start_write_behind(self, flush_interval_ms: int = 50, max_batch: int = 100):
+        """Buffer add_message calls and flush them in batches from a background thread
+
+        A batch is written once max_batch messages are pending, or
+        flush_interval_ms after the first one was buffered.
+        """
+        if self._flusher is not None:
+            return
+        self._flush_interval = flush_interval_ms / 1000
+        self._flush_max_batch = max(1, max_batch)
+        self._stopping = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="conversation-flusher", daemon=True)
+        self._flusher.start()
+
+    def stop_write_behind(self):
+        """Stop the background flusher, writing everything still buffered"""
+        flusher = self._flusher
+        if flusher is None:
+            return
+        with self._pending_changed:
+            self._stopping = True
+            self._pending_changed.notify()
+        flusher.join()
+        self._flusher = None
+        self.flush()
+
+    def _flush_loop(self):
+        while True:
+            with self._pending_changed:
+                self._pending_changed.wait_for(lambda: self._pending or self._stopping)
+                if self._stopping:
+                    return
+                # Give the batch time to fill, unless it's already full
+                self._pending_changed.wait_for(
+                    lambda: len(self._pending) >= self._flush_max_batch or self._stopping,
+                    timeout=self._flush_interval,
+                )
+            self.flush()
+
+    def flush(self):
+        """Write all buffered messages now"""
+        with self._flush_lock:
+            with self._pending_changed:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                self._write_messages(batch)
+            except sqlite3.Error:
+                # Retry one by one so a single bad message doesn't drop the batch
+                logger.exception("Batched message write failed; retrying individually")
+                for message in batch:
+                    try:
+                        self._write_messages([message])
+                    except sqlite3.Error:
+                        logger.exception("Dropping message for conversation %s", message[0])
+            finally:
+                with self._pending_changed:
+                    for conversation_id, _, _ in batch:
+                        remaining = self._unflushed.get(conversation_id, 0) - 1
+                        if remaining > 0:
+                            self._unflushed[conversation_id] = remaining
+                        else:
+                            self._unflushed.pop(conversation_id, None)
+
+    def _settle(self, conversation_id: Optional[str] = None):
+        """Flush buffered writes before a read (of one conversation, or of all)"""
+        with self._pending_changed:
+            unflushed = self._unflushed.get(conversation_id) if conversation_id else self._unflushed
+        if unflushed:
+            self.flush()
+
     def get_history(
         self, conversation_id: str, limit: int = 10
     ) -> List[Dict[str, str]]:
-        """Get conversation history (most recent first)"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        """Get the last ``limit`` messages in chronological order.
+
+        Each message has its ``position`` in the whole conversation, from 0.
+        """
+        self._settle(conversation_id)
+        with self._connection() as conn:
             cursor = conn.execute(
                 """
-                SELECT role, content, created_at
-                FROM messages
-                WHERE conversation_id = ?
-                ORDER BY created_at DESC
+                SELECT role, content, created_at, position
+                FROM (
+                    SELECT role, content, created_at,
+                           ROW_NUMBER() OVER (ORDER BY created_at, id) - 1 AS position
+                    FROM messages
+                    WHERE conversation_id = ?
+                )
+                ORDER BY position DESC
                 LIMIT ?
             """,
                 (conversation_id, limit),
@@ -101,35 +340,152 @@ class ConversationService:
 
     def clear_conversation(self, conversation_id: str):
         """Delete all messages in a conversation"""
-        with sqlite3.connect(self.db_path) as conn:
+        self._settle(conversation_id)
+        with self._connection() as conn:
             conn.execute(
                 "DELETE FROM messages WHERE conversation_id = ?", (conversation_id,)
             )
+            conn.execute(
+                """
+                UPDATE conversations
+                SET last_message = NULL, last_message_at = NULL, message_count = 0
+                WHERE id = ?
+                """,
+                (conversation_id,),
+            )
             conn.commit()
 
     def conversation_exists(self, conversation_id: str) -> bool:
         """Check if a conversation exists"""
-        with sqlite3.connect(self.db_path) as conn:
+        self._settle(conversation_id)
+        with self._connection() as conn:
             cursor = conn.execute(
                 "SELECT 1 FROM conversations WHERE id = ? LIMIT 1", (conversation_id,)
             )
             return cursor.fetchone() is not None
 
-    def list_conversations(self) -> List[Dict]:
-        """List all conversations with metadata and last message preview"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute(
-                """
-                SELECT c.id, c.created_at, c.title,
-                       (SELECT content FROM messages m WHERE m.conversation_id = c.id ORDER BY m.created_at DESC LIMIT 1) AS last_message,
-                       (SELECT created_at FROM messages m WHERE m.conversation_id = c.id ORDER BY m.created_at DESC LIMIT 1) AS last_message_at
-                FROM conversations c
-                ORDER BY c.created_at DESC
+    def get_conversation(self, conversation_id: str) -> Optional[Dict]:
+        """Return a conversation's metadata, or None if it doesn't exist"""
+        self._settle(conversation_id)
+        with self._connection() as conn:
+            row = conn.execute(
                 """
-            )
-            rows = [dict(row) for row in cursor.fetchall()]
-        # Add preview field truncated
+                SELECT id, created_at, title, last_message_at, message_count
+                FROM conversations WHERE id = ?
+                """,
+                (conversation_id,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list_conversations(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> List[Dict]:
+        """List conversations (newest first) with metadata and last message preview
+
+        Pass limit to page through results; cursor is the ``cursor_for`` of the
+        last conversation on the previous page.
+        """
+        self._settle()
+        query = """
+            SELECT id, created_at, title, last_message, last_message_at, message_count
+            FROM conversations
+        """
+        params: list = []
+        if cursor:
+            created_at, conversation_id = self._decode_cursor(cursor)
+            query += " WHERE created_at < ? OR (created_at = ? AND id < ?)"
+            params += [created_at, created_at, conversation_id]
+        query += " ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._connection() as conn:
+            rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+        return self._with_preview(rows)
+
+    def search_conversations(self, query: str, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Full-text search over message content, best matching conversations first
+
+        Each result carries the list fields plus ``snippet`` (the best matching
+        message with hits wrapped in <mark>) and ``score`` (bm25, lower is better).
+        """
+        self._settle()
+        terms = SEARCH_TERM_PATTERN.findall(query)
+        if not terms:
+            return []
+        if not self.fts_enabled:
+            return self._search_conversations_like(terms, limit, offset)
+
+        # Quote every term so user input can't inject FTS syntax. Terms are
+        # matched whole (after stemming): prefix queries expand to so many
+        # postings on a large history that bm25 ranking stops being cheap.
+        match = " ".join(f'"{t}"' for t in terms)
+
+        with self._connection() as conn:
+            rows = [
+                dict(row)
+                for row in conn.execute(
+                    """
+                    WITH hits AS (
+                        SELECT rowid, rank FROM messages_fts WHERE messages_fts MATCH ?
+                    ),
+                    best AS (
+                        SELECT m.conversation_id, hits.rowid AS message_id, MIN(hits.rank) AS score
+                        FROM hits JOIN messages m ON m.id = hits.rowid
+                        GROUP BY m.conversation_id
+                        ORDER BY score
+                        LIMIT ? OFFSET ?
+                    )
+                    SELECT c.id, c.created_at, c.title, c.last_message, c.last_message_at, c.message_count,
+                           best.message_id, best.score
+                    FROM best JOIN conversations c ON c.id = best.conversation_id
+                    ORDER BY best.score
+                    """,
+                    (match, limit, offset),
+                ).fetchall()
+            ]
+            # Snippets only for the page being returned, not every hit
+            message_ids = [r["message_id"] for r in rows]
+            snippets = dict(
+                conn.execute(
+                    f"""
+                    SELECT rowid, snippet(messages_fts, 0, '<mark>', '</mark>', '…', 16)
+                    FROM messages_fts
+                    WHERE messages_fts MATCH ? AND rowid IN ({",".join("?" * len(message_ids))})
+                    """,
+                    (match, *message_ids),
+                ).fetchall()
+            ) if message_ids else {}
+
+        for r in rows:
+            r["snippet"] = snippets.get(r.pop("message_id"), "")
+        return self._with_preview(rows)
+
+    def _search_conversations_like(self, terms: List[str], limit: int, offset: int) -> List[Dict]:
+        """Unranked substring search for SQLite builds without FTS5"""
+        where = " AND ".join("m.content LIKE ?" for _ in terms)
+        with self._connection() as conn:
+            rows = [
+                dict(row)
+                for row in conn.execute(
+                    f"""
+                    SELECT c.id, c.created_at, c.title, c.last_message, c.last_message_at, c.message_count,
+                           MAX(m.content) AS snippet, 0.0 AS score
+                    FROM messages m JOIN conversations c ON c.id = m.conversation_id
+                    WHERE {where}
+                    GROUP BY c.id
+                    ORDER BY c.last_message_at DESC
+                    LIMIT ? OFFSET ?
+                    """,
+                    (*(f"%{t}%" for t in terms), limit, offset),
+                ).fetchall()
+            ]
+        for r in rows:
+            r["snippet"] = r["snippet"][:140]
+        return self._with_preview(rows)
+
+    @staticmethod
+    def _with_preview(rows: List[Dict]) -> List[Dict]:
+        """Add a truncated last message preview, and use it as the title when unset"""
         for r in rows:
             lm = r.get("last_message") or ""
             r["last_message_preview"] = (lm[:140] + ("…" if len(lm) > 140 else "")) if lm else ""
@@ -137,35 +493,67 @@ class ConversationService:
                 r["title"] = r["last_message_preview"] or r["id"]
         return rows
 
-    def get_messages(self, conversation_id: str) -> List[Dict[str, str]]:
-        """Return full message history for a conversation"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.execute(
-                """
-                SELECT role, content, created_at
-                FROM messages
-                WHERE conversation_id = ?
-                ORDER BY created_at ASC
-                """,
-                (conversation_id,),
-            )
-            return [dict(row) for row in cursor.fetchall()]
+    @staticmethod
+    def cursor_for(row: Dict) -> str:
+        """Opaque keyset cursor pointing just past a listed conversation or message"""
+        raw = f"{row['created_at']}\n{row['id']}"
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[str, str]:
+        try:
+            created_at, key = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("\n")
+        except Exception:
+            raise ValueError("Invalid cursor")
+        return created_at, key
+
+    def get_messages(
+        self, conversation_id: str, limit: Optional[int] = None, cursor: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """Return message history for a conversation in chronological order
+
+        Pass limit to page through results; cursor is the ``cursor_for`` of the
+        last message on the previous page.
+        """
+        self._settle(conversation_id)
+        query = """
+            SELECT id, role, content, created_at
+            FROM messages
+            WHERE conversation_id = ?
+        """
+        params: list = [conversation_id]
+        if cursor:
+            created_at, message_id = self._decode_cursor(cursor)
+            if not message_id.isdigit():
+                raise ValueError("Invalid cursor")
+            query += " AND (created_at > ? OR (created_at = ? AND id > ?))"
+            params += [created_at, created_at, int(message_id)]
+        query += " ORDER BY created_at ASC, id ASC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._connection() as conn:
+            rows = conn.execute(query, params)
+            return [dict(row) for row in rows.fetchall()]
 
     def delete_conversation(self, conversation_id: str):
         """Delete conversation and all its messages"""
-        with sqlite3.connect(self.db_path) as conn:
+        self._settle(conversation_id)
+        with self._connection() as conn:
             conn.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
             conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
             conn.commit()
 
     def delete_all(self):
-        with sqlite3.connect(self.db_path) as conn:
+        self._settle()
+        with self._connection() as conn:
             conn.execute("DELETE FROM messages")
             conn.execute("DELETE FROM conversations")
             conn.commit()
 
     def set_title(self, conversation_id: str, title: str):
-        with sqlite3.connect(self.db_path) as conn:
+        self._settle(conversation_id)
+        with self._connection() as conn:
             conn.execute("UPDATE conversations SET title = ? WHERE id = ?", (title, conversation_id))
             conn.commit()
@@ -1,17 +1,72 @@
 from pypdf import PdfReader
 from docx import Document
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_right
 from config import get_settings
 import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+# Pages handed to a worker process per task; small enough that the first
+# pages come back quickly
+PDF_PAGES_PER_TASK = 8
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+# In a worker process: the PDF it opened last, as (document token, reader)
+_worker_reader: Tuple[Optional[str], Optional[PdfReader]] = (None, None)
+
+
+def start_pdf_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    """Start the PDF extraction worker processes (done in the application lifespan).
+
+    Workers are spawned rather than forked: ingestion runs on threads, and
+    forking a multi-threaded process can copy locks held by other threads.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None and workers > 1:
+            _pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+
+def shutdown_pdf_pool():
+    """Stop the PDF extraction worker processes"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        pool, _pdf_pool = _pdf_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _extract_pdf_page_range(path: str, token: str, start: int, stop: int) -> List[str]:
+    """Extract text for pages [start, stop) of the PDF at path (runs in a worker process).
+
+    pypdf reads the whole file and its cross-reference table when opening
+    it, so each worker keeps the last document it opened and only pays that
+    once per document rather than once per page range.
+    """
+    global _worker_reader
+    if _worker_reader[0] != token:
+        _worker_reader = (token, PdfReader(path))
+    reader = _worker_reader[1]
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
 
 class DocumentProcessor:
     def __init__(self):
         self.settings = get_settings()
-    
+
     def extract_text(self, file_content: bytes, filename: str) -> str:
         """Extract text from uploaded file"""
         extension = filename.lower().split(".")[-1]
-        
+
         if extension == "pdf":
             return self._extract_pdf(file_content)
         elif extension == "docx":
@@ -20,57 +75,158 @@ class DocumentProcessor:
             return file_content.decode("utf-8")
         else:
             raise ValueError(f"Unsupported file type: {extension}")
-    
+
+    def extract_pages(self, file_content: bytes, filename: str) -> Iterator[Tuple[Optional[int], str]]:
+        """Yield (page_number, text) as pages are extracted; page_number is None for non-paged formats"""
+        extension = filename.lower().split(".")[-1]
+
+        if extension == "pdf":
+            yield from self._extract_pdf_pages(file_content)
+        else:
+            yield None, self.extract_text(file_content, filename)
+
     def _extract_pdf(self, content: bytes) -> str:
+        return "".join(text + "\n" for _, text in self._extract_pdf_pages(content))
+
+    def _extract_pdf_pages(self, content: bytes) -> Iterator[Tuple[int, str]]:
+        """Yield (1-based page number, text) in page order, extracting page ranges in parallel"""
         reader = PdfReader(io.BytesIO(content))
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    
+        num_pages = len(reader.pages)
+        workers = self.settings.pdf_extract_workers
+
+        if workers <= 1 or num_pages <= PDF_PAGES_PER_TASK:
+            for i, page in enumerate(reader.pages):
+                yield i + 1, page.extract_text() or ""
+            return
+
+        # Workers open the PDF from disk rather than receiving the bytes per task
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        token = uuid.uuid4().hex  # Temp paths can be reused; the token names this document
+        futures = []
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            # Started in the application lifespan; started here when used outside the app
+            pool = start_pdf_pool(workers)
+            futures = [
+                pool.submit(_extract_pdf_page_range, path, token, start, min(start + PDF_PAGES_PER_TASK, num_pages))
+                for start in range(0, num_pages, PDF_PAGES_PER_TASK)
+            ]
+            page_number = 1
+            for future in futures:
+                for text in future.result():
+                    yield page_number, text
+                    page_number += 1
+        finally:
+            for future in futures:
+                future.cancel()
+            os.unlink(path)
+
     def _extract_docx(self, content: bytes) -> str:
         doc = Document(io.BytesIO(content))
         return "\n".join(para.text for para in doc.paragraphs)
-    
+
+    def extract_chunks(
+        self, file_content: bytes, filename: str, timings: Optional[Dict[str, float]] = None
+    ) -> Tuple[List[str], List[Dict]]:
+        """Extract and chunk a file, chunking each page as soon as it is extracted.
+
+        If ``timings`` is given, time spent waiting on extraction and time spent
+        chunking are recorded under "extract" and "chunk" (seconds).
+        """
+        pages = self.extract_pages(file_content, filename)
+        if timings is not None:
+            timings["extract"] = 0.0
+            pages = self._timed(pages, timings, "extract")
+
+        started = time.perf_counter()
+        chunks = list(self.iter_chunks(pages, filename))
+
+        if timings is not None:
+            timings["chunk"] = round(time.perf_counter() - started - timings["extract"], 4)
+            timings["extract"] = round(timings["extract"], 4)
+        return [c for c, _ in chunks], [m for _, m in chunks]
+
+    @staticmethod
+    def _timed(items: Iterable, timings: Dict[str, float], key: str) -> Iterator:
+        """Pass items through, adding the time spent producing them to timings[key]"""
+        iterator = iter(items)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                timings[key] += time.perf_counter() - started
+            yield item
+
     def chunk_text(self, text: str, filename: str) -> Tuple[List[str], List[Dict]]:
         """Split text into overlapping chunks"""
+        chunks = list(self.iter_chunks([(None, text)], filename))
+        return [c for c, _ in chunks], [m for _, m in chunks]
+
+    def iter_chunks(
+        self, pages: Iterable[Tuple[Optional[int], str]], filename: str
+    ) -> Iterator[Tuple[str, Dict]]:
+        """Split a stream of (page_number, text) into overlapping, deduplicated chunks.
+
+        Pages are joined with newlines and chunked as one text; chunks are
+        emitted as soon as enough text has arrived to place their boundary.
+        Each chunk records the page its first character falls on.
+        """
         chunk_size = self.settings.chunk_size
         overlap = self.settings.chunk_overlap
 
-        chunks = []
-        metadata = []
-
+        buffer = ""
+        buffer_offset = 0  # absolute position of buffer[0]
+        page_offsets: List[int] = []
+        page_numbers: List[Optional[int]] = []
         start = 0
         chunk_index = 0
+        seen = set()
+        total = 0
 
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
+        def emit(final: bool):
+            nonlocal buffer, buffer_offset, start, chunk_index
+            # Until the last page arrives, only cut chunks whose end is known to lie inside the text
+            while (start < total) if final else (start + chunk_size < total):
+                end = start + chunk_size
+                chunk = buffer[start - buffer_offset:end - buffer_offset]
 
-            if end < len(text):
-                candidates = [chunk.rfind(". "), chunk.rfind("! "), chunk.rfind("? ")]
-                last = max(candidates)
-                if last > chunk_size // 2:
-                    chunk = chunk[:last + 1]
-                    end = start + last + 1
+                if end < total:
+                    candidates = [chunk.rfind(". "), chunk.rfind("! "), chunk.rfind("? ")]
+                    last = max(candidates)
+                    if last > chunk_size // 2:
+                        chunk = chunk[:last + 1]
+                        end = start + last + 1
 
-            chunks.append(chunk.strip())
-            metadata.append({
-                "filename": filename,
-                "chunk_index": chunk_index,
-                "start_char": start
-            })
+                k = chunk.strip()
+                if k and k not in seen:
+                    seen.add(k)
+                    meta = {
+                        "filename": filename,
+                        "chunk_index": chunk_index,
+                        "start_char": start
+                    }
+                    page = page_numbers[bisect_right(page_offsets, start) - 1]
+                    if page is not None:
+                        meta["page"] = page
+                    yield k, meta
+                chunk_index += 1
 
-            start = end - overlap
-            chunk_index += 1
+                start = end - overlap
+                if start > buffer_offset:
+                    buffer = buffer[start - buffer_offset:]
+                    buffer_offset = start
 
-        deduped = []
-        seen = set()
-        md_out = []
-        for c, m in zip(chunks, metadata):
-            k = c.strip()
-            if k and k not in seen:
-                seen.add(k)
-                deduped.append(k)
-                md_out.append(m)
-        return deduped, md_out
+        for page_number, text in pages:
+            page_offsets.append(total)
+            page_numbers.append(page_number)
+            # Pages are newline-terminated, matching the joined full-text layout
+            piece = text + "\n" if page_number is not None else text
+            buffer += piece
+            total += len(piece)
+            yield from emit(final=False)
+
+        yield from emit(final=True)
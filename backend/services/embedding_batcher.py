@@ -0,0 +1,86 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding requests into batched encode calls.
+
+    Callers await ``embed(text)``. Requests are collected for up to
+    ``max_wait_ms`` milliseconds (or until ``max_batch_size`` texts are queued),
+    encoded with a single call to ``encode_fn`` on a worker thread, and each
+    caller receives its own vector. Encoding runs on ``executor`` (the loop's
+    default executor when None).
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None,
+    ):
+        self.encode_fn = encode_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches_run = 0
+        self.texts_encoded = 0
+
+    async def embed(self, text: str) -> List[float]:
+        """Return the embedding for a single text, batched with concurrent callers"""
+        loop = asyncio.get_running_loop()
+        self._ensure_worker(loop)
+        future = loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    def _ensure_worker(self, loop: asyncio.AbstractEventLoop):
+        # Queues and tasks are bound to a loop; rebuild them if the loop changed
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Drain whatever is already queued before waiting on the timer
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Identical queries in the same window share one slot in the batch
+            unique = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = await self._loop.run_in_executor(self.executor, self.encode_fn, unique)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.texts_encoded += len(unique)
+            by_text = {
+                text: (vec.tolist() if hasattr(vec, "tolist") else list(vec))
+                for text, vec in zip(unique, vectors)
+            }
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
@@ -0,0 +1,180 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Hits record last_used in memory; it's written out at most this often from lookups
+LAST_USED_FLUSH_SECONDS = 60.0
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: in-memory LRU in front of a SQLite store.
+
+    Entries are keyed by (embedding model name, hash of the normalized text),
+    so identical chunks across uploads and repeated queries are only encoded
+    once per model. Vectors are stored as float32 blobs. When the store grows
+    past ``max_mb`` the least recently used rows are evicted. Lookups don't
+    write: the last use of rows read from disk is kept in memory and written
+    out with the next insert, or at most every LAST_USED_FLUSH_SECONDS.
+    """
+
+    def __init__(self, db_path: str, memory_items: int = 10000, max_mb: int = 512):
+        self.db_path = db_path
+        self.memory_items = memory_items
+        self.max_bytes = max_mb * 1024 * 1024
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_used: Dict[str, float] = {}  # key -> last use not yet written
+        self._last_used_flushed = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+        row = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        self._rows, self._bytes = row[0], row[1]
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    @classmethod
+    def make_key(cls, model_name: str, text: str) -> str:
+        digest = hashlib.sha256(cls.normalize(text).encode("utf-8")).hexdigest()
+        return f"{model_name}:{digest}"
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Return cached vectors aligned with ``texts`` (None for misses)"""
+        keys = [self.make_key(model_name, t) for t in texts]
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        pending = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._memory.get(key)
+                if vec is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vec
+                else:
+                    pending.setdefault(key, []).append(i)
+
+            if pending:
+                found = {}
+                pending_keys = list(pending)
+                # Stay well under SQLite's bound-parameter limit
+                for start in range(0, len(pending_keys), 500):
+                    batch = pending_keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    for key, blob in self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                        batch,
+                    ):
+                        found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+                if found:
+                    now = time.time()
+                    for key, vec in found.items():
+                        self._last_used[key] = now
+                        self._remember(key, vec)
+                        for i in pending[key]:
+                            results[i] = vec
+                    if time.monotonic() - self._last_used_flushed >= LAST_USED_FLUSH_SECONDS:
+                        self._flush_last_used()
+                        self._conn.commit()
+
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+
+        return results
+
+    def put_many(self, model_name: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Store vectors for ``texts`` and evict old rows if over the size cap"""
+        now = time.time()
+        rows = []
+        for text, vec in zip(texts, vectors):
+            key = self.make_key(model_name, text)
+            blob = np.asarray(vec, dtype=np.float32).tobytes()
+            rows.append((key, model_name, blob, now))
+
+        with self._lock:
+            for key, _, blob, _ in rows:
+                self._remember(key, np.frombuffer(blob, dtype=np.float32).tolist())
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            inserted = self._conn.total_changes - before
+            self._flush_last_used()
+            self._conn.commit()
+            if rows and inserted:
+                self._rows += inserted
+                self._bytes += inserted * len(rows[0][2])
+            self._evict_if_needed()
+
+    def _flush_last_used(self):
+        """Write pending last-use times (caller holds the lock and commits)"""
+        self._last_used_flushed = time.monotonic()
+        if not self._last_used:
+            return
+        self._conn.executemany(
+            "UPDATE embeddings SET last_used = MAX(last_used, ?) WHERE key = ?",
+            [(used, key) for key, used in self._last_used.items()],
+        )
+        self._last_used.clear()
+
+    def _remember(self, key: str, vec: List[float]):
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_if_needed(self):
+        if self._bytes <= self.max_bytes or self._rows == 0:
+            return
+        avg = self._bytes / self._rows
+        # Evict down to 90% of the cap so we don't evict on every insert
+        excess = int((self._bytes - self.max_bytes * 0.9) / avg) + 1
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+        self._conn.commit()
+        row = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()
+        self._rows, self._bytes = row[0], row[1]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+            "stored_entries": self._rows,
+            "stored_bytes": self._bytes,
+        }
@@ -0,0 +1,62 @@
+from typing import Dict, Optional
+
+import httpx
+
+from config import get_settings
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HTTPClientPool:
+    """Long-lived ``httpx.AsyncClient`` per provider base URL.
+
+    Reusing one client per upstream keeps TCP/TLS connections alive between
+    chat turns instead of paying a fresh handshake on every request.
+    """
+
+    def __init__(self):
+        settings = get_settings()
+        self.limits = httpx.Limits(
+            max_connections=settings.llm_http_max_connections,
+            max_keepalive_connections=settings.llm_http_max_keepalive,
+            keepalive_expiry=settings.llm_http_keepalive_expiry,
+        )
+        # Read timeout applies between streamed chunks, not to the whole response
+        self.timeout = httpx.Timeout(
+            settings.llm_http_read_timeout,
+            connect=settings.llm_http_connect_timeout,
+        )
+        self.http2 = HTTP2_AVAILABLE
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, base_url: str) -> httpx.AsyncClient:
+        """Return the shared client for base_url, creating it on first use"""
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2)
+            self._clients[base_url] = client
+        return client
+
+    async def reset(self):
+        """Close all clients so the next request builds them from current settings"""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    async def aclose(self):
+        await self.reset()
+
+
+# Singleton instance
+_http_clients: Optional[HTTPClientPool] = None
+
+
+def get_http_clients() -> HTTPClientPool:
+    global _http_clients
+    if _http_clients is None:
+        _http_clients = HTTPClientPool()
+    return _http_clients
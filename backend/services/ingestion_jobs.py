@@ -0,0 +1,320 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from services.async_vector_store import AsyncVectorStore
+from services.document_processor import DocumentProcessor
+
+logger = logging.getLogger(__name__)
+
+# Share of overall progress reached once each stage finishes
+STAGE_PROGRESS = {"chunk": 0.2, "embed": 0.9, "store": 1.0}
+# How long a statement waits for another process's write lock before "database is locked"
+SQLITE_TIMEOUT_SECONDS = 5.0
+
+
+class IngestionJobService:
+    """Background document ingestion: extract -> chunk -> embed -> store.
+
+    Jobs and their uploaded payloads are persisted in SQLite, so queued or
+    interrupted jobs are picked up again when the workers start after a
+    restart. ``workers`` caps how many documents are processed at once; the
+    heavy lifting runs on the vector store's ingestion thread pool.
+
+    Several processes (e.g. Gunicorn workers) can share one database. A job
+    is claimed atomically before it runs and its claim is a lease, renewed
+    while the job makes progress. A running job whose lease has expired
+    (its process died) is claimed again by the next process that polls.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        vector_store: AsyncVectorStore,
+        processor: Optional[DocumentProcessor] = None,
+        workers: int = 2,
+        embed_batch_size: int = 64,
+        lease_seconds: float = 60.0,
+    ):
+        self.db_path = db_path
+        self.vector_store = vector_store
+        self.processor = processor or DocumentProcessor()
+        self.workers = workers
+        self.embed_batch_size = embed_batch_size
+        self.lease_seconds = lease_seconds
+        # Identifies this process's claims
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=SQLITE_TIMEOUT_SECONDS)
+
+    def _init_database(self):
+        """Initialize database schema"""
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    status TEXT CHECK(status IN ('queued', 'running', 'completed', 'failed')) NOT NULL,
+                    stage TEXT,
+                    progress REAL DEFAULT 0,
+                    chunks_created INTEGER,
+                    error TEXT,
+                    timings TEXT DEFAULT '{}',
+                    owner TEXT,
+                    lease_until REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """
+            )
+            # Migrate: databases created before jobs were leased
+            cols = [r[1] for r in conn.execute("PRAGMA table_info(ingestion_jobs)").fetchall()]
+            if "owner" not in cols:
+                conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN owner TEXT")
+                conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN lease_until REAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingestion_payloads (
+                    job_id TEXT PRIMARY KEY,
+                    content BLOB NOT NULL,
+                    FOREIGN KEY (job_id) REFERENCES ingestion_jobs(id)
+                )
+            """
+            )
+            conn.commit()
+
+    def create_job(self, filename: str, content: bytes) -> str:
+        """Persist a new job with its payload and return its ID"""
+        job_id = str(uuid.uuid4())
+        now = time.time()
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO ingestion_jobs (id, filename, status, stage, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', 'queued', ?, ?)",
+                (job_id, filename, now, now),
+            )
+            conn.execute(
+                "INSERT INTO ingestion_payloads (job_id, content) VALUES (?, ?)",
+                (job_id, content),
+            )
+            conn.commit()
+
+        return job_id
+
+    async def submit(self, filename: str, content: bytes) -> str:
+        """Queue a document for ingestion and return the job ID"""
+        job_id = await asyncio.to_thread(self.create_job, filename, content)
+        self._enqueue(job_id)
+        return job_id
+
+    def _enqueue(self, job_id: str):
+        if self._queue is not None and job_id not in self._queued:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Return job status, stage, progress and per-stage timings"""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(
+                """
+                SELECT id, filename, status, stage, progress, chunks_created, error,
+                       timings, created_at, updated_at
+                FROM ingestion_jobs
+                WHERE id = ?
+                """,
+                (job_id,),
+            ).fetchone()
+
+        if row is None:
+            return None
+        job = dict(row)
+        job["timings"] = json.loads(job["timings"] or "{}")
+        return job
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        if "timings" in fields:
+            fields["timings"] = json.dumps(fields["timings"])
+        finished = fields.get("status") in ("completed", "failed")
+        if finished:
+            fields.update(owner=None, lease_until=None)
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE ingestion_jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+            if finished:
+                conn.execute("DELETE FROM ingestion_payloads WHERE job_id = ?", (job_id,))
+            conn.commit()
+
+    def _claim(self, job_id: str) -> bool:
+        """Atomically take a queued job, or a running one whose lease expired, for this process"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE ingestion_jobs SET status = 'running', stage = 'extract', progress = 0, "
+                "owner = ?, lease_until = ?, updated_at = ? "
+                "WHERE id = ? AND (status = 'queued' OR "
+                "(status = 'running' AND (lease_until IS NULL OR lease_until < ?)))",
+                (self.owner, now + self.lease_seconds, now, job_id, now),
+            )
+            conn.commit()
+        return cursor.rowcount == 1
+
+    def _renew(self, job_id: str):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE ingestion_jobs SET lease_until = ? WHERE id = ? AND owner = ?",
+                (time.time() + self.lease_seconds, job_id, self.owner),
+            )
+            conn.commit()
+
+    def _release(self, job_id: str):
+        """Hand an unfinished job back to the queue (on shutdown)"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE ingestion_jobs SET status = 'queued', stage = 'queued', progress = 0, "
+                "owner = NULL, lease_until = NULL, updated_at = ? WHERE id = ? AND owner = ?",
+                (time.time(), job_id, self.owner),
+            )
+            conn.commit()
+
+    def _load_payload(self, job_id: str) -> Optional[bytes]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT content FROM ingestion_payloads WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _claimable_job_ids(self) -> List[str]:
+        """Queued jobs and running jobs whose lease expired, oldest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM ingestion_jobs WHERE status = 'queued' OR "
+                "(status = 'running' AND (lease_until IS NULL OR lease_until < ?)) "
+                "ORDER BY created_at ASC",
+                (time.time(),),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    async def start(self):
+        """Start the worker pool; jobs left over from a previous run are picked up by the poller"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._queued = set()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._poll()))
+
+    async def stop(self):
+        """Stop the workers; unfinished jobs are released and resume on next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def _poll(self):
+        """Queue claimable jobs: at start, then as other processes' leases may expire"""
+        while True:
+            for job_id in await asyncio.to_thread(self._claimable_job_ids):
+                self._enqueue(job_id)
+            await asyncio.sleep(self.lease_seconds / 2)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self.run_job(job_id)
+            except Exception:
+                # Its lease lapses and the job is retried by the next poll
+                logger.exception("Ingestion job %s could not be run", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _renew_lease(self, job_id: str):
+        """Keep this process's claim on a job alive while it runs"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self._renew, job_id)
+            except Exception as e:
+                # Retried next time round, well before the lease runs out
+                logger.warning("Could not renew the lease on ingestion job %s: %s", job_id, e)
+
+    async def run_job(self, job_id: str):
+        """Claim a job and run it through every stage, recording progress and timings"""
+        if not await asyncio.to_thread(self._claim, job_id):
+            return  # Finished, or being run by another process
+
+        timings: Dict[str, float] = {}
+        loop = asyncio.get_running_loop()
+        executor = self.vector_store.ingest_executor
+
+        async def update(**fields):
+            await asyncio.to_thread(self._update, job_id, **fields)
+
+        async def begin(stage: str) -> float:
+            await update(status="running", stage=stage, timings=timings)
+            return time.perf_counter()
+
+        async def finish(name: str, started: float, **fields):
+            timings[name] = round(time.perf_counter() - started, 4)
+            await update(progress=STAGE_PROGRESS[name], timings=timings, **fields)
+
+        renew = asyncio.create_task(self._renew_lease(job_id))
+        try:
+            job = await asyncio.to_thread(self.get_job, job_id)
+            content = await asyncio.to_thread(self._load_payload, job_id)
+            if job is None or content is None:
+                raise RuntimeError("The uploaded document for this job is missing")
+            filename = job["filename"]
+
+            # Extraction and chunking are pipelined: pages are chunked as they are parsed
+            await begin("extract")
+            chunks, metadata = await loop.run_in_executor(
+                executor, self.processor.extract_chunks, content, filename, timings
+            )
+            await update(progress=STAGE_PROGRESS["chunk"], timings=timings)
+
+            started = await begin("embed")
+            embeddings: List[List[float]] = []
+            span = STAGE_PROGRESS["embed"] - STAGE_PROGRESS["chunk"]
+            for i in range(0, len(chunks), self.embed_batch_size):
+                embeddings.extend(
+                    await self.vector_store.embed_documents(chunks[i:i + self.embed_batch_size])
+                )
+                done = len(embeddings) / len(chunks)
+                await update(progress=round(STAGE_PROGRESS["chunk"] + span * done, 4))
+            await finish("embed", started)
+
+            started = await begin("store")
+            num_chunks = await self.vector_store.add_documents(chunks, metadata, embeddings) if chunks else 0
+            await finish("store", started, status="completed", stage="done", chunks_created=num_chunks)
+        except asyncio.CancelledError:
+            # Shutdown mid-job: hand it back so it resumes on restart or in another process
+            await asyncio.to_thread(self._release, job_id)
+            raise
+        except Exception as e:
+            await update(status="failed", error=str(e), timings=timings)
+        finally:
+            renew.cancel()
@@ -0,0 +1,162 @@
+import os
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+from config import get_settings
+
+try:
+    import fcntl  # Claims a worker index across processes (POSIX only)
+except ImportError:
+    fcntl = None
+
+# Lock files of claimed worker indexes, held open for the life of the process
+_worker_locks: List[IO] = []
+
+
+def _count(value: Any) -> Optional[int]:
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+class LlamaSlots:
+    """Pins conversations to llama.cpp server slots and counts prompt cache reuse.
+
+    A llama.cpp slot keeps the KV cache of the last prompt it evaluated, so
+    sending a conversation's turns to the same slot (``id_slot``) with
+    ``cache_prompt`` lets the server skip the prefix the turns share. Each
+    slot is held by the conversation that used it most recently; a new
+    conversation takes a free slot, or the least recently used idle one.
+    Waiting behind a busy slot costs more than re-evaluating the prompt, so
+    when the conversation's slot (or every slot) is running a request, the
+    request goes without ``id_slot`` and the server picks an idle slot.
+
+    Worker processes share the server's slots: worker ``worker`` of the app's
+    processes uses its own n_slots slots, starting at ``worker * n_slots``.
+    A worker without an index (None) doesn't pin.
+    """
+
+    def __init__(self, worker: Optional[int] = 0):
+        self.worker = worker
+        self._pinned: "OrderedDict[str, int]" = OrderedDict()  # conversation id -> slot
+        self._busy: Counter = Counter()  # slot -> requests running on it
+        self.requests = 0
+        self.prompt_tokens_evaluated = 0
+        self.prompt_tokens_cached = 0
+        self.prompt_ms = 0.0
+
+    @contextmanager
+    def use(self, conversation_id: str, n_slots: int) -> Iterator[Optional[int]]:
+        """Hold the conversation's slot (None: no id_slot) busy while a request runs on it"""
+        slot = self._local_slot(conversation_id, n_slots)
+        if slot is None:
+            yield None
+            return
+        self._busy[slot] += 1
+        try:
+            yield self.worker * max(1, n_slots) + slot
+        finally:
+            self._busy[slot] -= 1
+            if not self._busy[slot]:
+                del self._busy[slot]
+
+    def slot_for(self, conversation_id: str, n_slots: int) -> Optional[int]:
+        """The slot for a conversation, out of this worker's n_slots slots (None: no id_slot)"""
+        slot = self._local_slot(conversation_id, n_slots)
+        return None if slot is None else self.worker * max(1, n_slots) + slot
+
+    def _local_slot(self, conversation_id: str, n_slots: int) -> Optional[int]:
+        if self.worker is None:
+            return None
+        n_slots = max(1, n_slots)
+        slot = self._pinned.get(conversation_id)
+        if slot is not None and slot < n_slots:
+            self._pinned.move_to_end(conversation_id)
+            return None if self._busy[slot] else slot
+        self._pinned.pop(conversation_id, None)
+
+        # Forget pins to slots the server no longer has
+        for pinned, taken in list(self._pinned.items()):
+            if taken >= n_slots:
+                del self._pinned[pinned]
+        taken = set(self._pinned.values())
+        free = [s for s in range(n_slots) if s not in taken and not self._busy[s]]
+        if free:
+            slot = free[0]
+        else:
+            # The least recently used pin whose slot is idle
+            idle = next((c for c, s in self._pinned.items() if not self._busy[s]), None)
+            if idle is None:
+                return None
+            slot = self._pinned.pop(idle)
+        self._pinned[conversation_id] = slot
+        return slot
+
+    def record(self, response: Dict[str, Any]):
+        """Count evaluated and cached prompt tokens from a llama.cpp /completion result"""
+        timings = response.get("timings") if isinstance(response, dict) else None
+        if not isinstance(timings, dict):
+            return
+        evaluated = _count(timings.get("prompt_n"))
+        if evaluated is None:
+            return
+        cached = _count(timings.get("cache_n"))
+        if cached is None:
+            # Servers without cache_n report the prompt's total size instead
+            total = _count(response.get("tokens_evaluated"))
+            cached = max(0, total - evaluated) if total is not None else 0
+        self.requests += 1
+        self.prompt_tokens_evaluated += evaluated
+        self.prompt_tokens_cached += cached
+        prompt_ms = timings.get("prompt_ms")
+        if isinstance(prompt_ms, (int, float)):
+            self.prompt_ms += prompt_ms
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.prompt_tokens_evaluated + self.prompt_tokens_cached
+        return {
+            "worker": self.worker,
+            "pinned_conversations": len(self._pinned),
+            "busy_slots": len(self._busy),
+            "requests": self.requests,
+            "prompt_tokens_evaluated": self.prompt_tokens_evaluated,
+            "prompt_tokens_cached": self.prompt_tokens_cached,
+            "cached_ratio": round(self.prompt_tokens_cached / total, 4) if total else 0.0,
+            "avg_prompt_ms": round(self.prompt_ms / self.requests, 1) if self.requests else None,
+        }
+
+
+def claim_worker_index(lock_dir: str, workers: int) -> Optional[int]:
+    """Claim an index below workers that no other live process holds, or None if all are taken.
+
+    An index is held by an exclusive lock on its file in lock_dir until the
+    process exits, so a restarted worker takes over the index of the one it replaces.
+    """
+    if workers <= 1:
+        return 0
+    if fcntl is None:
+        return None
+    os.makedirs(lock_dir, exist_ok=True)
+    for index in range(workers):
+        lock_file = open(os.path.join(lock_dir, f"worker-{index}.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        _worker_locks.append(lock_file)
+        return index
+    return None
+
+
+# Singleton instance
+_llama_slots: Optional[LlamaSlots] = None
+
+
+def get_llama_slots() -> LlamaSlots:
+    global _llama_slots
+    if _llama_slots is None:
+        settings = get_settings()
+        lock_dir = str(Path(settings.chroma_persist_dir).parent / "workers")
+        _llama_slots = LlamaSlots(claim_worker_index(lock_dir, settings.web_concurrency))
+    return _llama_slots
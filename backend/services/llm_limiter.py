@@ -0,0 +1,251 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from config import get_settings
+
+# Upstream responses that mean "too many requests right now"
+OVERLOAD_STATUSES = (429, 503)
+
+# Per-provider concurrency limits. settings.json can override any of these
+# under "llm_limits", keyed by provider_type ("local", "cloud") and then by
+# cloud_provider ("openrouter", "openai", "custom"), the latter taking precedence.
+DEFAULT_LLM_LIMITS: Dict[str, Dict[str, float]] = {
+    # llama.cpp serves --parallel slots (4 by default); more requests just queue on the server
+    "local": {
+        "initial_concurrency": 4,
+        "min_concurrency": 1,
+        "max_concurrency": 4,
+        "latency_target_ms": 10000,
+    },
+    "cloud": {
+        "initial_concurrency": 8,
+        "min_concurrency": 1,
+        "max_concurrency": 32,
+        "latency_target_ms": 5000,
+    },
+}
+
+# Multiplicative decrease on overload; additive increase is +1 per `limit` successes
+BACKOFF_FACTOR = 0.5
+# Weight of the newest sample in the average time a request holds a slot
+HOLD_TIME_ALPHA = 0.2
+
+QueuedCallback = Callable[[int, Optional[float]], Awaitable[None]]
+
+
+class LimiterSlot:
+    """One admitted LLM request; records the signals fed back to the limiter"""
+
+    def __init__(self, queued_ms: float = 0.0):
+        self.started = time.monotonic()
+        self.queued_ms = queued_ms
+        self.first_token_ms: Optional[float] = None
+        self.status: Optional[int] = None
+
+    def response(self, response):
+        """Record the upstream HTTP status"""
+        status = getattr(response, "status_code", None)
+        self.status = status if isinstance(status, int) else None
+
+    def first_token(self):
+        if self.first_token_ms is None:
+            self.first_token_ms = (time.monotonic() - self.started) * 1000
+
+
+class _Waiter:
+    def __init__(self):
+        self.granted = False
+        self.changed = asyncio.Event()
+
+
+class AdaptiveLimiter:
+    """Concurrency limit for one LLM provider, adjusted by AIMD.
+
+    Requests over the limit wait in a FIFO queue. Each finished request
+    feeds back a signal: a 429/503 response, or a first token slower than
+    ``latency_target_ms``, halves the limit. Requests admitted before the last
+    decrease don't decrease it again, so one burst of 429s counts once. Any
+    other success raises it by ``1 / limit``, i.e. by one after a full
+    limit's worth of successes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_concurrency: float = 4,
+        min_concurrency: float = 1,
+        max_concurrency: float = 4,
+        latency_target_ms: float = 10000,
+    ):
+        self.name = name
+        self.min_limit = max(1.0, float(min_concurrency))
+        self.max_limit = max(self.min_limit, float(max_concurrency))
+        self.limit = min(self.max_limit, max(self.min_limit, float(initial_concurrency)))
+        self.latency_target_ms = float(latency_target_ms)
+        self.inflight = 0
+        self._queue: Deque[_Waiter] = deque()
+        self._avg_hold: Optional[float] = None  # seconds
+        self._last_decrease = float("-inf")
+        self._stats = {"admitted": 0, "queued": 0, "overloaded": 0, "slow": 0, "decreases": 0}
+
+    def configure(
+        self,
+        initial_concurrency: float = 4,
+        min_concurrency: float = 1,
+        max_concurrency: float = 4,
+        latency_target_ms: float = 10000,
+    ):
+        """Apply new bounds, keeping the learned limit (clamped to them) and the queue"""
+        self.min_limit = max(1.0, float(min_concurrency))
+        self.max_limit = max(self.min_limit, float(max_concurrency))
+        self.limit = min(self.max_limit, max(self.min_limit, self.limit))
+        self.latency_target_ms = float(latency_target_ms)
+        self._grant()
+
+    @property
+    def capacity(self) -> int:
+        return int(self.limit)
+
+    def estimated_wait_ms(self, position: int) -> Optional[float]:
+        """Rough wait for the request at this queue position, None until a request has finished"""
+        if self._avg_hold is None:
+            return None
+        return round(position * self._avg_hold / self.capacity * 1000)
+
+    async def acquire(self, on_queued: Optional[QueuedCallback] = None) -> LimiterSlot:
+        """Wait for a slot in FIFO order, reporting (position, estimated wait) while queued"""
+        if not self._queue and self.inflight < self.capacity:
+            self.inflight += 1
+            self._stats["admitted"] += 1
+            return LimiterSlot()
+
+        waiter = _Waiter()
+        self._queue.append(waiter)
+        self._stats["queued"] += 1
+        queued_at = time.monotonic()
+        try:
+            while not waiter.granted:
+                waiter.changed.clear()
+                if on_queued is not None:
+                    position = self._queue.index(waiter) + 1
+                    await on_queued(position, self.estimated_wait_ms(position))
+                if not waiter.granted:
+                    await waiter.changed.wait()
+        except BaseException:
+            if waiter.granted:
+                self.inflight -= 1
+                self._grant()
+            else:
+                self._queue.remove(waiter)
+                self._notify_queue()
+            raise
+        self._stats["admitted"] += 1
+        return LimiterSlot(queued_ms=(time.monotonic() - queued_at) * 1000)
+
+    def release(self, slot: LimiterSlot):
+        """Free the slot and adjust the limit from its outcome"""
+        now = time.monotonic()
+        held = now - slot.started
+        self._avg_hold = held if self._avg_hold is None else (
+            HOLD_TIME_ALPHA * held + (1 - HOLD_TIME_ALPHA) * self._avg_hold
+        )
+
+        overloaded = slot.status in OVERLOAD_STATUSES
+        slow = slot.first_token_ms is not None and slot.first_token_ms > self.latency_target_ms
+        if overloaded or slow:
+            self._stats["overloaded" if overloaded else "slow"] += 1
+            if slot.started >= self._last_decrease:
+                self.limit = max(self.min_limit, self.limit * BACKOFF_FACTOR)
+                self._last_decrease = now
+                self._stats["decreases"] += 1
+        elif slot.first_token_ms is not None or (slot.status is not None and slot.status < 400):
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        self.inflight -= 1
+        self._grant()
+
+    @asynccontextmanager
+    async def slot(self, on_queued: Optional[QueuedCallback] = None):
+        slot = await self.acquire(on_queued)
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+
+    def _grant(self):
+        granted = False
+        while self._queue and self.inflight < self.capacity:
+            waiter = self._queue.popleft()
+            waiter.granted = True
+            waiter.changed.set()
+            self.inflight += 1
+            granted = True
+        if granted:
+            self._notify_queue()
+
+    def _notify_queue(self):
+        # Positions moved up; let every waiter report its new place
+        for waiter in self._queue:
+            waiter.changed.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "inflight": self.inflight,
+            "queue_depth": len(self._queue),
+            "avg_request_ms": round(self._avg_hold * 1000) if self._avg_hold is not None else None,
+            **self._stats,
+        }
+
+
+class LLMLimiters:
+    """One AdaptiveLimiter per LLM provider, configured from settings.json limits.
+
+    Every worker process has its own limiters, so the local server's
+    concurrency limits are split evenly between ``workers`` processes.
+    """
+
+    def __init__(self, workers: int = 1):
+        self.workers = max(1, workers)
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        self._configs: Dict[str, Dict[str, float]] = {}
+
+    def get(self, provider_type: str, cloud_provider: Optional[str], user_limits: Optional[Dict] = None) -> AdaptiveLimiter:
+        """The provider's limiter, reconfigured in place if its limits in user_limits changed"""
+        name = provider_type if provider_type == "local" else f"cloud:{cloud_provider or 'custom'}"
+        config = dict(DEFAULT_LLM_LIMITS.get(provider_type, DEFAULT_LLM_LIMITS["cloud"]))
+        user_limits = user_limits if isinstance(user_limits, dict) else {}
+        config.update(user_limits.get(provider_type) or {})
+        if provider_type != "local":
+            config.update(user_limits.get(cloud_provider) or {})
+        config = {k: v for k, v in config.items() if k in DEFAULT_LLM_LIMITS["local"]}
+        if provider_type == "local":
+            for key in ("initial_concurrency", "min_concurrency", "max_concurrency"):
+                if key in config:
+                    config[key] = max(1, int(config[key]) // self.workers)
+
+        limiter = self._limiters.get(name)
+        if limiter is None:
+            limiter = AdaptiveLimiter(name, **config)
+            self._limiters[name] = limiter
+        elif config != self._configs[name]:
+            limiter.configure(**config)
+        self._configs[name] = config
+        return limiter
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.stats() for name, limiter in self._limiters.items()}
+
+
+# Singleton instance
+_llm_limiters: Optional[LLMLimiters] = None
+
+
+def get_llm_limiters() -> LLMLimiters:
+    global _llm_limiters
+    if _llm_limiters is None:
+        _llm_limiters = LLMLimiters(get_settings().web_concurrency)
+    return _llm_limiters
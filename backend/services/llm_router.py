@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Defaults for settings.json "llm_routing"
+DEFAULT_LLM_ROUTING: Dict[str, Any] = {
+    # Providers to try after the configured one, in order: "local" or a cloud provider id
+    "fallbacks": [],
+    # Give up on a provider (and move to the next) if no token arrives in time.
+    # The last provider in line is always waited for.
+    "ttft_deadline_ms": 15000,
+    # Start the next provider in parallel once the current one is slower than
+    # its usual time to first token, and keep whichever answers first
+    "hedge": False,
+    "hedge_percentile": 95,
+    "hedge_min_delay_ms": 500,
+    # Providers whose health score is below this are tried after healthy ones
+    "degraded_below": 0.5,
+}
+
+# Weight of the newest outcome in a provider's health score
+HEALTH_ALPHA = 0.3
+# Unused providers recover half their lost health every this many seconds,
+# so a degraded provider gets traffic (and a new score) again eventually
+HEALTH_RECOVERY_HALF_LIFE = 60.0
+# Time-to-first-token samples kept per provider for the hedge delay percentile
+TTFT_SAMPLES = 200
+MIN_TTFT_SAMPLES = 10
+
+
+class ProviderHealth:
+    """Rolling success score and time-to-first-token history for one provider"""
+
+    def __init__(self):
+        self._score = 1.0
+        self._updated = time.monotonic()
+        self.ttfts: Deque[float] = deque(maxlen=TTFT_SAMPLES)  # ms
+        self.counts = {"successes": 0, "errors": 0, "timeouts": 0, "hedged_wins": 0}
+
+    @property
+    def score(self) -> float:
+        elapsed = time.monotonic() - self._updated
+        return 1 - (1 - self._score) * 0.5 ** (elapsed / HEALTH_RECOVERY_HALF_LIFE)
+
+    def _record(self, outcome: float):
+        self._score = HEALTH_ALPHA * outcome + (1 - HEALTH_ALPHA) * self.score
+        self._updated = time.monotonic()
+
+    def success(self, ttft_ms: float, hedged: bool = False):
+        self._record(1.0)
+        self.ttfts.append(ttft_ms)
+        self.counts["successes"] += 1
+        if hedged:
+            self.counts["hedged_wins"] += 1
+
+    def failure(self, timed_out: bool):
+        self._record(0.0)
+        self.counts["timeouts" if timed_out else "errors"] += 1
+
+    def ttft_percentile(self, percentile: float) -> Optional[float]:
+        """Nearest-rank percentile of recent times to first token, None with too few samples"""
+        if len(self.ttfts) < MIN_TTFT_SAMPLES:
+            return None
+        ordered = sorted(self.ttfts)
+        rank = max(1, math.ceil(percentile / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.ttft_percentile(50)
+        p95 = self.ttft_percentile(95)
+        return {
+            "score": round(self.score, 3),
+            "ttft_p50_ms": round(p50) if p50 is not None else None,
+            "ttft_p95_ms": round(p95) if p95 is not None else None,
+            **self.counts,
+        }
+
+
+class _Attempt:
+    """One provider's stream, timed from when its concurrency limiter admits it"""
+
+    def __init__(
+        self,
+        name: str,
+        start: Callable[[Callable[[], None]], AsyncIterator[str]],
+        deadline_s: Optional[float],
+        hedged: bool,
+        admitted: asyncio.Event,
+    ):
+        self.name = name
+        self.launched = time.monotonic()
+        # Set on admission: time queued in our own limiter isn't the provider's slowness
+        self.started: Optional[float] = None
+        self.deadline: Optional[float] = None
+        self.deadline_s = deadline_s
+        self.hedged = hedged
+        self._admitted = admitted
+        self.stream = start(self.admit)
+        self.first = asyncio.ensure_future(self.stream.__anext__())
+
+    def admit(self):
+        if self.started is not None:
+            return
+        self.started = time.monotonic()
+        if self.deadline_s is not None:
+            self.deadline = self.started + self.deadline_s
+        self._admitted.set()
+
+    @property
+    def ttft_ms(self) -> float:
+        return (time.monotonic() - (self.started if self.started is not None else self.launched)) * 1000
+
+    async def abandon(self):
+        self.first.cancel()
+        try:
+            await self.first
+        except BaseException:
+            pass
+        await self.stream.aclose()
+
+
+class LLMRouter:
+    """Streams from the first provider to produce a token, failing over and hedging.
+
+    Providers are tried in configured order, healthy ones before degraded
+    ones. A provider that errors, answers with nothing or misses the
+    time-to-first-token deadline is abandoned for the next. Deadlines and
+    times to first token count from when the provider's concurrency limiter
+    admits the request, which the provider reports by calling the
+    ``on_admitted`` callback its stream is started with. With hedging on, the next provider is started
+    alongside once the current one runs past its usual time to first token
+    (a percentile of its history) and the first to produce a token wins.
+    Once a token has been streamed the answer stays on that provider.
+    """
+
+    def __init__(self):
+        self._health: Dict[str, ProviderHealth] = {}
+
+    def health(self, name: str) -> ProviderHealth:
+        if name not in self._health:
+            self._health[name] = ProviderHealth()
+        return self._health[name]
+
+    def order(self, names: List[str], degraded_below: float) -> List[str]:
+        """Configured order, with degraded providers moved to the back"""
+        return sorted(names, key=lambda name: self.health(name).score < degraded_below)
+
+    def _hedge_delay(self, name: str, routing: Dict[str, Any]) -> float:
+        deadline = float(routing["ttft_deadline_ms"])
+        usual = self.health(name).ttft_percentile(float(routing["hedge_percentile"]))
+        delay = usual if usual is not None else deadline / 2
+        return min(deadline, max(float(routing["hedge_min_delay_ms"]), delay)) / 1000
+
+    async def stream(
+        self,
+        providers: List[Tuple[str, Callable[[Callable[[], None]], AsyncIterator[str]]]],
+        routing: Optional[Dict[str, Any]] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Stream tokens from providers, a list of (name, start_stream(on_admitted)) in preference order"""
+        routing = {**DEFAULT_LLM_ROUTING, **(routing or {})}
+        starters = dict(providers)
+        queue = self.order([name for name, _ in providers], float(routing["degraded_below"]))
+        deadline_s = float(routing["ttft_deadline_ms"]) / 1000
+        pending: Dict[asyncio.Future, _Attempt] = {}
+        last_error: Optional[BaseException] = None
+        winner: Optional[_Attempt] = None
+        first_token = ""
+        # Wakes the wait below when an attempt is admitted and its deadline starts
+        admitted = asyncio.Event()
+        admitted_wait: Optional[asyncio.Future] = None
+
+        def launch(hedged: bool = False) -> _Attempt:
+            name = queue.pop(0)
+            # The last provider in line gets as long as it needs
+            attempt = _Attempt(name, starters[name], deadline_s if queue else None, hedged, admitted)
+            pending[attempt.first] = attempt
+            return attempt
+
+        try:
+            latest = launch()
+            hedge = bool(routing["hedge"])
+            hedge_at: Optional[float] = None
+            while pending and winner is None:
+                if hedge and hedge_at is None and latest.started is not None:
+                    hedge_at = latest.started + self._hedge_delay(latest.name, routing)
+                wake = [a.deadline for a in pending.values() if a.deadline is not None]
+                if hedge_at is not None and queue:
+                    wake.append(hedge_at)
+                timeout = max(0.0, min(wake) - time.monotonic()) if wake else None
+                if admitted_wait is None or admitted_wait.done():
+                    admitted.clear()
+                    admitted_wait = asyncio.ensure_future(admitted.wait())
+                done, _ = await asyncio.wait(
+                    [*pending, admitted_wait], timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for future in done:
+                    if future is admitted_wait:
+                        continue
+                    attempt = pending.pop(future)
+                    try:
+                        first_token = future.result()
+                    except StopAsyncIteration:
+                        if queue or pending:
+                            # An empty answer from a failing provider; the others may do better
+                            logger.warning("LLM provider %s returned an empty response", attempt.name)
+                            self.health(attempt.name).failure(timed_out=False)
+                            last_error = RuntimeError(f"LLM provider {attempt.name} returned an empty response")
+                            continue
+                        first_token = ""  # The last provider answered, just with nothing
+                    except Exception as e:
+                        logger.warning("LLM provider %s failed before its first token: %r", attempt.name, e)
+                        self.health(attempt.name).failure(timed_out=False)
+                        last_error = e
+                        continue
+                    winner = attempt
+                    break
+                if winner is not None:
+                    break
+
+                now = time.monotonic()
+                for future, attempt in list(pending.items()):
+                    if attempt.deadline is not None and now >= attempt.deadline:
+                        logger.warning("LLM provider %s missed the first-token deadline", attempt.name)
+                        del pending[future]
+                        self.health(attempt.name).failure(timed_out=True)
+                        await attempt.abandon()
+                if queue and (not pending or (hedge_at is not None and now >= hedge_at and len(pending) == 1)):
+                    latest = launch(hedged=bool(pending))
+                    # At most one hedge in flight
+                    hedge = False
+                    hedge_at = None
+
+            if winner is None:
+                raise last_error or RuntimeError("No LLM provider produced a response")
+            self.health(winner.name).success(winner.ttft_ms, winner.hedged)
+        finally:
+            if admitted_wait is not None:
+                admitted_wait.cancel()
+            for attempt in pending.values():
+                await attempt.abandon()
+
+        try:
+            if first_token:
+                yield first_token
+            async for token in winner.stream:
+                yield token
+        finally:
+            await winner.stream.aclose()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: health.stats() for name, health in self._health.items()}
+
+
+# Singleton instance
+_llm_router: Optional[LLMRouter] = None
+
+
+def get_llm_router() -> LLMRouter:
+    global _llm_router
+    if _llm_router is None:
+        _llm_router = LLMRouter()
+    return _llm_router
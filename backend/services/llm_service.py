@@ -1,236 +1,499 @@
+import asyncio
+import functools
 import httpx
-from typing import AsyncGenerator, List, Dict, Optional
+from contextlib import contextmanager
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, AsyncGenerator, Callable, Iterator, List, Dict, Mapping, Optional, Tuple
 from config import get_settings
+from constants import DEFAULT_TEMPERATURE
+from services.completion_cache import CompletionCache
 from services.config_service import get_config_service, ConfigService
+from services.http_clients import get_http_clients, HTTPClientPool
+from services.llama_slots import get_llama_slots, LlamaSlots
+from services.llm_limiter import get_llm_limiters, AdaptiveLimiter, LLMLimiters, QueuedCallback
+from services.llm_router import get_llm_router, LLMRouter
+from services.prompt_packer import estimate_tokens, pack_rag_prompt
+from services.provider_registry import get_context_length
 import json
 
+LOCAL_STOP = ["</s>", "[INST]", "[/INST]"]
+
+
+@dataclass(frozen=True)
+class ProviderSnapshot:
+    """Routing and request templates for one provider, compiled from one settings version"""
+    version: Any
+    provider_type: str
+    cloud_provider: Optional[str]
+    provider: str
+    is_openrouter: bool
+    is_openai: bool
+    is_local: bool
+    base_url: str
+    model: str
+    key: str
+    context_length: int
+    # Completion endpoint, request headers and body fields fixed by the config
+    url: str
+    headers: Mapping[str, str]
+    payload: Mapping[str, Any]
+    limiter: AdaptiveLimiter
+    # llama.cpp prompt cache reuse: stable-first prompts and cache_prompt
+    prompt_cache: bool
+    # Conversations pinned to llama.cpp slots with id_slot
+    pin_slots: bool
+    routing: Mapping[str, Any]
+    fallbacks: Tuple["LLMService", ...]
+
+
 class LLMService:
-    def __init__(self, config_service: Optional[ConfigService] = None):
+    def __init__(
+        self,
+        config_service: Optional[ConfigService] = None,
+        http_clients: Optional[HTTPClientPool] = None,
+        limiters: Optional[LLMLimiters] = None,
+        router: Optional[LLMRouter] = None,
+        llm_config: Optional[Dict] = None,
+        completion_cache: Optional[CompletionCache] = None,
+        llama_slots: Optional[LlamaSlots] = None,
+    ):
         self.config_service = config_service or get_config_service()
+        # Pooled keep-alive clients shared across requests, one per provider base URL
+        self.http_clients = http_clients or get_http_clients()
+        # Adaptive concurrency limits shared across requests, one per provider
+        self.limiters = limiters or get_llm_limiters()
+        # Provider health and failover shared across requests
+        self.router = router or get_llm_router()
+        # Exact-match cache of completions, shared with the fallback providers
+        self.completion_cache = completion_cache
+        # Conversation-to-slot pinning and prompt cache counters for llama.cpp
+        self.llama_slots = llama_slots or get_llama_slots()
         self.env_settings = get_settings()  # Still need for app_base_url
-        self._llm_config = self.config_service.get_llm_config()
+        # An explicit llm_config (a fallback provider) is used as-is, without LLM_PROVIDER overrides
+        self._pinned = llm_config is not None
+        self._llm_config = llm_config
+        self._snapshot: Optional[ProviderSnapshot] = None
+
+    @property
+    def snapshot(self) -> ProviderSnapshot:
+        """The compiled config, rebuilt only when the settings version changes.
+
+        A new snapshot replaces the old one in a single assignment, so a
+        request that already holds one finishes with a consistent config.
+        """
+        snapshot = self._snapshot
+        version = None if self._pinned else self.config_service.version
+        if snapshot is None or snapshot.version != version:
+            if not self._pinned:
+                self._llm_config = self.config_service.get_llm_config()
+            snapshot = self._compile(version)
+            self._snapshot = snapshot
+        return snapshot
+
+    def _compile(self, version: Any) -> ProviderSnapshot:
+        config = self._llm_config
+        # LLM_PROVIDER from .env overrides settings.json for the main provider
+        env_provider = "" if self._pinned else (self.env_settings.llm_provider or "").lower()
+
+        if "provider_type" in config:
+            provider_type = config["provider_type"]
+        else:
+            legacy = env_provider or config.get("provider", "local")
+            provider_type = "cloud" if legacy in ("openrouter", "openai", "openai-compatible") else "local"
+
+        # If env indicates local, do not treat as cloud even if user settings say cloud
+        if env_provider == "local":
+            cloud_provider = None
+        elif "cloud_provider" in config:
+            cloud_provider = config["cloud_provider"]
+        else:
+            cloud_provider = {"openrouter": "openrouter", "openai": "openai", "openai-compatible": "custom"}.get(
+                env_provider or config.get("provider")
+            )
+
+        is_local = env_provider == "local" or provider_type == "local"
+        if env_provider == "local":
+            is_openrouter = False
+        elif env_provider == "openrouter":
+            is_openrouter = True
+        else:
+            is_openrouter = provider_type == "cloud" and cloud_provider == "openrouter"
+        is_openai = provider_type == "cloud" and cloud_provider == "openai"
+
+        # Map new format to old format for compatibility
+        provider = (cloud_provider or "openrouter") if provider_type == "cloud" else config.get("provider", "local")
+
+        if env_provider == "local":
+            base_url = self.env_settings.llm_base_url
+        elif is_openrouter:
+            base_url = "https://openrouter.ai/api/v1"
+        elif is_openai:
+            base_url = "https://api.openai.com/v1"
+        elif cloud_provider == "custom":
+            base_url = config.get("base_url", "")
+        else:  # local
+            base_url = config.get("base_url", self.env_settings.llm_base_url)
+
+        if is_openrouter and not self._pinned:
+            model = self.env_settings.openrouter_model
+        else:
+            model = config.get("model") or ""
+
+        user_settings = self.config_service.user_settings
+        user_settings = user_settings if isinstance(user_settings, dict) else {}
+        prompt_cache = is_local and self.env_settings.llama_prompt_cache is True
+        pin_slots = prompt_cache and self.env_settings.llama_slot_pinning is True
+        if is_local:
+            url = f"{base_url}/completion"
+            headers: Dict[str, str] = {}
+            payload: Dict[str, Any] = {"stop": LOCAL_STOP}
+            if prompt_cache:
+                payload["cache_prompt"] = True
+            limiter = self.limiters.get("local", None, user_settings.get("llm_limits"))
+        else:
+            # Handle cloud providers (OpenRouter, OpenAI, custom OpenAI-compatible)
+            url = f"{base_url}/chat/completions"
+            headers = {"Content-Type": "application/json"}
+            # Add authorization if API key is available
+            if config.get("api_key"):
+                headers["Authorization"] = f"Bearer {config['api_key']}"
+            # Add OpenRouter-specific headers
+            if is_openrouter:
+                headers["HTTP-Referer"] = self.env_settings.app_base_url
+                headers["X-Title"] = "AI Knowledge Console"
+            # max_tokens falls back to the call's argument when not configured; the
+            # configured temperature is used unless the call passes one
+            payload = {"model": model}
+            payload.update({k: config[k] for k in ("temperature", "max_tokens") if k in config})
+            # Add optional parameters for OpenRouter
+            if is_openrouter:
+                payload.update({
+                    "top_p": config.get("top_p", 0.9),
+                    "frequency_penalty": config.get("frequency_penalty", 0.0),
+                    "presence_penalty": config.get("presence_penalty", 0.0),
+                    "repetition_penalty": config.get("repetition_penalty", 1.0),
+                })
+            limiter = self.limiters.get("cloud", cloud_provider or "custom", user_settings.get("llm_limits"))
+
+        key = "local" if is_local else f"cloud:{cloud_provider or 'custom'}"
+        routing = user_settings.get("llm_routing")
+        routing = routing if isinstance(routing, dict) and not self._pinned else {}
+        fallbacks = []
+        for fallback in routing.get("fallbacks") or []:
+            fallback_config = self.config_service.get_provider_config(
+                "local" if fallback == "local" else "cloud", None if fallback == "local" else fallback
+            )
+            service = LLMService(
+                self.config_service, self.http_clients, self.limiters, self.router, fallback_config,
+                self.completion_cache, self.llama_slots,
+            )
+            if service.provider_key != key:
+                fallbacks.append(service)
+
+        return ProviderSnapshot(
+            version=version,
+            provider_type=provider_type,
+            cloud_provider=cloud_provider,
+            provider=provider,
+            is_openrouter=is_openrouter,
+            is_openai=is_openai,
+            is_local=is_local,
+            base_url=base_url,
+            model=model,
+            key=key,
+            context_length=config.get("context_length") or get_context_length(model),
+            url=url,
+            headers=MappingProxyType(headers),
+            payload=MappingProxyType(payload),
+            limiter=limiter,
+            prompt_cache=prompt_cache,
+            pin_slots=pin_slots,
+            routing=MappingProxyType(routing),
+            fallbacks=tuple(fallbacks),
+        )
 
     @property
     def provider_type(self) -> str:
         """Get the provider type (cloud or local)"""
-        if "provider_type" in self._llm_config:
-            return self._llm_config["provider_type"]
-        provider = self.env_settings.llm_provider or self._llm_config.get("provider", "local")
-        if provider in ("openrouter", "openai", "openai-compatible"):
-            return "cloud"
-        return "local"
+        return self.snapshot.provider_type
 
     @property
     def cloud_provider(self) -> Optional[str]:
         """Get the cloud provider (openrouter, openai, custom)"""
-        # If env indicates local, do not treat as cloud even if user settings say cloud
-        if (self.env_settings.llm_provider or "").lower() == "local":
-            return None
-        if "cloud_provider" in self._llm_config:
-            return self._llm_config["cloud_provider"]
-        provider = self.env_settings.llm_provider or self._llm_config.get("provider")
-        if provider == "openrouter":
-            return "openrouter"
-        if provider == "openai":
-            return "openai"
-        if provider == "openai-compatible":
-            return "custom"
-        return None
+        return self.snapshot.cloud_provider
 
     @property
     def provider(self) -> str:
         """Get the current LLM provider (for backward compatibility)"""
-        # Map new format to old format for compatibility
-        if self.provider_type == "cloud":
-            return self.cloud_provider or "openrouter"
-        return self._llm_config.get("provider", "local")
+        return self.snapshot.provider
 
     @property
     def is_openrouter(self) -> bool:
         """Check if using OpenRouter provider"""
-        if (self.env_settings.llm_provider or "").lower() == "local":
-            return False
-        if (self.env_settings.llm_provider or "").lower() == "openrouter":
-            return True
-        return self.provider_type == "cloud" and self.cloud_provider == "openrouter"
+        return self.snapshot.is_openrouter
 
     @property
     def is_openai(self) -> bool:
         """Check if using OpenAI provider"""
-        return self.provider_type == "cloud" and self.cloud_provider == "openai"
+        return self.snapshot.is_openai
 
     @property
     def is_openai_compatible(self) -> bool:
         """Check if using OpenAI-compatible provider (openai or custom)"""
-        return self.provider_type == "cloud" and self.cloud_provider in ["openai", "custom"]
+        snapshot = self.snapshot
+        return snapshot.provider_type == "cloud" and snapshot.cloud_provider in ["openai", "custom"]
 
     @property
     def is_local(self) -> bool:
         """Check if using local provider"""
-        if (self.env_settings.llm_provider or "").lower() == "local":
-            return True
-        return self.provider_type == "local"
+        return self.snapshot.is_local
 
     @property
     def base_url(self) -> str:
         """Get the base URL for the provider"""
-        # Prefer env-based routing
-        if (self.env_settings.llm_provider or "").lower() == "local":
-            return self.env_settings.llm_base_url
-        if self.is_openrouter:
-            return "https://openrouter.ai/api/v1"
-        elif self.is_openai:
-            return "https://api.openai.com/v1"
-        elif self.cloud_provider == "custom":
-            return self._llm_config.get("base_url", "")
-        else:  # local
-            return self._llm_config.get("base_url", self.env_settings.llm_base_url)
+        return self.snapshot.base_url
 
     @property
     def model(self) -> str:
         """Get the model name based on provider"""
-        if self.is_openrouter:
-            return self.env_settings.openrouter_model
-        m = self._llm_config.get("model")
-        return m or ""
-    
+        return self.snapshot.model
+
+    @property
+    def provider_key(self) -> str:
+        """Name of the provider for limits and health: local or cloud:<cloud_provider>"""
+        return self.snapshot.key
+
+    @property
+    def limiter(self) -> AdaptiveLimiter:
+        """Concurrency limiter for the current provider (limits from settings.json "llm_limits")"""
+        return self.snapshot.limiter
+
+    def fallbacks(self) -> List["LLMService"]:
+        """Services for the fallback providers in settings.json "llm_routing", in order"""
+        return list(self.snapshot.fallbacks)
+
+    @property
+    def context_length(self) -> int:
+        """Context window of the current model, from settings or the provider registry"""
+        return self.snapshot.context_length
+
+    def prompt_budget(self, system_prompt: str = "") -> int:
+        """Tokens left for the user prompt after the system prompt and the reply's max_tokens"""
+        reserved = self.generation_params()["max_tokens"] + estimate_tokens(system_prompt)
+        return self.context_length - reserved
+
+    def generation_params(self, max_tokens: int = 1024, temperature: Optional[float] = None) -> Dict:
+        """Provider, model and sampling parameters that determine a generated answer"""
+        snapshot = self.snapshot
+        params = {"provider": snapshot.provider, "base_url": snapshot.base_url, "model": snapshot.model}
+        params.update({"max_tokens": max_tokens, "temperature": DEFAULT_TEMPERATURE})
+        if not snapshot.is_local:
+            params.update({k: v for k, v in snapshot.payload.items() if k != "model"})
+        if temperature is not None:
+            params["temperature"] = temperature
+        return params
+
+    def _cloud_payload(
+        self,
+        snapshot: ProviderSnapshot,
+        prompt: str,
+        system_prompt: str,
+        max_tokens: int,
+        temperature: Optional[float],
+    ) -> Dict[str, Any]:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        payload = {"temperature": DEFAULT_TEMPERATURE, "max_tokens": max_tokens, **snapshot.payload}
+        if temperature is not None:
+            # An explicit temperature (e.g. 0 for a repeatable, cacheable answer) wins over the configured one
+            payload["temperature"] = temperature
+        payload["messages"] = messages
+        return payload
+
+    def _local_payload(
+        self,
+        snapshot: ProviderSnapshot,
+        prompt: str,
+        system_prompt: str,
+        max_tokens: int,
+        temperature: Optional[float],
+    ) -> Dict[str, Any]:
+        return {
+            "prompt": self._format_prompt(system_prompt, prompt),
+            "n_predict": max_tokens,
+            "temperature": DEFAULT_TEMPERATURE if temperature is None else temperature,
+            **snapshot.payload,
+        }
+
+    def _cache_key(self, snapshot: ProviderSnapshot, payload: Dict[str, Any]) -> Optional[str]:
+        """Completion cache key for a request body (before "stream" is set), None if not cached"""
+        if self.completion_cache is None:
+            return None
+        return self.completion_cache.key_for(snapshot.key, snapshot.url, payload)
+
+    # The completion cache is SQLite; its reads and writes run off the event loop
+    async def _cache_get(self, cache_key: Optional[str]) -> Optional[str]:
+        if cache_key is None:
+            return None
+        return await asyncio.to_thread(self.completion_cache.get, cache_key)
+
+    async def _cache_put(self, snapshot: ProviderSnapshot, cache_key: Optional[str], content: str):
+        if cache_key is not None and content:
+            await asyncio.to_thread(self.completion_cache.put, cache_key, snapshot.key, snapshot.model, content)
+
+    @contextmanager
+    def _pinned_slot(
+        self, snapshot: ProviderSnapshot, payload: Dict[str, Any], conversation_id: Optional[str]
+    ) -> Iterator[None]:
+        """Send a conversation's turns to the same llama.cpp slot, whose KV cache holds its prefix.
+
+        The slot counts as busy until the block exits, so other conversations
+        aren't sent to wait behind it.
+        """
+        if not (snapshot.pin_slots and conversation_id):
+            yield
+            return
+        # The local limiter's max_concurrency is this worker's share of the server's --parallel slots
+        with self.llama_slots.use(conversation_id, int(snapshot.limiter.max_limit)) as slot:
+            if slot is not None:
+                payload["id_slot"] = slot
+            yield
+
     async def generate(
         self,
         prompt: str,
         system_prompt: str = "",
         max_tokens: int = 1024,
-        temperature: float = 0.7
+        temperature: Optional[float] = None,
+        conversation_id: Optional[str] = None,
     ) -> str:
-        # Prefer env-based routing to satisfy backward-compat expectations
-        if not self.is_local:
-            # Handle cloud providers (OpenRouter, OpenAI, custom OpenAI-compatible)
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                headers = {
-                    "Content-Type": "application/json",
-                }
-
-                # Add authorization if API key is available
-                api_key = self._llm_config.get("api_key")
-                if api_key:
-                    headers["Authorization"] = f"Bearer {api_key}"
-
-                # Add OpenRouter-specific headers
-                if self.is_openrouter:
-                    headers["HTTP-Referer"] = self.env_settings.app_base_url
-                    headers["X-Title"] = "AI Knowledge Console"
-
-                messages = []
-                if system_prompt:
-                    messages.append({"role": "system", "content": system_prompt})
-                messages.append({"role": "user", "content": prompt})
-
-                payload = {
-                    "model": self.model,
-                    "messages": messages,
-                    "temperature": self._llm_config.get("temperature", temperature),
-                    "max_tokens": self._llm_config.get("max_tokens", max_tokens),
-                }
-
-                # Add optional parameters for OpenRouter
-                if self.is_openrouter:
-                    payload.update({
-                        "top_p": self._llm_config.get("top_p", 0.9),
-                        "frequency_penalty": self._llm_config.get("frequency_penalty", 0.0),
-                        "presence_penalty": self._llm_config.get("presence_penalty", 0.0),
-                        "repetition_penalty": self._llm_config.get("repetition_penalty", 1.0),
-                    })
-
+        snapshot = self.snapshot
+        client = self.http_clients.get(snapshot.base_url)
+        if not snapshot.is_local:
+            payload = self._cloud_payload(snapshot, prompt, system_prompt, max_tokens, temperature)
+            cache_key = self._cache_key(snapshot, payload)
+            cached = await self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+            try:
+                async with snapshot.limiter.slot() as slot:
+                    resp = await client.post(snapshot.url, headers=snapshot.headers, json=payload)
+                    slot.response(resp)
+            except httpx.RequestError as e:
+                return json.dumps({"error": str(e)})
+
+            if resp.status_code != 200:
                 try:
-                    resp = await client.post(
-                        f"{self.base_url}/chat/completions",
-                        headers=headers,
-                        json=payload
-                    )
-                except httpx.RequestError as e:
-                    return json.dumps({"error": str(e)})
-
-                if resp.status_code != 200:
-                    try:
-                        err = resp.json()
-                        return json.dumps({"error": err})
-                    except Exception:
-                        return json.dumps({"error": resp.text})
-
-                data = resp.json()
-                # Extract content from OpenAI-compatible response
-                choices = data.get("choices", [])
-                if choices:
-                    message = choices[0].get("message", {})
-                    return message.get("content", "")
-                return ""
+                    err = resp.json()
+                    return json.dumps({"error": err})
+                except Exception:
+                    return json.dumps({"error": resp.text})
+
+            data = resp.json()
+            # Extract content from OpenAI-compatible response
+            choices = data.get("choices", [])
+            if choices:
+                message = choices[0].get("message", {})
+                content = message.get("content", "")
+                await self._cache_put(snapshot, cache_key, content)
+                return content
+            return ""
 
         # Handle local provider
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{self.base_url}/completion",
-                json={
-                    "prompt": self._format_prompt(system_prompt, prompt),
-                    "n_predict": max_tokens,
-                    "temperature": temperature,
-                    "stop": ["</s>", "[INST]", "[/INST]"]
-                }
-            )
-            response.raise_for_status()
-            return response.json()["content"]
+        payload = self._local_payload(snapshot, prompt, system_prompt, max_tokens, temperature)
+        cache_key = self._cache_key(snapshot, payload)
+        cached = await self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        async with snapshot.limiter.slot() as slot:
+            with self._pinned_slot(snapshot, payload, conversation_id):
+                response = await client.post(snapshot.url, json=payload)
+            slot.response(response)
+        response.raise_for_status()
+        data = response.json()
+        self.llama_slots.record(data)
+        content = data["content"]
+        await self._cache_put(snapshot, cache_key, content)
+        return content
     
     async def generate_stream(
         self,
         prompt: str,
         system_prompt: str = "",
         max_tokens: int = 1024,
-        temperature: float = 0.7
+        temperature: Optional[float] = None,
+        on_queued: Optional[QueuedCallback] = None,
+        conversation_id: Optional[str] = None,
     ) -> AsyncGenerator[str, None]:
-        # Prefer env-based routing to satisfy backward-compat expectations
-        if not self.is_local:
-            # Handle cloud providers (OpenRouter, OpenAI, custom OpenAI-compatible)
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                headers = {
-                    "Content-Type": "application/json",
-                }
-
-                # Add authorization if API key is available
-                api_key = self._llm_config.get("api_key")
-                if api_key:
-                    headers["Authorization"] = f"Bearer {api_key}"
-
-                # Add OpenRouter-specific headers
-                if self.is_openrouter:
-                    headers["HTTP-Referer"] = self.env_settings.app_base_url
-                    headers["X-Title"] = "AI Knowledge Console"
-
-                messages = []
-                if system_prompt:
-                    messages.append({"role": "system", "content": system_prompt})
-                messages.append({"role": "user", "content": prompt})
-
-                payload = {
-                    "model": self.model,
-                    "messages": messages,
-                    "temperature": self._llm_config.get("temperature", temperature),
-                    "max_tokens": self._llm_config.get("max_tokens", max_tokens),
-                    "stream": True,
-                }
-
-                # Add optional parameters for OpenRouter
-                if self.is_openrouter:
-                    payload.update({
-                        "top_p": self._llm_config.get("top_p", 0.9),
-                        "frequency_penalty": self._llm_config.get("frequency_penalty", 0.0),
-                        "presence_penalty": self._llm_config.get("presence_penalty", 0.0),
-                        "repetition_penalty": self._llm_config.get("repetition_penalty", 1.0),
-                    })
-
-                async with client.stream(
-                    "POST",
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=payload
-                ) as response:
+        """Stream the answer token by token.
+
+        With fallback providers configured, the answer comes from whichever
+        provider produces a token first (see services.llm_router). Each
+        provider waits for a slot from its concurrency limiter first;
+        on_queued(position, estimated_wait_ms) is awaited while queued.
+        A completion found in the completion cache is yielded at once.
+        conversation_id pins the conversation to a llama.cpp slot.
+        """
+        snapshot = self.snapshot
+        if not snapshot.fallbacks:
+            async for token in self._provider_stream(
+                prompt, system_prompt, max_tokens, temperature, on_queued, conversation_id
+            ):
+                yield token
+            return
+
+        providers = [
+            (service.provider_key, functools.partial(
+                service._provider_stream, prompt, system_prompt, max_tokens, temperature, on_queued, conversation_id
+            ))
+            for service in (self,) + snapshot.fallbacks
+        ]
+        async for token in self.router.stream(providers, snapshot.routing):
+            yield token
+
+    async def _provider_stream(
+        self,
+        prompt: str,
+        system_prompt: str,
+        max_tokens: int,
+        temperature: Optional[float],
+        on_queued: Optional[QueuedCallback],
+        conversation_id: Optional[str] = None,
+        on_admitted: Optional[Callable[[], None]] = None,
+    ) -> AsyncGenerator[str, None]:
+        """One provider's stream; on_admitted() is called once the limiter admits the request.
+
+        An HTTP error response raises instead of ending the stream empty, so
+        the router fails over to the next provider.
+        """
+        snapshot = self.snapshot
+        client = self.http_clients.get(snapshot.base_url)
+        if snapshot.is_local:
+            payload = self._local_payload(snapshot, prompt, system_prompt, max_tokens, temperature)
+        else:
+            payload = self._cloud_payload(snapshot, prompt, system_prompt, max_tokens, temperature)
+        # Streamed and non-streamed requests share cache entries
+        cache_key = self._cache_key(snapshot, payload)
+        cached = await self._cache_get(cache_key)
+        if cached is not None:
+            if on_admitted is not None:
+                on_admitted()
+            yield cached
+            return
+        payload["stream"] = True
+        # Only a stream that runs to the end is cached, not one closed early
+        parts: List[str] = []
+
+        if not snapshot.is_local:
+            async with snapshot.limiter.slot(on_queued) as slot:
+                if on_admitted is not None:
+                    on_admitted()
+                async with client.stream("POST", snapshot.url, headers=snapshot.headers, json=payload) as response:
+                    slot.response(response)
+                    response.raise_for_status()
                     async for line in response.aiter_lines():
                         if not line or not line.startswith("data: "):
                             continue
@@ -244,27 +507,31 @@ class LLMService:
                         delta = choice.get("delta") or {}
                         content = delta.get("content")
                         if content:
+                            slot.first_token()
+                            parts.append(content)
                             yield content
-                return
+            await self._cache_put(snapshot, cache_key, "".join(parts))
+            return
 
         # Handle local provider
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            async with client.stream(
-                "POST",
-                f"{self.base_url}/completion",
-                json={
-                    "prompt": self._format_prompt(system_prompt, prompt),
-                    "n_predict": max_tokens,
-                    "temperature": temperature,
-                    "stream": True,
-                    "stop": ["</s>", "[INST]", "[/INST]"]
-                }
-            ) as response:
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data = json.loads(line[6:])
-                        if "content" in data:
-                            yield data["content"]
+        async with snapshot.limiter.slot(on_queued) as slot:
+            if on_admitted is not None:
+                on_admitted()
+            with self._pinned_slot(snapshot, payload, conversation_id):
+                async with client.stream("POST", snapshot.url, json=payload) as response:
+                    slot.response(response)
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if line.startswith("data: "):
+                            data = json.loads(line[6:])
+                            if "content" in data:
+                                slot.first_token()
+                                parts.append(data["content"])
+                                yield data["content"]
+                            if data.get("stop"):
+                                # The final chunk carries the prompt evaluation timings
+                                self.llama_slots.record(data)
+        await self._cache_put(snapshot, cache_key, "".join(parts))
     
     def _format_prompt(self, system: str, user: str) -> str:
         """Format prompt for Mistral/Llama instruct models"""
@@ -278,41 +545,22 @@ class LLMService:
         context_chunks: List[Dict],
         api_data: Optional[Dict] = None,
         conversation_history: Optional[List[Dict]] = None,
+        system_prompt: str = "",
     ) -> str:
-        """Build a RAG prompt with context, optional API data, and conversation history"""
-        prompt_parts = []
-
-        # Add conversation history if available
-        if conversation_history:
-            history_text = "\n".join(
-                [
-                    f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
-                    for msg in conversation_history[-6:]  # Last 6 messages (3 turns)
-                ]
-            )
-            prompt_parts.append(f"Conversation History:\n{history_text}\n")
-
-        # Add current question
-        prompt_parts.append(f"Current Question: {query}\n")
-
-        # Add document context
-        context_text = "\n\n".join(
-            [
-                f"[Source: {c['metadata'].get('filename', 'unknown')}]\n{c['content']}"
-                for c in context_chunks
-            ]
-        )
-
-        if context_text:
-            prompt_parts.append(f"Document Context:\n{context_text}\n")
-
-        # Add API data
-        if api_data:
-            prompt_parts.append(f"External Data:\n{json.dumps(api_data, indent=2)}\n")
-
-        prompt_parts.append(
-            "Based on the above context, data, and conversation history, provide a comprehensive answer. "
-            "If the information is not in the context, say so clearly."
+        """Build a RAG prompt with context, optional API data, and conversation history
+
+        The prompt is packed to fit the model's context window alongside
+        system_prompt and the reply (see services.prompt_packer). With
+        fallback providers it fits the smallest of their windows, since the
+        same prompt may be sent to any of them. With the
+        llama.cpp prompt cache on, sections go from most to least stable so
+        consecutive turns share the longest possible prefix.
+        """
+        return pack_rag_prompt(
+            query,
+            context_chunks,
+            api_data,
+            conversation_history,
+            min(service.prompt_budget(system_prompt) for service in (self,) + self.snapshot.fallbacks),
+            stable_first=self.snapshot.prompt_cache,
         )
-
-        return "\n".join(prompt_parts)
@@ -0,0 +1,154 @@
+import json
+import math
+from typing import Dict, List, Optional
+
+# UTF-8 bytes per token for a conservative estimate: English prose averages ~4,
+# code/JSON a little less; CJK characters take 3 bytes and ~1 token each.
+BYTES_PER_TOKEN = 3.5
+# Template text (section headers, closing instruction, chat formatting) not
+# covered by the packed sections themselves
+PROMPT_OVERHEAD_TOKENS = 64
+# Don't squeeze a truncated item into less room than this; drop it instead
+MIN_PARTIAL_TOKENS = 32
+MAX_HISTORY_MESSAGES = 6  # 3 turns
+# With stable_first, history starts at a multiple of this many messages into the
+# conversation, so it only grows between turns until the start moves up a block
+HISTORY_BLOCK_MESSAGES = 4  # 2 turns
+TRUNCATION_MARK = " …[truncated]"
+
+CLOSING_INSTRUCTION = (
+    "Based on the above context, data, and conversation history, provide a comprehensive answer. "
+    "If the information is not in the context, say so clearly."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast upper-leaning token estimate from the UTF-8 length"""
+    if not text:
+        return 0
+    return math.ceil(len(text.encode("utf-8")) / BYTES_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text from the end so it (with a truncation mark) fits max_tokens"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    room = max_tokens - estimate_tokens(TRUNCATION_MARK)
+    if room <= 0:
+        return ""
+    end = min(len(text), int(room * BYTES_PER_TOKEN))
+    while end > 0 and estimate_tokens(text[:end]) > room:
+        end = int(end * 0.9)
+    return text[:end].rstrip() + TRUNCATION_MARK
+
+
+def _stable_history(messages: List[Dict]) -> List[Dict]:
+    """The last MAX_HISTORY_MESSAGES or more messages, from a block boundary.
+
+    The window starts at a multiple of HISTORY_BLOCK_MESSAGES (by each
+    message's "position" in the conversation, else its index), so it holds
+    up to MAX_HISTORY_MESSAGES + HISTORY_BLOCK_MESSAGES - 1 messages and
+    only drops old ones when it moves up a whole block.
+    """
+    if not messages:
+        return []
+    end = messages[-1].get("position", len(messages) - 1) + 1
+    start = max(0, (end - MAX_HISTORY_MESSAGES) // HISTORY_BLOCK_MESSAGES * HISTORY_BLOCK_MESSAGES)
+    return messages[-(end - start):]
+
+
+class _Budget:
+    def __init__(self, tokens: int):
+        self.remaining = tokens
+
+    def take(self, text: str, allow_partial: bool = True) -> Optional[str]:
+        """Return text (possibly truncated) if it fits the remaining budget, else None"""
+        cost = estimate_tokens(text)
+        if cost <= self.remaining:
+            self.remaining -= cost
+            return text
+        if not allow_partial or self.remaining < MIN_PARTIAL_TOKENS:
+            return None
+        text = truncate_to_tokens(text, self.remaining)
+        self.remaining -= estimate_tokens(text)
+        return text or None
+
+
+def pack_rag_prompt(
+    query: str,
+    context_chunks: List[Dict],
+    api_data: Optional[Dict],
+    conversation_history: Optional[List[Dict]],
+    budget_tokens: int,
+    stable_first: bool = False,
+) -> str:
+    """Build the RAG prompt within budget_tokens.
+
+    Sections are filled in priority order: the question, then document chunks
+    in rank order, then history from the most recent message back, then tool
+    data. An item that doesn't fit is cut to the remaining room and everything
+    after it in that section is dropped, so the same inputs always produce the
+    same prompt. The output keeps the usual section order, or with
+    stable_first orders sections from most to least likely to repeat across
+    a conversation's turns (history, documents, tool data, then the
+    question) so a server-side prompt cache can reuse the shared prefix.
+    History is then trimmed in blocks rather than a message at a time (see
+    _stable_history), so consecutive turns usually share it as a prefix.
+    """
+    budget = _Budget(budget_tokens - PROMPT_OVERHEAD_TOKENS)
+
+    # The question always goes in, truncated only if it alone exceeds the budget
+    question = truncate_to_tokens(query, max(budget.remaining, MIN_PARTIAL_TOKENS))
+    budget.remaining -= estimate_tokens(question)
+
+    chunks = []
+    for c in context_chunks:
+        block = budget.take(f"[Source: {c['metadata'].get('filename', 'unknown')}]\n{c['content']}")
+        if block is None:
+            break
+        chunks.append(block)
+        if block.endswith(TRUNCATION_MARK):
+            break
+
+    recent = conversation_history or []
+    recent = _stable_history(recent) if stable_first else recent[-MAX_HISTORY_MESSAGES:]
+    history = []
+    for msg in reversed(recent):
+        line = budget.take(f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}")
+        if line is None:
+            break
+        history.append(line)
+        if line.endswith(TRUNCATION_MARK):
+            break
+    history.reverse()
+
+    external = None
+    if api_data:
+        full = json.dumps(api_data, indent=2)
+        external = budget.take(full, allow_partial=False)
+        if external is None:
+            # Compact form per tool, cutting the first one that overflows
+            parts = []
+            for tool, data in api_data.items():
+                part = budget.take(f'"{tool}": {json.dumps(data, separators=(",", ":"))}')
+                if part is None:
+                    break
+                parts.append(part)
+                if part.endswith(TRUNCATION_MARK):
+                    break
+            external = "\n".join(parts) or None
+
+    prompt_parts = []
+    if history:
+        prompt_parts.append("Conversation History:\n" + "\n".join(history) + "\n")
+    if not stable_first:
+        prompt_parts.append(f"Current Question: {question}\n")
+    if chunks:
+        prompt_parts.append("Document Context:\n" + "\n\n".join(chunks) + "\n")
+    if external:
+        prompt_parts.append(f"External Data:\n{external}\n")
+    if stable_first:
+        prompt_parts.append(f"Current Question: {question}\n")
+    prompt_parts.append(CLOSING_INSTRUCTION)
+
+    return "\n".join(prompt_parts)
@@ -98,6 +98,19 @@ OPENROUTER_MODELS = [
 ]
 
 
+# Context window assumed for models not listed above (e.g. a local llama.cpp
+# server); set "context_length" in the provider's LLM settings to override
+DEFAULT_CONTEXT_LENGTH = 4096
+
+
+def get_context_length(model_id: str) -> int:
+    """Context window in tokens for a known model, else DEFAULT_CONTEXT_LENGTH"""
+    for model in OPENROUTER_MODELS:
+        if model["id"] == model_id:
+            return model["context_length"]
+    return DEFAULT_CONTEXT_LENGTH
+
+
 def get_cloud_provider(provider_id: str) -> Optional[CloudProviderDefinition]:
     """Get cloud provider definition by ID"""
     return CLOUD_PROVIDERS.get(provider_id)
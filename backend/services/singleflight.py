@@ -0,0 +1,145 @@
+import asyncio
+from contextlib import suppress
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional
+
+
+class Broadcast:
+    """Append-only event log read by any number of subscribers.
+
+    Every subscriber sees every event from the first one, so a subscriber
+    that joins late catches up on what was already published before
+    following along live.
+    """
+
+    def __init__(self):
+        self._events: List[Any] = []
+        self._changed = asyncio.Event()
+        self.finished = False
+        self.error: Optional[BaseException] = None
+
+    def publish(self, event: Any):
+        if self.finished:
+            return
+        self._events.append(event)
+        self._wake()
+
+    def finish(self, error: Optional[BaseException] = None):
+        """End the log; subscribers raise error (if any) once they have read every event"""
+        if self.finished:
+            return
+        self.finished = True
+        self.error = error
+        self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def events(self) -> AsyncGenerator[Any, None]:
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self._events):
+                yield self._events[position]
+                position += 1
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+
+class _Flight:
+    def __init__(self, key: str):
+        self.key = key
+        self.broadcast = Broadcast()
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class Subscription:
+    """One request's view of a flight; ``leave`` when done with it"""
+
+    def __init__(self, flights: "SingleFlight", flight: _Flight, leader: bool):
+        self._flights = flights
+        self._flight = flight
+        self.leader = leader
+        self._left = False
+
+    def events(self) -> AsyncGenerator[Any, None]:
+        return self._flight.broadcast.events()
+
+    async def leave(self) -> bool:
+        """Unsubscribe; the last subscriber to leave stops an unfinished producer.
+
+        Returns True if leaving stopped the producer.
+        """
+        if self._left:
+            return False
+        self._left = True
+        return await self._flights._leave(self._flight)
+
+
+class SingleFlight:
+    """Runs one producer per key and fans its events out to every request for that key.
+
+    The first request for a key (the leader) starts ``produce(broadcast)`` as
+    a task of its own; identical requests arriving while it runs (followers)
+    subscribe to the same broadcast instead of starting another. The producer
+    keeps running while anyone is subscribed, so the leader leaving early
+    doesn't cut off its followers.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.abandoned = 0
+
+    def join(self, key: str, produce: Callable[[Broadcast], Awaitable[None]]) -> Subscription:
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.subscribers += 1
+            self.followers += 1
+            return Subscription(self, flight, leader=False)
+
+        flight = _Flight(key)
+        flight.subscribers = 1
+        self._flights[key] = flight
+        self.leaders += 1
+        flight.task = asyncio.ensure_future(self._run(flight, produce))
+        return Subscription(self, flight, leader=True)
+
+    async def _run(self, flight: _Flight, produce: Callable[[Broadcast], Awaitable[None]]):
+        try:
+            await produce(flight.broadcast)
+            flight.broadcast.finish()
+        except asyncio.CancelledError:
+            flight.broadcast.finish(RuntimeError("The shared answer was cancelled"))
+            raise
+        except Exception as e:
+            flight.broadcast.finish(e)
+        finally:
+            # Later requests start a new flight rather than replaying a finished one
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    async def _leave(self, flight: _Flight) -> bool:
+        flight.subscribers -= 1
+        if flight.subscribers > 0 or flight.task.done():
+            return False
+        self.abandoned += 1
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+        flight.task.cancel()
+        with suppress(asyncio.CancelledError):
+            await flight.task
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "abandoned": self.abandoned,
+            "inflight": len(self._flights),
+        }
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ToolResultCache:
+    """TTL cache for external tool results with stale-while-revalidate.
+
+    Results are keyed by tool name and normalized parameters. A result younger
+    than the tool's TTL is served directly; an older one is still served for up
+    to ``stale_seconds`` past its TTL while a background refresh runs. Concurrent
+    requests for the same key share a single upstream call (singleflight).
+    Results carrying an "error" key are never cached.
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = 60.0,
+        stale_seconds: float = 300.0,
+    ):
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.stale_seconds = stale_seconds
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(tool: str, params: Dict[str, Any]) -> str:
+        normalized = {
+            k: v.strip().lower() if isinstance(v, str) else v
+            for k, v in params.items()
+        }
+        return f"{tool}:{json.dumps(normalized, sort_keys=True, default=str)}"
+
+    async def get_or_fetch(self, tool: str, params: Dict[str, Any], fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Return a cached result for (tool, params), calling fetch() when it is missing or expired"""
+        key = self.make_key(tool, params)
+        ttl = self.ttls.get(tool, self.default_ttl)
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            fetched_at, value = entry
+            age = time.time() - fetched_at
+            if age < ttl:
+                self.hits += 1
+                return value
+            if age < ttl + self.stale_seconds:
+                self.stale_hits += 1
+                self._start_fetch(key, fetch)
+                return value
+
+        self.misses += 1
+        return await self._shared_fetch(key, fetch)
+
+    def _start_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        async def run():
+            try:
+                value = await fetch()
+                if not (isinstance(value, dict) and "error" in value):
+                    self._entries[key] = (time.time(), value)
+                return value
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.ensure_future(run())
+        # Background refreshes have no awaiter to surface errors to
+        task.add_done_callback(self._log_failure)
+        self._inflight[key] = task
+        return task
+
+    async def _shared_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        # Shielded so a caller timing out doesn't cancel the fetch other callers share
+        return await asyncio.shield(self._start_fetch(key, fetch))
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Tool fetch failed: %s", task.exception())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
@@ -0,0 +1,439 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+
+try:
+    import fcntl  # Locks the flat index across worker processes (POSIX only)
+except ImportError:
+    fcntl = None
+
+# Rows in the flat index file are preallocated in blocks of this size
+FLAT_INDEX_MIN_CAPACITY = 1024
+# Deleted rows are compacted away once they make up this share of the index
+FLAT_INDEX_COMPACT_RATIO = 0.25
+# Rows scored per block when vectors are stored as float16
+FLAT_INDEX_SCORE_BLOCK = 65536
+
+
+class VectorBackend(ABC):
+    """Storage and nearest-neighbour search for embedded document chunks.
+
+    Results are dicts with "id", "content", "metadata" and, for queries,
+    a cosine similarity "score".
+    """
+
+    @abstractmethod
+    def add(self, ids: List[str], documents: List[str], embeddings: List[List[float]], metadatas: List[Dict]):
+        """Store chunks with their embeddings"""
+
+    @abstractmethod
+    def query(self, embedding: List[float], n_results: int = 5, file_filters: List[str] = None) -> List[Dict]:
+        """Return the n_results chunks most similar to embedding, best first"""
+
+    @abstractmethod
+    def get(self, ids: Optional[List[str]] = None) -> List[Dict]:
+        """Return the chunks with the given IDs (all chunks if ids is None)"""
+
+    @abstractmethod
+    def delete_filename(self, filename: str):
+        """Delete all chunks from a document"""
+
+    @abstractmethod
+    def list_filenames(self) -> List[str]:
+        """List all unique document names"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored chunks"""
+
+
+class ChromaBackend(VectorBackend):
+    """ChromaDB collection with an HNSW cosine index"""
+
+    def __init__(self, persist_dir: str):
+        # Initialize ChromaDB (fast, local)
+        self.client = chromadb.PersistentClient(
+            path=persist_dir,
+            settings=Settings(anonymized_telemetry=False)
+        )
+        # Get or create collection
+        self.collection = self.client.get_or_create_collection(
+            name="documents",
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def add(self, ids, documents, embeddings, metadatas):
+        self.collection.add(
+            documents=documents,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            ids=ids
+        )
+
+    def query(self, embedding, n_results=5, file_filters=None):
+        where_clause = None
+        if file_filters:
+            if len(file_filters) == 1:
+                where_clause = {"filename": file_filters[0]}
+            else:
+                where_clause = {"filename": {"$in": file_filters}}
+
+        results = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            where=where_clause,
+            include=["documents", "metadatas", "distances"]
+        )
+
+        if not results["documents"]:
+            return []
+
+        documents = results["documents"][0]
+        ids = results["ids"][0] if results.get("ids") else [None] * len(documents)
+        return [
+            {
+                "id": doc_id,
+                "content": doc,
+                "metadata": meta,
+                "score": 1 - dist  # Convert distance to similarity
+            }
+            for doc_id, doc, meta, dist in zip(
+                ids,
+                documents,
+                results["metadatas"][0],
+                results["distances"][0]
+            )
+        ]
+
+    def get(self, ids=None):
+        if ids is not None:
+            results = self.collection.get(ids=ids, include=["documents", "metadatas"])
+        else:
+            results = self.collection.get(include=["documents", "metadatas"])
+        return [
+            {"id": doc_id, "content": doc, "metadata": meta}
+            for doc_id, doc, meta in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+
+    def delete_filename(self, filename):
+        self.collection.delete(where={"filename": filename})
+
+    def list_filenames(self):
+        results = self.collection.get(include=["metadatas"])
+        filenames = set(m.get("filename", "unknown") for m in results["metadatas"])
+        return list(filenames)
+
+    def count(self):
+        return self.collection.count()
+
+
+class NumpyFlatBackend(VectorBackend):
+    """Exact cosine search over a memory-mapped NumPy matrix.
+
+    Normalized vectors live in one contiguous ``vectors.npy`` matrix, so a
+    query is a single matrix-vector product followed by an argpartition
+    top-k. Chunk text and metadata are kept in SQLite alongside it. Filename
+    filters are applied as boolean row masks, cached per filename.
+
+    Deleted rows are masked out and compacted away once they make up a
+    quarter of the matrix. Growing or compacting writes a new file that
+    replaces the old one, so concurrent queries keep reading a consistent
+    snapshot.
+
+    Several worker processes can share one index directory. Writes hold an
+    exclusive lock on ``index.lock`` and bump a generation number stored
+    with the chunks; a process that sees a newer generation reloads the
+    index before its next query or write.
+    """
+
+    def __init__(self, index_dir: str, dtype: str = "float32"):
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.matrix_path = self.index_dir / "vectors.npy"
+        self.db_path = str(self.index_dir / "chunks.db")
+        self.lock_path = self.index_dir / "index.lock"
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self._generation: Optional[int] = None  # index generation loaded by this process
+        self._init_database()
+        with self._lock:
+            self._refresh()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path)
+
+    def _init_database(self):
+        """Initialize database schema"""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    row INTEGER PRIMARY KEY,
+                    id TEXT UNIQUE NOT NULL,
+                    filename TEXT NOT NULL,
+                    document TEXT NOT NULL,
+                    metadata TEXT NOT NULL
+                )
+            """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_filename ON chunks(filename)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS index_state (id INTEGER PRIMARY KEY CHECK (id = 1), generation INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO index_state (id, generation) VALUES (1, 0)")
+            conn.commit()
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """Lock the index against writes from other worker processes"""
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield  # Closing the file releases the lock
+
+    @contextmanager
+    def _write_lock(self):
+        """Hold the index exclusively, reloaded first if another process changed it"""
+        with self._lock, self._file_lock():
+            if self._read_generation() != self._generation:
+                self._load()
+            yield
+
+    def _read_generation(self, conn: Optional[sqlite3.Connection] = None) -> int:
+        if conn is None:
+            with self._connect() as conn:
+                return self._read_generation(conn)
+        return conn.execute("SELECT generation FROM index_state").fetchone()[0]
+
+    def _bump_generation(self, conn: sqlite3.Connection):
+        """Record a change for other processes, in the same transaction as the change"""
+        conn.execute("UPDATE index_state SET generation = generation + 1")
+        self._generation = self._read_generation(conn)
+
+    def _refresh(self):
+        """Reload if another process changed the index (caller holds the lock)"""
+        if self._read_generation() != self._generation:
+            with self._file_lock(shared=True):
+                self._load()
+
+    def _load(self):
+        """Load the index from disk (caller holds the lock and a file lock)"""
+        self._matrix: Optional[np.ndarray] = None
+        self._rows = 0  # rows in use, including deleted ones
+        self._ids: List[Optional[str]] = []  # row -> chunk ID, None once deleted
+        self._alive = np.zeros(0, dtype=bool)
+        self._file_codes = np.zeros(0, dtype=np.int32)
+        self._filenames: Dict[str, int] = {}
+        self._file_masks: Dict[str, np.ndarray] = {}
+        with self._connect() as conn:
+            self._generation = self._read_generation(conn)
+            rows = conn.execute("SELECT row, id, filename FROM chunks ORDER BY row").fetchall()
+
+        if not rows or not self.matrix_path.exists():
+            return
+        self._matrix = np.load(self.matrix_path, mmap_mode="r+")
+        self._rows = rows[-1][0] + 1
+        self._ids = [None] * self._rows
+        self._alive = np.zeros(len(self._matrix), dtype=bool)
+        self._file_codes = np.full(len(self._matrix), -1, dtype=np.int32)
+        for row, chunk_id, filename in rows:
+            self._ids[row] = chunk_id
+            self._alive[row] = True
+            self._file_codes[row] = self._filenames.setdefault(filename, len(self._filenames))
+
+    def _write_matrix(self, matrix: np.ndarray, capacity: int) -> np.ndarray:
+        """Write matrix into a new file of the given row capacity and swap it in"""
+        tmp_path = self.index_dir / "vectors.tmp.npy"
+        new = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=self.dtype, shape=(capacity, matrix.shape[1]))
+        new[:len(matrix)] = matrix
+        new.flush()
+        del new
+        os.replace(tmp_path, self.matrix_path)
+        return np.load(self.matrix_path, mmap_mode="r+")
+
+    def _ensure_capacity(self, rows: int, dim: int):
+        if self._matrix is not None and len(self._matrix) >= rows:
+            return
+        capacity = max(FLAT_INDEX_MIN_CAPACITY, rows * 2)
+        current = self._matrix[:self._rows] if self._matrix is not None else np.zeros((0, dim), self.dtype)
+        self._matrix = self._write_matrix(current, capacity)
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+        self._file_codes = np.concatenate(
+            [self._file_codes, np.full(capacity - len(self._file_codes), -1, dtype=np.int32)]
+        )
+        self._file_masks = {}
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def add(self, ids, documents, embeddings, metadatas):
+        if not ids:
+            return
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+
+        with self._write_lock():
+            start = self._rows
+            stop = start + len(ids)
+            self._ensure_capacity(stop, vectors.shape[1])
+            self._matrix[start:stop] = vectors
+            self._matrix.flush()
+
+            filenames = [m.get("filename", "unknown") for m in metadatas]
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT INTO chunks (row, id, filename, document, metadata) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (row, chunk_id, filename, doc, json.dumps(meta))
+                        for row, chunk_id, filename, doc, meta in zip(
+                            range(start, stop), ids, filenames, documents, metadatas
+                        )
+                    ],
+                )
+                self._bump_generation(conn)
+                conn.commit()
+
+            for row, filename in zip(range(start, stop), filenames):
+                self._file_codes[row] = self._filenames.setdefault(filename, len(self._filenames))
+            self._alive[start:stop] = True
+            self._ids.extend(ids)
+            self._rows = stop
+            self._file_masks = {}
+
+    def _filter_mask(self, file_filters: Optional[List[str]]) -> np.ndarray:
+        """Boolean mask of live rows matching the filename filters (caller holds the lock)"""
+        mask = self._alive[:self._rows].copy()
+        if file_filters:
+            allowed = np.zeros(self._rows, dtype=bool)
+            for filename in file_filters:
+                if filename not in self._filenames:
+                    continue
+                if filename not in self._file_masks:
+                    self._file_masks[filename] = self._file_codes == self._filenames[filename]
+                allowed |= self._file_masks[filename][:self._rows]
+            mask &= allowed
+        return mask
+
+    def _scores(self, matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+        if matrix.dtype == np.float32:
+            return matrix @ query
+        # Half-precision storage is upcast block by block to use float32 BLAS
+        return np.concatenate([
+            matrix[i:i + FLAT_INDEX_SCORE_BLOCK].astype(np.float32) @ query
+            for i in range(0, len(matrix), FLAT_INDEX_SCORE_BLOCK)
+        ])
+
+    def query(self, embedding, n_results=5, file_filters=None):
+        with self._lock:
+            self._refresh()
+            if self._matrix is None or not self._rows:
+                return []
+            # Snapshot: appends only touch rows past _rows, rewrites swap in new objects
+            matrix = self._matrix[:self._rows]
+            ids = self._ids
+            mask = self._filter_mask(file_filters)
+
+        candidates = int(mask.sum())
+        if not candidates:
+            return []
+        k = min(n_results, candidates)
+
+        query = self._normalize(np.asarray(embedding, dtype=np.float32))
+        scores = self._scores(matrix, query)
+        scores[~mask] = -np.inf
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        found = {r["id"]: r for r in self.get([ids[row] for row in top])}
+        return [
+            {**found[ids[row]], "score": float(scores[row])}
+            for row in top
+            if ids[row] in found
+        ]
+
+    def get(self, ids=None):
+        with self._connect() as conn:
+            if ids is None:
+                rows = conn.execute("SELECT id, document, metadata FROM chunks ORDER BY row").fetchall()
+            else:
+                placeholders = ", ".join("?" for _ in ids)
+                rows = conn.execute(
+                    f"SELECT id, document, metadata FROM chunks WHERE id IN ({placeholders})", ids
+                ).fetchall()
+        found = {
+            chunk_id: {"id": chunk_id, "content": doc, "metadata": json.loads(meta)}
+            for chunk_id, doc, meta in rows
+        }
+        order = ids if ids is not None else [r[0] for r in rows]
+        return [found[chunk_id] for chunk_id in order if chunk_id in found]
+
+    def delete_filename(self, filename):
+        with self._write_lock():
+            with self._connect() as conn:
+                deleted = [r[0] for r in conn.execute("SELECT row FROM chunks WHERE filename = ?", (filename,))]
+                conn.execute("DELETE FROM chunks WHERE filename = ?", (filename,))
+                if deleted:
+                    self._bump_generation(conn)
+                conn.commit()
+            if not deleted:
+                return
+
+            ids = list(self._ids)
+            for row in deleted:
+                ids[row] = None
+            self._ids = ids
+            self._alive[deleted] = False
+            self._file_masks = {}
+
+            if self._rows - int(self._alive[:self._rows].sum()) > self._rows * FLAT_INDEX_COMPACT_RATIO:
+                self._compact()
+
+    def _compact(self):
+        """Drop deleted rows from the matrix and renumber the rest (caller holds the write lock)"""
+        live = np.flatnonzero(self._alive[:self._rows])
+        capacity = max(FLAT_INDEX_MIN_CAPACITY, len(live) * 2)
+        self._matrix = self._write_matrix(self._matrix[live], capacity)
+
+        # Rows only move down, so renumbering in ascending order never collides
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE chunks SET row = ? WHERE row = ?",
+                [(new, int(old)) for new, old in enumerate(live) if new != old],
+            )
+            self._bump_generation(conn)
+            conn.commit()
+
+        self._ids = [self._ids[row] for row in live]
+        self._file_codes = np.concatenate(
+            [self._file_codes[live], np.full(capacity - len(live), -1, dtype=np.int32)]
+        )
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._alive[:len(live)] = True
+        self._rows = len(live)
+        self._file_masks = {}
+
+    def list_filenames(self):
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute("SELECT DISTINCT filename FROM chunks")]
+
+    def count(self):
+        with self._lock:
+            self._refresh()
+            return int(self._alive[:self._rows].sum())
+
+
+def create_vector_backend(settings) -> VectorBackend:
+    """Build the vector backend selected by settings.vector_backend"""
+    if settings.vector_backend == "numpy":
+        return NumpyFlatBackend(settings.numpy_index_dir, dtype=settings.numpy_index_dtype)
+    return ChromaBackend(settings.chroma_persist_dir)
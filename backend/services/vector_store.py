@@ -1,25 +1,32 @@
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict
+from typing import List, Dict, Optional
+from pathlib import Path
 import uuid
 from config import get_settings
+from services.embedding_cache import EmbeddingCache
+from services.bm25_index import BM25Index, reciprocal_rank_fusion
+from services.vector_backends import create_vector_backend
 
 class VectorStoreService:
     def __init__(self):
         settings = get_settings()
-        # Initialize ChromaDB (fast, local)
-        self.client = chromadb.PersistentClient(
-            path=settings.chroma_persist_dir,
-            settings=Settings(anonymized_telemetry=False)
-        )
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name="documents",
-            metadata={"hnsw:space": "cosine"}
-        )
+        # Chroma (default) or the in-process NumPy flat index, per settings.vector_backend
+        self.backend = create_vector_backend(settings)
         # Defer loading the embedding model to first use to avoid blocking app startup
         self.embedding_model = None
         self.embedding_model_name = settings.embedding_model
+        # Embeddings are cached by (model, text hash) next to the Chroma directory
+        self.embedding_cache = None
+        if settings.embedding_cache_enabled:
+            self.embedding_cache = EmbeddingCache(
+                str(Path(settings.chroma_persist_dir).parent / "embedding_cache.db"),
+                memory_items=settings.embedding_cache_memory_items,
+                max_mb=settings.embedding_cache_max_mb,
+            )
+        # Lexical BM25 index kept in sync with the collection, used by hybrid search
+        self.lexical_index = BM25Index(str(Path(settings.chroma_persist_dir).parent / "bm25_index.db"))
+        self._lexical_backfilled = False
+        self.retrieval_mode = settings.retrieval_mode
+        self.hybrid_candidates = settings.hybrid_candidates
 
     def reload_embedding_model(self, model_name: str):
         # Lazy reload
@@ -31,62 +38,84 @@ class VectorStoreService:
         if self.embedding_model is None:
             from sentence_transformers import SentenceTransformer
             self.embedding_model = SentenceTransformer(self.embedding_model_name)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, only encoding those missing from the embedding cache"""
+        if self.embedding_cache is None:
+            self._ensure_model()
+            return self.embedding_model.encode(texts).tolist()
+
+        model_name = self.embedding_model_name
+        vectors = self.embedding_cache.get_many(model_name, texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            self._ensure_model()
+            encoded = dict(zip(missing, self.embedding_model.encode(missing).tolist()))
+            self.embedding_cache.put_many(model_name, missing, [encoded[t] for t in missing])
+            vectors = [v if v is not None else encoded[t] for t, v in zip(texts, vectors)]
+        return vectors
     
-    def add_documents(self, chunks: List[str], metadata: List[Dict]) -> int:
-        """Add document chunks to vector store"""
-        self._ensure_model()
-        embeddings = self.embedding_model.encode(chunks).tolist()
+    def add_documents(
+        self, chunks: List[str], metadata: List[Dict], embeddings: Optional[List[List[float]]] = None
+    ) -> int:
+        """Add document chunks to vector store, embedding them unless embeddings are given"""
+        if embeddings is None:
+            embeddings = self.embed(chunks)
         ids = [str(uuid.uuid4()) for _ in chunks]
         
-        self.collection.add(
-            documents=chunks,
-            embeddings=embeddings,
-            metadatas=metadata,
-            ids=ids
-        )
+        self.backend.add(ids, chunks, embeddings, metadata)
+        self.lexical_index.add(ids, chunks, metadata)
         return len(chunks)
     
-    def search(self, query: str, n_results: int = 5, file_filters: List[str] = None) -> List[Dict]:
-        """Search for relevant chunks"""
-        self._ensure_model()
-        query_embedding = self.embedding_model.encode([query]).tolist()
-        
-        where_clause = None
-        if file_filters:
-            if len(file_filters) == 1:
-                where_clause = {"filename": file_filters[0]}
-            else:
-                where_clause = {"filename": {"$in": file_filters}}
-        
-        results = self.collection.query(
-            query_embeddings=query_embedding,
-            n_results=n_results,
-            where=where_clause,
-            include=["documents", "metadatas", "distances"]
+    def search(
+        self, query: str, n_results: int = 5, file_filters: List[str] = None, mode: Optional[str] = None
+    ) -> List[Dict]:
+        """Search for relevant chunks; mode is "vector" or "hybrid" (defaults to the configured mode)"""
+        query_embedding = self.embed([query])
+        if (mode or self.retrieval_mode) != "hybrid":
+            return self.search_by_embedding(query_embedding, n_results, file_filters)
+
+        candidates = max(n_results, self.hybrid_candidates)
+        return reciprocal_rank_fusion(
+            [
+                self.search_by_embedding(query_embedding, candidates, file_filters),
+                self.lexical_search(query, candidates, file_filters),
+            ],
+            n_results,
         )
-        
-        if not results["documents"]:
+
+    def search_by_embedding(
+        self, query_embeddings: List[List[float]], n_results: int = 5, file_filters: List[str] = None
+    ) -> List[Dict]:
+        """Search for relevant chunks using precomputed query embeddings"""
+        return self.backend.query(query_embeddings[0], n_results, file_filters)
+
+    def lexical_search(self, query: str, n_results: int = 5, file_filters: List[str] = None) -> List[Dict]:
+        """Search for chunks by BM25 keyword relevance"""
+        self._backfill_lexical_index()
+        hits = self.lexical_index.search(query, n_results, file_filters)
+        if not hits:
             return []
 
-        return [
-            {
-                "content": doc,
-                "metadata": meta,
-                "score": 1 - dist  # Convert distance to similarity
-            }
-            for doc, meta, dist in zip(
-                results["documents"][0],
-                results["metadatas"][0],
-                results["distances"][0]
+        found = {r["id"]: r for r in self.backend.get([doc_id for doc_id, _ in hits])}
+        return [{**found[doc_id], "bm25_score": score} for doc_id, score in hits if doc_id in found]
+
+    def _backfill_lexical_index(self):
+        """Index chunks stored before the lexical index existed"""
+        if self._lexical_backfilled:
+            return
+        if len(self.lexical_index) == 0 and self.backend.count() > 0:
+            chunks = self.backend.get()
+            self.lexical_index.add(
+                [c["id"] for c in chunks], [c["content"] for c in chunks], [c["metadata"] for c in chunks]
             )
-        ]
+        self._lexical_backfilled = True
     
     def delete_document(self, filename: str):
         """Delete all chunks from a document"""
-        self.collection.delete(where={"filename": filename})
+        self.backend.delete_filename(filename)
+        self.lexical_index.remove_filename(filename)
     
     def list_documents(self) -> List[str]:
         """List all unique document names"""
-        results = self.collection.get(include=["metadatas"])
-        filenames = set(m.get("filename", "unknown") for m in results["metadatas"])
-        return list(filenames)
+        return self.backend.list_filenames()
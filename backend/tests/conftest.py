@@ -15,11 +15,20 @@ from services.llm_service import LLMService
 from services.vector_store import VectorStoreService
 from services.conversation_service import ConversationService
 from services.api_tools import APIToolsService
+from services.tool_cache import ToolResultCache
+from services.async_vector_store import AsyncVectorStore
+from services.answer_cache import SemanticAnswerCache
+from services.ingestion_jobs import IngestionJobService
+from services.completion_cache import CompletionCache
 from dependencies import (
     get_llm_service,
     get_vector_store,
+    get_async_vector_store,
+    get_answer_cache,
     get_conversation_service,
-    get_api_tools
+    get_api_tools,
+    get_ingestion_jobs,
+    get_completion_cache,
 )
 
 
@@ -43,6 +52,7 @@ def mock_llm_service():
     
     mock.generate_stream = Mock(return_value=mock_stream())
     mock.build_rag_prompt = Mock(return_value="Test prompt")
+    mock.generation_params = Mock(return_value={"provider": "local", "model": "test-model", "temperature": 0.7})
     return mock
 
 
@@ -56,6 +66,9 @@ def mock_vector_store():
             "metadata": {"filename": "test.txt"}
         }
     ])
+    mock.embed = Mock(side_effect=lambda texts: [[0.1, 0.2, 0.3] for _ in texts])
+    mock.search_by_embedding = Mock(return_value=mock.search.return_value)
+    mock.lexical_search = Mock(return_value=[])
     mock.add_documents = Mock(return_value=5)
     mock.list_documents = Mock(return_value=["test.txt", "example.pdf"])
     mock.delete_document = Mock()
@@ -83,21 +96,63 @@ def mock_api_tools():
     mock.get_crypto_price = AsyncMock(return_value={"price": 50000})
     mock.get_weather = AsyncMock(return_value={"temp": 72})
     mock.get_hacker_news_top = AsyncMock(return_value={"stories": []})
+    mock.cache = ToolResultCache()
     return mock
 
 
+@pytest.fixture
+def async_vector_store(mock_vector_store):
+    """Async facade over the mock vector store."""
+    service = AsyncVectorStore(mock_vector_store)
+    yield service
+    service.shutdown()
+
+
+@pytest.fixture
+def answer_cache(async_vector_store):
+    """Semantic answer cache invalidated by the mock vector store."""
+    cache = SemanticAnswerCache()
+    async_vector_store.on_document_changed(cache.invalidate_document)
+    return cache
+
+
+@pytest.fixture
+def ingestion_jobs(tmp_path, async_vector_store):
+    """Ingestion job service on a temporary database (workers not started)."""
+    return IngestionJobService(
+        str(tmp_path / "ingestion_jobs.db"),
+        async_vector_store,
+    )
+
+
+@pytest.fixture
+def completion_cache(tmp_path):
+    """Completion cache on a temporary database."""
+    cache = CompletionCache(str(tmp_path / "completion_cache.db"))
+    yield cache
+    cache.close()
+
+
 @pytest.fixture
 def override_dependencies(
     mock_llm_service,
     mock_vector_store,
+    async_vector_store,
+    answer_cache,
     mock_conversation_service,
-    mock_api_tools
+    mock_api_tools,
+    ingestion_jobs,
+    completion_cache,
 ):
     """Override FastAPI dependencies with mocks."""
     app.dependency_overrides[get_llm_service] = lambda: mock_llm_service
     app.dependency_overrides[get_vector_store] = lambda: mock_vector_store
+    app.dependency_overrides[get_async_vector_store] = lambda: async_vector_store
+    app.dependency_overrides[get_answer_cache] = lambda: answer_cache
     app.dependency_overrides[get_conversation_service] = lambda: mock_conversation_service
     app.dependency_overrides[get_api_tools] = lambda: mock_api_tools
+    app.dependency_overrides[get_ingestion_jobs] = lambda: ingestion_jobs
+    app.dependency_overrides[get_completion_cache] = lambda: completion_cache
 
     yield
 
@@ -18,11 +18,11 @@ class TestDocumentsAPI:
 
         response = test_client.post("/api/documents/upload", files=files)
 
-        assert response.status_code == 200
+        assert response.status_code == 202
         data = response.json()
         assert data["filename"] == "test.txt"
-        assert "chunks_created" in data
-        assert data["status"] == "success"
+        assert "job_id" in data
+        assert data["status"] == "queued"
 
     def test_upload_pdf_document(self, test_client, override_dependencies):
         """Test uploading a PDF document."""
@@ -34,12 +34,10 @@ class TestDocumentsAPI:
 
         response = test_client.post("/api/documents/upload", files=files)
 
-        # May fail with 500 because content is not real PDF - that's OK for integration test
-        # The important thing is that it accepts the MIME type and attempts processing
-        assert response.status_code in [200, 500]
-        if response.status_code == 200:
-            data = response.json()
-            assert data["filename"] == "test.pdf"
+        # Extraction happens in the background job, so the upload itself is accepted
+        assert response.status_code == 202
+        data = response.json()
+        assert data["filename"] == "test.pdf"
 
     def test_upload_docx_document(self, test_client, override_dependencies):
         """Test uploading a DOCX document."""
@@ -55,11 +53,10 @@ class TestDocumentsAPI:
 
         response = test_client.post("/api/documents/upload", files=files)
 
-        # May fail with 500 because content is not real DOCX
-        assert response.status_code in [200, 500]
-        if response.status_code == 200:
-            data = response.json()
-            assert data["filename"] == "test.docx"
+        # Extraction happens in the background job, so the upload itself is accepted
+        assert response.status_code == 202
+        data = response.json()
+        assert data["filename"] == "test.docx"
 
     def test_upload_unsupported_file_type(self, test_client, override_dependencies):
         """Test uploading unsupported file type."""
@@ -110,7 +107,7 @@ class TestDocumentsAPI:
 
         # Should ideally be 413, but with mocked dependencies may process successfully
         # The important thing is the endpoint handles large files
-        assert response.status_code in [200, 413, 500]
+        assert response.status_code in [202, 413, 500]
         if response.status_code == 413 or response.status_code == 400:
             response_data = response.json()
             # Our ValidationError returns 400, not 413
@@ -160,20 +157,45 @@ class TestDocumentsAPI:
         # Should still return 200 (idempotent delete)
         assert response.status_code == 200
 
-    def test_upload_document_verifies_chunks(self, test_client, override_dependencies, mock_vector_store):
-        """Test that upload creates expected number of chunks."""
-        mock_vector_store.add_documents.return_value = 5
-
+    def test_upload_creates_ingestion_job(self, test_client, override_dependencies):
+        """Test that upload creates a job whose status can be polled."""
         content = b"Test document content for chunking."
         files = {
             "file": ("test.txt", BytesIO(content), "text/plain")
         }
 
         response = test_client.post("/api/documents/upload", files=files)
+        job_id = response.json()["job_id"]
+
+        response = test_client.get(f"/api/documents/jobs/{job_id}")
 
         assert response.status_code == 200
         data = response.json()
-        assert data["chunks_created"] == 5
+        assert data["id"] == job_id
+        assert data["filename"] == "test.txt"
+        assert data["status"] == "queued"
+        assert data["progress"] == 0
+
+    async def test_invalid_pdf_job_fails_with_error(self, test_client, override_dependencies, ingestion_jobs):
+        """Test an unreadable PDF is reported as a failed job rather than a server error."""
+        files = {
+            "file": ("broken.pdf", BytesIO(b"%PDF-1.4 not really a pdf"), "application/pdf")
+        }
+        job_id = test_client.post("/api/documents/upload", files=files).json()["job_id"]
+
+        await ingestion_jobs.run_job(job_id)
+        response = test_client.get(f"/api/documents/jobs/{job_id}")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "failed"
+        assert data["error"]
+
+    def test_get_unknown_ingestion_job(self, test_client, override_dependencies):
+        """Test polling a job that does not exist."""
+        response = test_client.get("/api/documents/jobs/does-not-exist")
+
+        assert response.status_code == 404
 
     def test_upload_without_file(self, test_client, override_dependencies):
         """Test upload endpoint without providing file."""
@@ -191,7 +213,7 @@ class TestDocumentsAPI:
 
         # Could be 200 with 0 chunks or 400 depending on implementation
         # Current implementation would likely process it
-        assert response.status_code in [200, 400, 500]
+        assert response.status_code in [202, 400, 500]
 
     def test_upload_multiple_sequential(self, test_client, override_dependencies):
         """Test uploading multiple documents sequentially."""
@@ -202,7 +224,7 @@ class TestDocumentsAPI:
             }
 
             response = test_client.post("/api/documents/upload", files=files)
-            assert response.status_code == 200
+            assert response.status_code == 202
 
     def test_delete_with_special_characters(self, test_client, override_dependencies):
         """Test deleting document with special characters in filename."""
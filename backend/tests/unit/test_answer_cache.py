@@ -0,0 +1,80 @@
+"""
+Unit tests for SemanticAnswerCache.
+"""
+import pytest
+from unittest.mock import patch
+
+from services.answer_cache import SemanticAnswerCache
+
+PARAMS = {"model": "test-model", "temperature": 0.7}
+CHUNKS = [{"id": "c1", "content": "Alpha", "metadata": {"filename": "a.txt"}}]
+
+
+@pytest.fixture
+def cache():
+    return SemanticAnswerCache(threshold=0.9, ttl_seconds=60, max_entries=2)
+
+
+@pytest.mark.unit
+class TestSemanticAnswerCache:
+    """Test suite for SemanticAnswerCache."""
+
+    def test_similar_question_hits(self, cache):
+        """A question within the cosine threshold reuses the cached answer."""
+        key = cache.context_key(CHUNKS, PARAMS)
+        cache.store([1.0, 0.0], key, "Cached answer", ["a.txt"])
+
+        hit = cache.lookup([0.95, 0.1], key)
+
+        assert hit["response"] == "Cached answer"
+        assert hit["sources"] == ["a.txt"]
+        assert cache.lookup([0.0, 1.0], key) is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hit_rate"] == 0.5
+
+    def test_context_key_covers_chunks_params_and_history(self, cache):
+        """Different chunks, sampling parameters or history never share answers."""
+        key = cache.context_key(CHUNKS, PARAMS)
+        cache.store([1.0, 0.0], key, "Cached answer", ["a.txt"])
+
+        other_chunks = cache.context_key([{"id": "c2", "content": "Beta"}], PARAMS)
+        other_params = cache.context_key(CHUNKS, {**PARAMS, "temperature": 0.2})
+        with_history = cache.context_key(CHUNKS, PARAMS, [{"role": "user", "content": "Hi"}])
+
+        assert len({key, other_chunks, other_params, with_history}) == 4
+        assert cache.lookup([1.0, 0.0], other_chunks) is None
+
+    def test_entries_expire(self, cache):
+        """Entries older than the TTL are not served."""
+        key = cache.context_key(CHUNKS, PARAMS)
+        with patch('services.answer_cache.time.time', return_value=1000.0):
+            cache.store([1.0, 0.0], key, "Old answer", ["a.txt"])
+
+        with patch('services.answer_cache.time.time', return_value=1061.0):
+            assert cache.lookup([1.0, 0.0], key) is None
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction(self, cache):
+        """The least recently used entry is evicted beyond max_entries."""
+        keys = [cache.context_key([{"id": str(i), "content": ""}], PARAMS) for i in range(3)]
+        cache.store([1.0, 0.0], keys[0], "zero", [])
+        cache.store([1.0, 0.0], keys[1], "one", [])
+        cache.lookup([1.0, 0.0], keys[0])  # refresh entry 0
+        cache.store([1.0, 0.0], keys[2], "two", [])
+
+        assert cache.lookup([1.0, 0.0], keys[1]) is None
+        assert cache.lookup([1.0, 0.0], keys[0])["response"] == "zero"
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidate_document(self, cache):
+        """Answers built from a document are dropped when it changes."""
+        key = cache.context_key(CHUNKS, PARAMS)
+        cache.store([1.0, 0.0], key, "Cached answer", ["a.txt"])
+
+        cache.invalidate_document("other.txt")
+        assert cache.lookup([1.0, 0.0], key) is not None
+
+        cache.invalidate_document("a.txt")
+        assert cache.lookup([1.0, 0.0], key) is None
+        assert cache.stats()["invalidations"] == 1
@@ -1,6 +1,7 @@
 """
 Unit tests for APIToolsService.
 """
+import asyncio
 import pytest
 from unittest.mock import Mock, AsyncMock, patch
 import httpx
@@ -271,6 +272,92 @@ class TestAPIToolsService:
 
                 assert result["stories"] == []
 
+    @staticmethod
+    def _hn_client(delays, in_flight):
+        """Fake client serving ids 1..n, with per-item delays, tracking concurrent item requests"""
+        async def get(url):
+            response = Mock()
+            if url.endswith("topstories.json"):
+                response.json.return_value = list(range(1, len(delays) + 1))
+                return response
+            sid = int(url.rsplit("/", 1)[1].split(".")[0])
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(delays[sid - 1])
+            in_flight["now"] -= 1
+            response.json.return_value = {"title": f"Story {sid}", "score": sid}
+            return response
+
+        mock_client = AsyncMock()
+        mock_client.__aenter__.return_value = mock_client
+        mock_client.get = AsyncMock(side_effect=get)
+        return mock_client
+
+    @pytest.mark.asyncio
+    async def test_get_hacker_news_top_bounded_fanout(self):
+        """Test story fetches run concurrently up to the fan-out limit, keeping rank order."""
+        with patch('services.api_tools.get_settings') as mock_settings:
+            mock_settings.return_value.hackernews_fanout = 3
+            mock_settings.return_value.hackernews_item_ttl_seconds = 300
+            service = APIToolsService()
+            in_flight = {"now": 0, "max": 0}
+
+            with patch('httpx.AsyncClient') as mock_client_class:
+                mock_client_class.return_value = self._hn_client([0.03, 0.01, 0.02, 0.01, 0.0, 0.01], in_flight)
+
+                result = await service.get_hacker_news_top(limit=6)
+
+            assert [s["title"] for s in result["stories"]] == [f"Story {i}" for i in range(1, 7)]
+            assert in_flight["max"] == 3
+
+    @pytest.mark.asyncio
+    async def test_get_hacker_news_top_streams_and_caches_items(self):
+        """Test stories reach on_story as they arrive and repeat stories aren't refetched."""
+        with patch('services.api_tools.get_settings') as mock_settings:
+            mock_settings.return_value.hackernews_fanout = 5
+            mock_settings.return_value.hackernews_item_ttl_seconds = 300
+            service = APIToolsService()
+            arrived = []
+
+            async def on_story(rank, story):
+                arrived.append(rank)
+
+            with patch('httpx.AsyncClient') as mock_client_class:
+                mock_client = self._hn_client([0.03, 0.0, 0.01], {"now": 0, "max": 0})
+                mock_client_class.return_value = mock_client
+
+                await service.get_hacker_news_top(limit=3, on_story=on_story)
+                assert arrived == [1, 2, 0]
+
+                # A different limit misses the result cache but reuses cached items
+                await service.get_hacker_news_top(limit=2)
+
+            item_calls = [c for c in mock_client.get.call_args_list if "/item/" in c[0][0]]
+            assert len(item_calls) == 3
+
+    @pytest.mark.asyncio
+    async def test_get_hacker_news_top_skips_failed_items(self):
+        """Test one failing story doesn't fail the whole list."""
+        with patch('services.api_tools.get_settings') as mock_settings:
+            mock_settings.return_value.hackernews_fanout = 5
+            mock_settings.return_value.hackernews_item_ttl_seconds = 300
+            service = APIToolsService()
+
+            ids_response = Mock()
+            ids_response.json.return_value = [1, 2]
+            story = Mock()
+            story.json.return_value = {"title": "Story 2"}
+
+            with patch('httpx.AsyncClient') as mock_client_class:
+                mock_client = AsyncMock()
+                mock_client.__aenter__.return_value = mock_client
+                mock_client.get = AsyncMock(side_effect=[ids_response, httpx.HTTPError("boom"), story])
+                mock_client_class.return_value = mock_client
+
+                result = await service.get_hacker_news_top(limit=2)
+
+            assert [s["title"] for s in result["stories"]] == ["Story 2"]
+
     @pytest.mark.asyncio
     async def test_get_crypto_price_http_error(self):
         """Test cryptocurrency API HTTP error handling."""
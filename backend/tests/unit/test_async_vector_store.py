@@ -0,0 +1,144 @@
+"""
+Unit tests for AsyncVectorStore.
+"""
+import asyncio
+import threading
+import pytest
+from unittest.mock import Mock, patch
+
+from services.async_vector_store import AsyncVectorStore, InstrumentedExecutor
+from services.vector_store import VectorStoreService
+
+
+@pytest.fixture
+def mock_store():
+    store = Mock(spec=VectorStoreService)
+    store.embed = Mock(side_effect=lambda texts: [[float(len(t)), 0.0] for t in texts])
+    store.search_by_embedding = Mock(return_value=[
+        {"content": "Result 1", "metadata": {"filename": "doc1.txt"}, "score": 0.9}
+    ])
+    store.add_documents = Mock(return_value=2)
+    store.list_documents = Mock(return_value=["doc1.txt"])
+    return store
+
+
+@pytest.fixture
+def facade(mock_store):
+    with patch('services.async_vector_store.get_settings') as mock_settings:
+        mock_settings.return_value.vector_query_workers = 2
+        mock_settings.return_value.vector_ingest_workers = 1
+        mock_settings.return_value.embedding_batch_max_size = 16
+        mock_settings.return_value.embedding_batch_wait_ms = 20
+        service = AsyncVectorStore(mock_store)
+    yield service
+    service.shutdown()
+
+
+@pytest.mark.unit
+class TestAsyncVectorStore:
+    """Test suite for AsyncVectorStore."""
+
+    async def test_search_runs_off_loop(self, facade, mock_store):
+        """Search embeds and queries on the query pool, not the loop thread."""
+        loop_thread = threading.get_ident()
+        threads = []
+        mock_store.search_by_embedding.side_effect = (
+            lambda *args: threads.append(threading.get_ident()) or [{"content": "x"}]
+        )
+
+        results = await facade.search("hello", n_results=3, file_filters=["doc1.txt"])
+
+        assert results == [{"content": "x"}]
+        assert threads and threads[0] != loop_thread
+        mock_store.search_by_embedding.assert_called_once_with([[5.0, 0.0]], 3, ["doc1.txt"])
+
+    async def test_concurrent_searches_batch_embeddings(self, facade, mock_store):
+        """Concurrent searches share a single embed call."""
+        await asyncio.gather(*(facade.search(f"query {i}") for i in range(4)))
+
+        assert mock_store.embed.call_count == 1
+        assert mock_store.search_by_embedding.call_count == 4
+
+    async def test_ingestion_uses_ingest_pool(self, facade, mock_store):
+        """add_documents and delete_document run on the ingest pool."""
+        assert await facade.add_documents(["a", "b"], [{}, {}]) == 2
+        await facade.delete_document("doc1.txt")
+
+        stats = facade.stats()
+        assert stats["ingest"]["completed"] == 2
+        assert stats["query"]["completed"] == 0
+        mock_store.delete_document.assert_called_once_with("doc1.txt")
+
+    async def test_document_listeners(self, facade):
+        """Listeners hear about every added or deleted document."""
+        changed = []
+        facade.on_document_changed(changed.append)
+
+        await facade.add_documents(["a", "b"], [{"filename": "x.txt"}, {"filename": "x.txt"}])
+        await facade.delete_document("y.txt")
+
+        assert changed == ["x.txt", "y.txt"]
+
+    async def test_search_reuses_query_embedding(self, facade, mock_store):
+        """A precomputed embedding skips the embed call."""
+        await facade.search("hello", query_embedding=[1.0, 2.0])
+
+        mock_store.embed.assert_not_called()
+        mock_store.search_by_embedding.assert_called_once_with([[1.0, 2.0]], 5, None)
+
+    async def test_list_documents(self, facade):
+        """list_documents returns the underlying store's result."""
+        assert await facade.list_documents() == ["doc1.txt"]
+
+    async def test_hybrid_search_fuses_both_retrievers(self, facade, mock_store):
+        """Hybrid mode queries both retrievers for candidates and fuses the rankings."""
+        facade.hybrid_candidates = 8
+        mock_store.search_by_embedding.return_value = [
+            {"id": "v1", "content": "Vector hit", "metadata": {}, "score": 0.9},
+            {"id": "both", "content": "Shared hit", "metadata": {}, "score": 0.8},
+        ]
+        mock_store.lexical_search = Mock(return_value=[
+            {"id": "both", "content": "Shared hit", "metadata": {}, "bm25_score": 7.1},
+        ])
+
+        results = await facade.search("SKU-1", n_results=2, file_filters=["a.txt"], mode="hybrid")
+
+        assert [r["id"] for r in results] == ["both", "v1"]
+        # The vector similarity stays in "score"; the fused rank has its own key
+        assert (results[0]["score"], results[0]["bm25_score"]) == (0.8, 7.1)
+        assert results[0]["rrf_score"] > results[1]["rrf_score"]
+        mock_store.lexical_search.assert_called_once_with("SKU-1", 8, ["a.txt"])
+        mock_store.search_by_embedding.assert_called_once_with([[5.0, 0.0]], 8, ["a.txt"])
+
+
+@pytest.mark.unit
+class TestInstrumentedExecutor:
+    """Test suite for InstrumentedExecutor."""
+
+    def test_reports_queue_depth_and_wait(self):
+        """Tasks waiting for a busy worker show up as queue depth and wait time."""
+        executor = InstrumentedExecutor("test", max_workers=1)
+        release = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        first = executor.submit(block)
+        started.wait(5)
+        second = executor.submit(lambda: "done")
+
+        stats = executor.stats()
+        assert stats["active"] == 1
+        assert stats["queue_depth"] == 1
+
+        release.set()
+        assert second.result(5) == "done"
+        first.result(5)
+
+        stats = executor.stats()
+        assert stats["queue_depth"] == 0
+        assert stats["completed"] == 2
+        assert stats["max_wait_ms"] > 0
+        executor.shutdown()
@@ -0,0 +1,105 @@
+"""
+Unit tests for the BM25 index and reciprocal rank fusion.
+"""
+import pytest
+
+from services.bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+@pytest.fixture
+def index(tmp_path):
+    return BM25Index(str(tmp_path / "bm25_index.db"))
+
+
+@pytest.mark.unit
+class TestTokenize:
+    """Test suite for tokenize."""
+
+    def test_keeps_identifiers_and_their_parts(self):
+        """Compound identifiers are indexed whole and split."""
+        tokens = tokenize("See ERR-1042 in v2.3.1.")
+
+        assert "err-1042" in tokens
+        assert "err" in tokens and "1042" in tokens
+        assert "v2.3.1" in tokens
+
+
+@pytest.mark.unit
+class TestBM25Index:
+    """Test suite for BM25Index."""
+
+    def test_ranks_rare_terms_higher(self, index):
+        """Documents matching the rarer query term rank first."""
+        index.add(
+            ["a", "b", "c"],
+            ["the cache is warm", "the cache holds SKU-9931", "the queue is empty"],
+            [{"filename": "x.txt"}] * 3,
+        )
+
+        hits = index.search("cache SKU-9931")
+
+        assert [doc_id for doc_id, _ in hits][0] == "b"
+        assert {doc_id for doc_id, _ in hits} == {"a", "b"}
+
+    def test_file_filters(self, index):
+        """Only chunks from the filtered files are returned."""
+        index.add(["a", "b"], ["alpha beta", "alpha gamma"], [{"filename": "one.txt"}, {"filename": "two.txt"}])
+
+        hits = index.search("alpha", file_filters=["two.txt"])
+
+        assert [doc_id for doc_id, _ in hits] == ["b"]
+
+    def test_persists_and_loads_lazily(self, tmp_path, index):
+        """A new instance loads postings from disk on first search."""
+        index.add(["a"], ["persistent postings"], [{"filename": "x.txt"}])
+
+        reopened = BM25Index(str(tmp_path / "bm25_index.db"))
+
+        assert not reopened._loaded
+        assert len(reopened) == 1
+        assert [doc_id for doc_id, _ in reopened.search("postings")] == ["a"]
+        assert reopened._loaded
+
+    def test_updates_loaded_index_incrementally(self, index):
+        """Adds and deletes after loading are reflected in memory and on disk."""
+        index.add(["a"], ["first document"], [{"filename": "one.txt"}])
+        assert index.search("document")
+
+        index.add(["b"], ["second document"], [{"filename": "two.txt"}])
+        index.remove_filename("one.txt")
+
+        assert [doc_id for doc_id, _ in index.search("document")] == ["b"]
+        assert index.search("first") == []
+        assert len(BM25Index(index.db_path)) == 1
+
+    def test_reloads_after_another_process_writes(self, index):
+        """An index sharing the database with another worker picks up that worker's changes."""
+        other = BM25Index(index.db_path)
+        index.add(["a"], ["first document"], [{"filename": "one.txt"}])
+        assert other.search("document")
+
+        index.add(["b"], ["second document"], [{"filename": "two.txt"}])
+        other.add(["c"], ["third document"], [{"filename": "three.txt"}])
+        index.remove_filename("one.txt")
+
+        assert {doc_id for doc_id, _ in other.search("document")} == {"b", "c"}
+        assert {doc_id for doc_id, _ in index.search("document")} == {"b", "c"}
+
+    def test_empty_index(self, index):
+        """Searching an empty index returns nothing."""
+        assert index.search("anything") == []
+
+
+@pytest.mark.unit
+class TestReciprocalRankFusion:
+    """Test suite for reciprocal_rank_fusion."""
+
+    def test_results_in_both_lists_rank_first(self):
+        """Chunks found by both retrievers outrank single-list hits."""
+        vector = [{"id": "a", "content": "A"}, {"id": "b", "content": "B"}]
+        lexical = [{"id": "c", "content": "C"}, {"id": "b", "content": "B"}]
+
+        fused = reciprocal_rank_fusion([vector, lexical], n_results=2)
+
+        assert [r["id"] for r in fused] == ["b", "a"]
+        assert fused[0]["rrf_score"] == pytest.approx(2 / 62)
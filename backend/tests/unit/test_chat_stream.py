@@ -0,0 +1,212 @@
+"""
+Unit tests for WebSocket frame counting, token frame coalescing and cancellation.
+"""
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from fastapi import WebSocketDisconnect
+
+from services.chat_stream import ClientWatcher, FrameSender, GenerationStats, TokenCoalescer
+
+
+@pytest.fixture
+def websocket():
+    ws = MagicMock()
+    ws.send_text = AsyncMock()
+    return ws
+
+
+def sent_frames(websocket):
+    return [json.loads(call.args[0]) for call in websocket.send_text.await_args_list]
+
+
+@pytest.mark.unit
+class TestChatStream:
+    """Test suite for FrameSender and TokenCoalescer."""
+
+    async def test_sender_counts_frames_and_bytes(self, websocket):
+        """Each frame is counted with its UTF-8 encoded size."""
+        sender = FrameSender(websocket)
+
+        await sender.send({"type": "token", "content": "héllo"})
+
+        text = websocket.send_text.await_args.args[0]
+        assert json.loads(text) == {"type": "token", "content": "héllo"}
+        assert sender.frames_sent == 1
+        assert sender.bytes_sent == len(text.encode("utf-8"))
+        sender.close()
+
+    async def test_summary_keeps_totals_after_close(self, websocket):
+        """Closed connections leave the active list but stay in the totals."""
+        before = FrameSender.summary()["totals"]
+        sender = FrameSender(websocket)
+        await sender.send({"type": "start"})
+
+        assert sender.id in [s["id"] for s in FrameSender.summary()["active"]]
+        sender.close()
+        sender.close()
+
+        summary = FrameSender.summary()
+        assert sender.id not in [s["id"] for s in summary["active"]]
+        assert summary["totals"]["connections"] == before["connections"] + 1
+        assert summary["totals"]["frames_sent"] == before["frames_sent"] + 1
+
+    async def test_flushes_when_chars_reached(self, websocket):
+        """Buffered tokens go out as one frame once flush_chars is reached."""
+        sender = FrameSender(websocket)
+        tokens = TokenCoalescer(sender, flush_ms=10_000, flush_chars=10)
+
+        for token in ["Hel", "lo ", "wor", "ld!", " ok"]:
+            await tokens.add(token)
+        await tokens.flush()
+
+        assert sent_frames(websocket) == [
+            {"type": "token", "content": "Hello world!"},
+            {"type": "token", "content": " ok"},
+        ]
+        assert tokens.text() == "Hello world! ok"
+        assert sender.tokens_streamed == 5
+        sender.close()
+
+    async def test_flushes_after_interval(self, websocket):
+        """A partial buffer is sent once flush_ms passes without hitting flush_chars."""
+        sender = FrameSender(websocket)
+        tokens = TokenCoalescer(sender, flush_ms=5, flush_chars=1000)
+
+        await tokens.add("a")
+        await tokens.add("b")
+        assert websocket.send_text.await_count == 0
+        await asyncio.sleep(0.03)
+
+        assert sent_frames(websocket) == [{"type": "token", "content": "ab"}]
+        await tokens.flush()
+        assert websocket.send_text.await_count == 1
+        sender.close()
+
+    async def test_timed_flush_error_raised_by_next_send(self, websocket):
+        """A send failing in a timed flush is raised by the next add, not lost in the timer task."""
+        websocket.send_text = AsyncMock(side_effect=WebSocketDisconnect())
+        sender = FrameSender(websocket)
+        tokens = TokenCoalescer(sender, flush_ms=5, flush_chars=1000)
+
+        await tokens.add("a")
+        await asyncio.sleep(0.03)
+
+        with pytest.raises(WebSocketDisconnect):
+            await tokens.add("b")
+        sender.close()
+
+    async def test_zero_interval_sends_every_token(self, websocket):
+        """flush_ms <= 0 keeps the one-frame-per-token behaviour."""
+        sender = FrameSender(websocket)
+        tokens = TokenCoalescer(sender, flush_ms=0, flush_chars=64)
+
+        for token in ["a", "b", "c"]:
+            await tokens.add(token)
+
+        assert [f["content"] for f in sent_frames(websocket)] == ["a", "b", "c"]
+        sender.close()
+
+
+class FakeClient:
+    """Stands in for a WebSocket whose incoming messages the test controls."""
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+
+    async def receive_text(self):
+        message = await self.incoming.get()
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+
+def endless_tokens(closed):
+    async def stream():
+        try:
+            while True:
+                await asyncio.sleep(0.001)
+                yield "tok "
+        finally:
+            closed.append(True)
+    return stream()
+
+
+async def relay(tokens, stream):
+    """Add every token from stream, closing it even if cancelled midway."""
+    try:
+        async for token in stream:
+            await tokens.add(token)
+    finally:
+        await stream.aclose()
+
+
+@pytest.mark.unit
+class TestClientWatcher:
+    """Test suite for ClientWatcher and GenerationStats."""
+
+    async def test_cancel_message_stops_generation(self, websocket):
+        """A cancel message stops the stream and closes the upstream generator."""
+        client, closed = FakeClient(), []
+        watcher = ClientWatcher(client)
+        tokens = TokenCoalescer(FrameSender(websocket), flush_ms=0, flush_chars=64)
+
+        run = asyncio.create_task(watcher.run(relay(tokens, endless_tokens(closed))))
+        await asyncio.sleep(0.02)
+        client.incoming.put_nowait('{"type": "cancel"}')
+
+        assert await asyncio.wait_for(run, 1) is False
+        assert closed == [True]
+        assert tokens.count > 0
+        assert not watcher.disconnected
+        assert await watcher.receive() == '{"type": "cancel"}'
+        watcher.close()
+
+    async def test_disconnect_stops_generation(self, websocket):
+        """A disconnect stops the stream and is re-raised by the next receive."""
+        client, closed = FakeClient(), []
+        watcher = ClientWatcher(client)
+        tokens = TokenCoalescer(FrameSender(websocket), flush_ms=0, flush_chars=64)
+
+        run = asyncio.create_task(watcher.run(relay(tokens, endless_tokens(closed))))
+        await asyncio.sleep(0.01)
+        client.incoming.put_nowait(WebSocketDisconnect())
+
+        assert await asyncio.wait_for(run, 1) is False
+        assert closed == [True]
+        assert watcher.disconnected
+        with pytest.raises(WebSocketDisconnect):
+            await watcher.receive()
+
+    async def test_other_messages_wait_for_the_next_turn(self):
+        """A new question sent mid-answer doesn't stop it and is received afterwards."""
+        client = FakeClient()
+        watcher = ClientWatcher(client)
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        client.incoming.put_nowait('{"message": "next"}')
+
+        assert await watcher.run(work()) is True
+        assert await watcher.receive() == '{"message": "next"}'
+        watcher.close()
+
+    def test_tokens_saved_uses_mean_completed_length(self):
+        """Stopped answers save the mean completed length minus what was generated."""
+        stats = GenerationStats()
+        stats.record_stopped(10, disconnected=True)
+        stats.record_completed(100)
+        stats.record_completed(200)
+        stats.record_stopped(40, disconnected=False)
+
+        assert stats.stats() == {
+            "completed": 2,
+            "cancelled": 1,
+            "disconnected": 1,
+            "tokens_before_stop": 50,
+            "tokens_saved": 110,
+        }
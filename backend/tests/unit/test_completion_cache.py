@@ -0,0 +1,91 @@
+"""
+Unit tests for the exact-match LLM completion cache.
+"""
+import pytest
+
+from services.completion_cache import CompletionCache
+
+URL = "http://localhost:8080/completion"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CompletionCache(str(tmp_path / "completions.db"))
+    yield cache
+    cache.close()
+
+
+@pytest.mark.unit
+class TestCompletionCache:
+    """Test suite for CompletionCache."""
+
+    def test_key_is_exact_match(self, cache):
+        """Keys match only identical requests, regardless of dict ordering."""
+        request = {"prompt": "Hi", "n_predict": 10, "temperature": 0}
+
+        key = cache.key_for("local", URL, request)
+
+        assert key == cache.key_for("local", URL, {"temperature": 0, "n_predict": 10, "prompt": "Hi"})
+        assert key != cache.key_for("local", URL, {**request, "prompt": "Hi "})
+        assert key != cache.key_for("local", URL, {**request, "n_predict": 11})
+        assert key != cache.key_for("cloud:openai", URL, request)
+
+    def test_sampled_requests_bypass_unless_opted_in(self, tmp_path, cache):
+        """temperature > 0 is not cached by default."""
+        assert cache.key_for("local", URL, {"prompt": "Hi", "temperature": 0.7}) is None
+        assert cache.stats()["bypassed"] == 1
+
+        opted_in = CompletionCache(str(tmp_path / "sampled.db"), cache_sampled=True)
+        assert opted_in.key_for("local", URL, {"prompt": "Hi", "temperature": 0.7}) is not None
+        opted_in.close()
+
+    def test_get_put_and_persistence(self, tmp_path, cache):
+        """Stored completions are returned and survive reopening the database."""
+        key = cache.key_for("local", URL, {"prompt": "Hi", "temperature": 0})
+        assert cache.get(key) is None
+
+        cache.put(key, "local", "m", "Hello there")
+
+        assert cache.get(key) == "Hello there"
+        reopened = CompletionCache(str(tmp_path / "completions.db"))
+        assert reopened.get(key) == "Hello there"
+        assert reopened.stats()["stored_entries"] == 1
+        reopened.close()
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 1, 1)
+
+    def test_expired_entries_miss(self, tmp_path):
+        """Entries older than the TTL are dropped on lookup."""
+        cache = CompletionCache(str(tmp_path / "ttl.db"), ttl_seconds=-1)
+        cache.put("k", "local", "m", "old")
+
+        assert cache.get("k") is None
+        assert cache.stats()["stored_entries"] == 0
+        cache.close()
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Past max_entries the least recently used rows are evicted."""
+        cache = CompletionCache(str(tmp_path / "lru.db"), max_entries=10)
+        for i in range(10):
+            cache.put(f"k{i}", "local", "m", f"v{i}")
+        cache.get("k0")  # Recently used, so kept
+
+        cache.put("k10", "local", "m", "v10")
+
+        assert cache.get("k0") == "v0"
+        assert cache.get("k1") is None
+        assert cache.stats()["stored_entries"] == 9
+        assert cache.stats()["evictions"] == 2
+        cache.close()
+
+    def test_evicts_by_size(self, tmp_path):
+        """Past max_mb of text old rows are evicted down to 90% of the cap."""
+        cache = CompletionCache(str(tmp_path / "size.db"), max_mb=1)
+        for i in range(5):
+            cache.put(f"k{i}", "local", "m", "x" * 300_000)
+
+        stats = cache.stats()
+        assert stats["stored_bytes"] <= 0.9 * 1024 * 1024
+        assert cache.get("k4") is not None
+        assert cache.get("k0") is None
+        cache.close()
@@ -0,0 +1,79 @@
+"""
+Unit tests for ConfigService settings versions and live reload.
+"""
+import json
+import os
+import pytest
+from unittest.mock import patch
+
+from services import config_service as config_module
+from services.config_service import ConfigService
+from services.llm_limiter import LLMLimiters
+from services.llm_router import LLMRouter
+from services.llm_service import LLMService
+
+
+@pytest.fixture
+def settings_file(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps({
+        "llm": {"provider_type": "local", "local": {"base_url": "http://localhost:8080", "max_tokens": 512}}
+    }))
+    with patch.object(config_module, "SETTINGS_FILE", path), \
+            patch.object(config_module, "MTIME_CHECK_INTERVAL", 0.0), \
+            patch("services.llm_service.get_settings") as mock_settings:
+        mock_settings.return_value.llm_provider = ""
+        yield path
+
+
+def edit(path, settings):
+    path.write_text(json.dumps(settings))
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 5))  # Don't rely on mtime resolution
+
+
+@pytest.mark.unit
+class TestConfigService:
+    """Test suite for ConfigService versions and LLMService snapshots."""
+
+    def test_save_bumps_version_and_swaps_snapshot(self, settings_file):
+        """Saving settings applies to the running LLMService without a restart."""
+        config = ConfigService()
+        service = LLMService(config_service=config, limiters=LLMLimiters(), router=LLMRouter())
+        before = service.snapshot
+        assert service.snapshot is before  # Compiled once, reused
+
+        assert config.save_user_settings({"llm": {"local": {"base_url": "http://gpu-box:8080"}}})
+
+        assert config.version == 1
+        assert service.snapshot is not before
+        assert service.base_url == "http://gpu-box:8080"
+        assert service.snapshot.url == "http://gpu-box:8080/completion"
+
+    def test_file_edit_is_picked_up(self, settings_file):
+        """An edit to settings.json on disk bumps the version and is compiled on next use."""
+        config = ConfigService()
+        service = LLMService(config_service=config, limiters=LLMLimiters(), router=LLMRouter())
+        assert service.is_local
+
+        edit(settings_file, {"llm": {
+            "provider_type": "cloud",
+            "cloud_provider": "custom",
+            "cloud_service_config": {"custom": {"base_url": "http://vllm:8000/v1", "model": "qwen", "temperature": 0.2}},
+        }})
+
+        assert config.version == 1
+        assert service.provider_key == "cloud:custom"
+        assert service.snapshot.url == "http://vllm:8000/v1/chat/completions"
+        assert service.generation_params()["temperature"] == 0.2
+
+    def test_unparseable_edit_keeps_current_settings(self, settings_file):
+        """A half-written settings.json is ignored instead of wiping the config."""
+        config = ConfigService()
+
+        settings_file.write_text("{\"llm\": ")
+        stat = settings_file.stat()
+        os.utime(settings_file, (stat.st_atime, stat.st_mtime + 5))
+
+        assert config.version == 0
+        assert config.get_llm_config()["base_url"] == "http://localhost:8080"
@@ -5,6 +5,9 @@ import pytest
 import sqlite3
 import tempfile
 import os
+import shutil
+import threading
+import time
 from pathlib import Path
 
 from services.conversation_service import ConversationService
@@ -20,10 +23,8 @@ class TestConversationService:
         temp_dir = tempfile.mkdtemp()
         db_path = os.path.join(temp_dir, "test_conversations.db")
         yield db_path
-        # Cleanup
-        if os.path.exists(db_path):
-            os.remove(db_path)
-        os.rmdir(temp_dir)
+        # Cleanup (WAL mode leaves -wal/-shm files next to the database)
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
     def test_init_creates_database(self, temp_db):
         """Test that initialization creates database and tables."""
@@ -113,19 +114,19 @@ class TestConversationService:
         for role, content in messages:
             service.add_message(conversation_id, role, content)
 
-        # Get history - due to second-precision timestamps, actual order is by primary key
+        # Get history - second-precision timestamps tie, so order falls back to insertion
         history = service.get_history(conversation_id)
 
         assert len(history) == 4
-        # History is returned in reverse insertion order (newest first) when timestamps are same
-        assert history[0]["role"] == "assistant"
-        assert history[0]["content"] == "Second response"
-        assert history[1]["role"] == "user"
-        assert history[1]["content"] == "Second message"
-        assert history[2]["role"] == "assistant"
-        assert history[2]["content"] == "First response"
-        assert history[3]["role"] == "user"
-        assert history[3]["content"] == "First message"
+        # History is returned in chronological order
+        assert history[0]["role"] == "user"
+        assert history[0]["content"] == "First message"
+        assert history[1]["role"] == "assistant"
+        assert history[1]["content"] == "First response"
+        assert history[2]["role"] == "user"
+        assert history[2]["content"] == "Second message"
+        assert history[3]["role"] == "assistant"
+        assert history[3]["content"] == "Second response"
         assert "created_at" in history[0]
 
     def test_get_history_with_limit(self, temp_db):
@@ -141,10 +142,11 @@ class TestConversationService:
         history = service.get_history(conversation_id, limit=3)
 
         assert len(history) == 3
-        # Due to second-precision timestamps, returns in reverse insertion order
+        # Most recent 3, in chronological order
         assert history[0]["content"] == "Message 2"
-        assert history[1]["content"] == "Message 1"
-        assert history[2]["content"] == "Message 0"
+        assert history[1]["content"] == "Message 3"
+        assert history[2]["content"] == "Message 4"
+        assert [m["position"] for m in history] == [2, 3, 4]
 
     def test_get_history_empty(self, temp_db):
         """Test retrieving history for conversation with no messages."""
@@ -238,10 +240,218 @@ class TestConversationService:
 
         history = service.get_history(conversation_id)
 
-        # Verify reverse insertion order (newest first) when timestamps are same
+        # Verify insertion order when timestamps are the same
         assert len(history) == 3
-        assert history[0]["content"] == "Message 2"
+        assert history[0]["content"] == "Message 0"
         assert history[1]["content"] == "Message 1"
-        assert history[2]["content"] == "Message 0"
+        assert history[2]["content"] == "Message 2"
         # Verify created_at field exists
         assert "created_at" in history[0]
+
+    def test_add_message_maintains_summary_columns(self, temp_db):
+        """Test last message, timestamp and count are kept on the conversation row."""
+        service = ConversationService(db_path=temp_db)
+        conversation_id = service.create_conversation()
+
+        service.add_message(conversation_id, "user", "Hello")
+        service.add_message(conversation_id, "assistant", "Hi there")
+
+        [conversation] = service.list_conversations()
+        assert conversation["message_count"] == 2
+        assert conversation["last_message"] == "Hi there"
+        assert conversation["last_message_at"] is not None
+        assert service.get_conversation(conversation_id)["message_count"] == 2
+
+        service.clear_conversation(conversation_id)
+        assert service.get_conversation(conversation_id)["message_count"] == 0
+        assert service.get_conversation("non-existent-id") is None
+
+    def test_migration_backfills_existing_database(self, temp_db):
+        """Test an old-schema database gets the index and backfilled summary columns."""
+        with sqlite3.connect(temp_db) as conn:
+            conn.execute("CREATE TABLE conversations (id TEXT PRIMARY KEY, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, title TEXT)")
+            conn.execute(
+                "CREATE TABLE messages (id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id TEXT NOT NULL, "
+                "role TEXT NOT NULL, content TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+            )
+            conn.execute("INSERT INTO conversations (id) VALUES ('old')")
+            conn.executemany(
+                "INSERT INTO messages (conversation_id, role, content) VALUES ('old', ?, ?)",
+                [("user", "Question"), ("assistant", "Answer")],
+            )
+
+        service = ConversationService(db_path=temp_db)
+
+        [conversation] = service.list_conversations()
+        assert conversation["message_count"] == 2
+        assert conversation["last_message"] == "Answer"
+        with sqlite3.connect(temp_db) as conn:
+            indexes = [r[1] for r in conn.execute("PRAGMA index_list(messages)").fetchall()]
+        assert "idx_messages_conversation" in indexes
+
+    def test_list_conversations_keyset_pagination(self, temp_db):
+        """Test paging through conversations with a cursor visits each once, newest first."""
+        service = ConversationService(db_path=temp_db)
+        ids = [service.create_conversation() for _ in range(5)]
+
+        seen, cursor = [], None
+        while True:
+            page = service.list_conversations(limit=2, cursor=cursor)
+            seen += [c["id"] for c in page]
+            if len(page) < 2:
+                break
+            cursor = service.cursor_for(page[-1])
+
+        assert seen == [c["id"] for c in service.list_conversations()]
+        assert sorted(seen) == sorted(ids)
+
+    def test_get_messages_keyset_pagination(self, temp_db):
+        """Test paging through messages with a cursor in chronological order."""
+        service = ConversationService(db_path=temp_db)
+        conversation_id = service.create_conversation()
+        for i in range(5):
+            service.add_message(conversation_id, "user", f"Message {i}")
+
+        first = service.get_messages(conversation_id, limit=3)
+        rest = service.get_messages(conversation_id, limit=3, cursor=service.cursor_for(first[-1]))
+
+        assert [m["content"] for m in first + rest] == [f"Message {i}" for i in range(5)]
+        with pytest.raises(ValueError):
+            service.get_messages(conversation_id, cursor="not-a-cursor")
+
+    def test_search_conversations_ranked_with_snippets(self, temp_db):
+        """Test full-text search ranks conversations and highlights matching terms."""
+        service = ConversationService(db_path=temp_db)
+        strong = service.create_conversation()
+        weak = service.create_conversation()
+        service.create_conversation()
+
+        service.add_message(strong, "user", "How do I tune SQLite indexes? SQLite indexes matter")
+        service.add_message(weak, "user", "Tell me a story about databases, maybe SQLite, and also about a very long list of other topics")
+        service.add_message(weak, "assistant", "Unrelated answer")
+
+        results = service.search_conversations("sqlite", limit=10)
+
+        assert [r["id"] for r in results] == [strong, weak]
+        assert "<mark>SQLite</mark>" in results[0]["snippet"]
+        assert results[0]["score"] <= results[1]["score"]
+        assert [r["id"] for r in service.search_conversations("sqlite", limit=1, offset=1)] == [weak]
+
+    def test_search_conversations_stems_and_sanitizes(self, temp_db):
+        """Test search matches word forms and treats FTS syntax in input as plain text."""
+        service = ConversationService(db_path=temp_db)
+        conversation_id = service.create_conversation()
+        service.add_message(conversation_id, "user", "Indexing conversations quickly")
+
+        assert [r["id"] for r in service.search_conversations("indexes")] == [conversation_id]
+        assert service.search_conversations('"conversation*)(') == service.search_conversations("conversation")
+        assert service.search_conversations("***") == []
+
+    def test_search_index_follows_message_changes(self, temp_db):
+        """Test triggers keep the full-text index in sync with deletes."""
+        service = ConversationService(db_path=temp_db)
+        conversation_id = service.create_conversation()
+        service.add_message(conversation_id, "user", "Kubernetes question")
+
+        service.clear_conversation(conversation_id)
+
+        assert service.search_conversations("kubernetes") == []
+
+    def test_search_index_backfilled_for_existing_messages(self, temp_db):
+        """Test messages written before the index existed are searchable after startup."""
+        service = ConversationService(db_path=temp_db)
+        conversation_id = service.create_conversation()
+        service.add_message(conversation_id, "user", "Legacy retrieval notes")
+        with sqlite3.connect(temp_db) as conn:
+            conn.executescript("DROP TABLE messages_fts; DROP TRIGGER messages_fts_insert;")
+
+        service = ConversationService(db_path=temp_db)
+
+        assert [r["id"] for r in service.search_conversations("retrieval")] == [conversation_id]
+
+    def test_connection_reused_per_thread_in_wal_mode(self, temp_db):
+        """Test each thread keeps one WAL-mode connection across calls."""
+        service = ConversationService(db_path=temp_db)
+        conversation_id = service.create_conversation()
+        service.add_message(conversation_id, "user", "Hello")
+
+        conn = service._connection()
+        assert service._connection() is conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(service._connection()))
+        thread.start()
+        thread.join()
+        assert other[0] is not conn
+
+        service.close()
+        assert service._connection() is not conn
+        assert service.get_history(conversation_id)[0]["content"] == "Hello"
+
+    def test_write_behind_reads_see_buffered_messages(self, temp_db):
+        """Test buffered messages are visible to reads before the flusher writes them."""
+        service = ConversationService(db_path=temp_db)
+        service.start_write_behind(flush_interval_ms=60_000, max_batch=1000)
+        try:
+            service.add_message("conv-1", "user", "Hello")
+            service.add_message("conv-1", "assistant", "Hi there")
+
+            with sqlite3.connect(temp_db) as conn:
+                assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 0
+
+            assert [m["content"] for m in service.get_history("conv-1")] == ["Hello", "Hi there"]
+            assert service.list_conversations()[0]["message_count"] == 2
+        finally:
+            service.close()
+
+    def test_write_behind_flushes_on_batch_size_and_interval(self, temp_db):
+        """Test the flusher writes a full batch immediately and a partial one after the interval."""
+        service = ConversationService(db_path=temp_db)
+
+        def stored():
+            with sqlite3.connect(temp_db) as conn:
+                return conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+        def wait_for(count):
+            deadline = time.time() + 5
+            while stored() < count and time.time() < deadline:
+                time.sleep(0.01)
+            return stored()
+
+        service.start_write_behind(flush_interval_ms=60_000, max_batch=3)
+        try:
+            for i in range(3):
+                service.add_message("conv-1", "user", f"Message {i}")
+            assert wait_for(3) == 3
+        finally:
+            service.close()
+
+        service = ConversationService(db_path=temp_db)
+        service.start_write_behind(flush_interval_ms=20, max_batch=1000)
+        try:
+            service.add_message("conv-1", "user", "Message 3")
+            assert wait_for(4) == 4
+        finally:
+            service.close()
+
+    def test_write_behind_drained_on_close(self, temp_db):
+        """Test closing the service writes everything still buffered."""
+        service = ConversationService(db_path=temp_db)
+        service.start_write_behind(flush_interval_ms=60_000, max_batch=1000)
+        for i in range(5):
+            service.add_message("conv-1", "user", f"Message {i}")
+
+        service.close()
+
+        with sqlite3.connect(temp_db) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 5
+            assert conn.execute("SELECT message_count FROM conversations").fetchone()[0] == 5
+
+    def test_add_message_rejects_invalid_role(self, temp_db):
+        """Test invalid roles fail at the call, since buffered writes can't report errors."""
+        service = ConversationService(db_path=temp_db)
+
+        with pytest.raises(ValueError):
+            service.add_message("conv-1", "system", "Nope")
@@ -0,0 +1,101 @@
+"""
+Unit tests for DocumentProcessor.
+"""
+import io
+import pytest
+from unittest.mock import Mock
+from reportlab.pdfgen import canvas
+
+from services.document_processor import DocumentProcessor, shutdown_pdf_pool
+
+
+def _make_pdf(pages):
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    for text in pages:
+        c.drawString(72, 720, text)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+@pytest.fixture
+def processor():
+    dp = DocumentProcessor()
+    dp.settings = Mock(chunk_size=500, chunk_overlap=50, pdf_extract_workers=1)
+    return dp
+
+
+@pytest.mark.unit
+class TestDocumentProcessor:
+    """Test suite for DocumentProcessor."""
+
+    def test_streaming_chunks_match_full_text_chunking(self, processor):
+        """Chunking pages as they stream in gives the same chunks as chunking the joined text."""
+        pages = [
+            (i + 1, f"Page {i} says something. " * (7 + i * 5) + "Trailing words without a stop")
+            for i in range(6)
+        ]
+        full_text = "".join(text + "\n" for _, text in pages)
+
+        expected_chunks, expected_meta = processor.chunk_text(full_text, "doc.pdf")
+        streamed = list(processor.iter_chunks(iter(pages), "doc.pdf"))
+
+        assert [c for c, _ in streamed] == expected_chunks
+        assert [m["start_char"] for _, m in streamed] == [m["start_char"] for m in expected_meta]
+        assert [m["chunk_index"] for _, m in streamed] == [m["chunk_index"] for m in expected_meta]
+
+    def test_chunks_record_page_numbers(self, processor):
+        """Each chunk is tagged with the page its first character falls on."""
+        pages = [(1, "First page sentence. " * 40), (2, "Second page sentence. " * 40)]
+
+        streamed = list(processor.iter_chunks(pages, "doc.pdf"))
+
+        assert streamed[0][1]["page"] == 1
+        assert streamed[-1][1]["page"] == 2
+        for chunk, meta in streamed:
+            if meta["page"] == 1:
+                assert meta["start_char"] < len(pages[0][1]) + 1
+
+    def test_plain_text_chunks_have_no_page(self, processor):
+        """Non-paged formats keep the original metadata shape."""
+        chunks, metadata = processor.chunk_text("Sentence one. " * 100, "notes.txt")
+
+        assert chunks
+        assert set(metadata[0]) == {"filename", "chunk_index", "start_char"}
+
+    def test_extract_pdf_pages_in_order(self, processor):
+        """PDF pages are yielded in order with 1-based page numbers."""
+        content = _make_pdf([f"Page number {i}" for i in range(3)])
+
+        pages = list(processor.extract_pages(content, "doc.pdf"))
+
+        assert [p for p, _ in pages] == [1, 2, 3]
+        assert "Page number 2" in pages[2][1]
+
+    def test_parallel_pdf_extraction_matches_serial(self, processor):
+        """Page-parallel extraction on the process pool matches in-process extraction."""
+        content = _make_pdf([f"Page number {i}" for i in range(20)])
+
+        serial = list(processor.extract_pages(content, "doc.pdf"))
+        processor.settings.pdf_extract_workers = 2
+        try:
+            parallel = list(processor.extract_pages(content, "doc.pdf"))
+            text = processor.extract_text(content, "doc.pdf")
+        finally:
+            shutdown_pdf_pool()
+
+        assert parallel == serial
+        assert text == "".join(t + "\n" for _, t in serial)
+
+    def test_extract_chunks_records_timings(self, processor):
+        """extract_chunks reports extraction and chunking time separately."""
+        content = _make_pdf([f"Page number {i}. " * 10 for i in range(3)])
+        timings = {}
+
+        chunks, metadata = processor.extract_chunks(content, "doc.pdf", timings)
+
+        assert chunks
+        assert metadata[0]["page"] == 1
+        assert set(timings) == {"extract", "chunk"}
+        assert timings["chunk"] >= 0
@@ -0,0 +1,74 @@
+"""
+Unit tests for EmbeddingBatcher.
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock
+import numpy as np
+
+from services.embedding_batcher import EmbeddingBatcher
+
+
+def _fake_encode(texts):
+    return np.array([[float(len(t)), 1.0] for t in texts])
+
+
+@pytest.mark.unit
+class TestEmbeddingBatcher:
+    """Test suite for EmbeddingBatcher."""
+
+    async def test_single_embed(self):
+        """A lone request is encoded once and returned as a list."""
+        encode = Mock(side_effect=_fake_encode)
+        batcher = EmbeddingBatcher(encode, max_batch_size=8, max_wait_ms=1)
+
+        result = await batcher.embed("hello")
+
+        assert result == [5.0, 1.0]
+        encode.assert_called_once_with(["hello"])
+
+    async def test_concurrent_requests_share_one_encode(self):
+        """Concurrent requests within the wait window are encoded together."""
+        encode = Mock(side_effect=_fake_encode)
+        batcher = EmbeddingBatcher(encode, max_batch_size=16, max_wait_ms=50)
+
+        results = await asyncio.gather(*(batcher.embed("q" * i) for i in range(1, 6)))
+
+        assert [r[0] for r in results] == [1.0, 2.0, 3.0, 4.0, 5.0]
+        assert encode.call_count == 1
+        assert batcher.batches_run == 1
+
+    async def test_max_batch_size_splits_batches(self):
+        """Batches never exceed max_batch_size."""
+        encode = Mock(side_effect=_fake_encode)
+        batcher = EmbeddingBatcher(encode, max_batch_size=2, max_wait_ms=50)
+
+        await asyncio.gather(*(batcher.embed(f"text {i}") for i in range(5)))
+
+        assert all(len(call.args[0]) <= 2 for call in encode.call_args_list)
+        assert batcher.texts_encoded == 5
+
+    async def test_duplicate_texts_encoded_once(self):
+        """Identical queries in the same batch are deduplicated."""
+        encode = Mock(side_effect=_fake_encode)
+        batcher = EmbeddingBatcher(encode, max_batch_size=16, max_wait_ms=50)
+
+        a, b = await asyncio.gather(batcher.embed("same"), batcher.embed("same"))
+
+        assert a == b
+        encode.assert_called_once_with(["same"])
+
+    async def test_encode_error_propagates_to_callers(self):
+        """Encoder failures are raised in every waiting caller."""
+        encode = Mock(side_effect=RuntimeError("model failed"))
+        batcher = EmbeddingBatcher(encode, max_batch_size=16, max_wait_ms=10)
+
+        results = await asyncio.gather(
+            batcher.embed("a"), batcher.embed("b"), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+        # The worker keeps running after a failure
+        encode.side_effect = _fake_encode
+        assert await batcher.embed("ok") == [2.0, 1.0]
@@ -0,0 +1,85 @@
+"""
+Unit tests for EmbeddingCache.
+"""
+import pytest
+
+from services.embedding_cache import EmbeddingCache
+
+
+@pytest.mark.unit
+class TestEmbeddingCache:
+    """Test suite for EmbeddingCache."""
+
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        return str(tmp_path / "embedding_cache.db")
+
+    def test_miss_then_hit(self, db_path):
+        """Stored vectors are returned on subsequent lookups."""
+        cache = EmbeddingCache(db_path)
+
+        assert cache.get_many("model-a", ["hello"]) == [None]
+        cache.put_many("model-a", ["hello"], [[0.5, 0.25]])
+
+        assert cache.get_many("model-a", ["hello"]) == [[0.5, 0.25]]
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_keys_are_per_model(self, db_path):
+        """The same text under a different model is a miss."""
+        cache = EmbeddingCache(db_path)
+        cache.put_many("model-a", ["hello"], [[1.0]])
+
+        assert cache.get_many("model-b", ["hello"]) == [None]
+
+    def test_whitespace_is_normalized(self, db_path):
+        """Texts differing only in whitespace share a cache entry."""
+        cache = EmbeddingCache(db_path)
+        cache.put_many("model-a", ["  some   policy text\n"], [[1.0, 2.0]])
+
+        assert cache.get_many("model-a", ["some policy text"]) == [[1.0, 2.0]]
+
+    def test_persists_across_instances(self, db_path):
+        """Entries survive a restart via the SQLite tier."""
+        EmbeddingCache(db_path).put_many("model-a", ["hello"], [[0.5]])
+
+        cache = EmbeddingCache(db_path)
+        assert cache.get_many("model-a", ["hello", "other"]) == [[0.5], None]
+
+    def test_memory_tier_is_bounded(self, db_path):
+        """The in-memory LRU never exceeds its capacity."""
+        cache = EmbeddingCache(db_path, memory_items=2)
+        cache.put_many("model-a", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+
+        assert cache.stats()["memory_entries"] == 2
+        # Evicted from memory but still on disk
+        assert cache.get_many("model-a", ["a"]) == [[1.0]]
+
+    def test_size_based_eviction(self, db_path):
+        """Least recently used rows are evicted once over the size cap."""
+        cache = EmbeddingCache(db_path, max_mb=0)
+        cache.max_bytes = 4 * 4 * 3  # room for three 4-dim vectors
+
+        for i in range(6):
+            cache.put_many("model-a", [f"text {i}"], [[float(i)] * 4])
+
+        assert cache.stats()["stored_bytes"] <= cache.max_bytes
+        fresh = EmbeddingCache(db_path, memory_items=0)
+        assert fresh.get_many("model-a", ["text 5"]) == [[5.0] * 4]
+        assert fresh.get_many("model-a", ["text 0"]) == [None]
+
+    def test_lookups_defer_last_used_writes(self, db_path):
+        """Disk hits don't write; their last use is saved with the next insert and kept by eviction."""
+        cache = EmbeddingCache(db_path, memory_items=0, max_mb=0)
+        cache.max_bytes = 4 * 4 * 3  # room for three 4-dim vectors
+        for i in range(3):
+            cache.put_many("model-a", [f"text {i}"], [[float(i)] * 4])
+
+        changes = cache._conn.total_changes
+        assert cache.get_many("model-a", ["text 0"]) == [[0.0] * 4]
+        assert cache._conn.total_changes == changes
+
+        # "text 0" was used most recently, so "text 1" is evicted instead
+        cache.put_many("model-a", ["text 3"], [[3.0] * 4])
+        assert cache.get_many("model-a", ["text 0"]) == [[0.0] * 4]
+        assert cache.get_many("model-a", ["text 1"]) == [None]
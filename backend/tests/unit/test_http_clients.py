@@ -0,0 +1,52 @@
+"""
+Unit tests for HTTPClientPool.
+"""
+import pytest
+from unittest.mock import patch
+
+from services.http_clients import HTTPClientPool
+
+
+@pytest.fixture
+def pool():
+    with patch('services.http_clients.get_settings') as mock_settings:
+        mock_settings.return_value.llm_http_max_connections = 8
+        mock_settings.return_value.llm_http_max_keepalive = 4
+        mock_settings.return_value.llm_http_keepalive_expiry = 15.0
+        mock_settings.return_value.llm_http_connect_timeout = 2.0
+        mock_settings.return_value.llm_http_read_timeout = 60.0
+        yield HTTPClientPool()
+
+
+@pytest.mark.unit
+class TestHTTPClientPool:
+    """Test suite for HTTPClientPool."""
+
+    async def test_one_client_per_base_url(self, pool):
+        """Requests to the same provider share a client."""
+        first = pool.get("https://openrouter.ai/api/v1")
+
+        assert pool.get("https://openrouter.ai/api/v1") is first
+        assert pool.get("http://localhost:8080") is not first
+        await pool.aclose()
+
+    async def test_limits_and_timeouts_from_settings(self, pool):
+        """Pool limits and split connect/read timeouts come from settings."""
+        client = pool.get("https://api.openai.com/v1")
+
+        assert client.timeout.connect == 2.0
+        assert client.timeout.read == 60.0
+        assert pool.limits.max_connections == 8
+        assert pool.limits.max_keepalive_connections == 4
+        await pool.aclose()
+
+    async def test_reset_rebuilds_clients(self, pool):
+        """reset closes existing clients and the next get builds a new one."""
+        old = pool.get("https://openrouter.ai/api/v1")
+
+        await pool.reset()
+
+        assert old.is_closed
+        new = pool.get("https://openrouter.ai/api/v1")
+        assert new is not old and not new.is_closed
+        await pool.aclose()
@@ -0,0 +1,202 @@
+"""
+Unit tests for IngestionJobService.
+"""
+import asyncio
+import sqlite3
+import time
+import pytest
+from unittest.mock import Mock
+
+from services.async_vector_store import AsyncVectorStore
+from services.ingestion_jobs import IngestionJobService
+from services.vector_store import VectorStoreService
+
+
+@pytest.fixture
+def mock_store():
+    store = Mock(spec=VectorStoreService)
+    store.embed = Mock(side_effect=lambda texts: [[0.1, 0.2] for _ in texts])
+    store.add_documents = Mock(side_effect=lambda chunks, metadata, embeddings=None: len(chunks))
+    return store
+
+
+@pytest.fixture
+def async_store(mock_store):
+    service = AsyncVectorStore(mock_store)
+    yield service
+    service.shutdown()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "ingestion_jobs.db")
+
+
+async def _wait_for(service, job_id, statuses=("completed", "failed")):
+    for _ in range(200):
+        job = service.get_job(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.mark.unit
+class TestIngestionJobService:
+    """Test suite for IngestionJobService."""
+
+    async def test_job_runs_all_stages(self, db_path, async_store, mock_store):
+        """A queued job is extracted, chunked, embedded and stored."""
+        service = IngestionJobService(db_path, async_store, embed_batch_size=2)
+        await service.start()
+        try:
+            text = ("This is a sentence about ingestion. " * 60).encode()
+            job_id = await service.submit("doc.txt", text)
+            job = await _wait_for(service, job_id)
+        finally:
+            await service.stop()
+
+        assert job["status"] == "completed"
+        assert job["stage"] == "done"
+        assert job["progress"] == 1.0
+        assert job["chunks_created"] > 1
+        assert set(job["timings"]) == {"extract", "chunk", "embed", "store"}
+        # Embedding happens in batches, storing in a single call with precomputed vectors
+        assert mock_store.embed.call_count > 1
+        _, _, embeddings = mock_store.add_documents.call_args[0]
+        assert len(embeddings) == job["chunks_created"]
+
+    async def test_failed_job_records_error(self, db_path, async_store):
+        """Extraction errors mark the job as failed with the message."""
+        service = IngestionJobService(db_path, async_store)
+        await service.start()
+        try:
+            job_id = await service.submit("doc.pdf", b"not a real pdf")
+            job = await _wait_for(service, job_id)
+        finally:
+            await service.stop()
+
+        assert job["status"] == "failed"
+        assert job["error"]
+        assert "embed" not in job["timings"]
+
+    async def test_pending_jobs_resume_after_restart(self, db_path, async_store):
+        """Jobs persisted before a restart are processed when workers start."""
+        before_restart = IngestionJobService(db_path, async_store)
+        job_id = before_restart.create_job("doc.txt", b"Some content that survives a restart.")
+        # Simulate a crash mid-job
+        before_restart._update(job_id, status="running", stage="embed")
+
+        service = IngestionJobService(db_path, async_store)
+        await service.start()
+        try:
+            job = await _wait_for(service, job_id)
+        finally:
+            await service.stop()
+
+        assert job["status"] == "completed"
+        assert job["chunks_created"] == 1
+
+    def test_job_claimed_by_one_process(self, db_path, async_store):
+        """Two processes sharing the database can't both claim a job while its lease is live."""
+        first = IngestionJobService(db_path, async_store)
+        second = IngestionJobService(db_path, async_store)
+        job_id = first.create_job("doc.txt", b"Shared content.")
+
+        assert first._claim(job_id) is True
+        assert second._claim(job_id) is False
+        assert second._claimable_job_ids() == []
+        assert first.get_job(job_id)["status"] == "running"
+
+    def test_expired_lease_is_reclaimed(self, db_path, async_store):
+        """A running job whose owner stopped renewing its lease is taken over."""
+        crashed = IngestionJobService(db_path, async_store, lease_seconds=-1)
+        survivor = IngestionJobService(db_path, async_store)
+        job_id = crashed.create_job("doc.txt", b"Orphaned content.")
+        assert crashed._claim(job_id) is True  # Lease already expired
+
+        assert survivor._claimable_job_ids() == [job_id]
+        assert survivor._claim(job_id) is True
+        assert crashed._claim(job_id) is False
+
+    async def test_stop_releases_running_job(self, db_path, async_store):
+        """Stopping mid-job hands the job back to the queue for the next process."""
+        started = asyncio.Event()
+
+        def slow_extract(content, filename, timings):
+            started.set()
+            time.sleep(0.2)
+            return ["chunk"], [{"filename": filename}]
+
+        processor = Mock()
+        processor.extract_chunks = Mock(side_effect=slow_extract)
+        service = IngestionJobService(db_path, async_store, processor=processor)
+        await service.start()
+        job_id = await service.submit("doc.txt", b"Content.")
+        await asyncio.wait_for(started.wait(), 1)
+        await service.stop()
+
+        job = service.get_job(job_id)
+        assert job["status"] == "queued"
+        assert IngestionJobService(db_path, async_store)._claim(job_id) is True
+
+    async def test_job_without_payload_fails(self, db_path, async_store):
+        """A job whose payload is gone is marked failed instead of being claimed forever."""
+        service = IngestionJobService(db_path, async_store)
+        job_id = service.create_job("doc.txt", b"Content.")
+        with service._connect() as conn:
+            conn.execute("DELETE FROM ingestion_payloads WHERE job_id = ?", (job_id,))
+
+        await service.run_job(job_id)
+
+        job = service.get_job(job_id)
+        assert job["status"] == "failed"
+        assert "missing" in job["error"]
+        assert service._claimable_job_ids() == []
+
+    async def test_worker_survives_job_errors(self, db_path, async_store, monkeypatch):
+        """An error running one job is logged and the worker goes on to the next."""
+        service = IngestionJobService(db_path, async_store)
+        claim = service._claim
+        calls = []
+
+        def flaky_claim(job_id):
+            calls.append(job_id)
+            if len(calls) == 1:
+                raise sqlite3.OperationalError("database is locked")
+            return claim(job_id)
+
+        monkeypatch.setattr(service, "_claim", flaky_claim)
+        await service.start()
+        try:
+            failing = await service.submit("first.txt", b"First.")
+            job_id = await service.submit("second.txt", b"Second.")
+            job = await _wait_for(service, job_id)
+        finally:
+            await service.stop()
+
+        assert job["status"] == "completed"
+        assert failing in calls
+
+    async def test_lease_renewal_survives_errors(self, db_path, async_store, monkeypatch):
+        """A failed lease renewal is retried rather than ending the renewal task."""
+        service = IngestionJobService(db_path, async_store, lease_seconds=0.03)
+        renewals = []
+
+        def flaky_renew(job_id):
+            renewals.append(job_id)
+            if len(renewals) == 1:
+                raise sqlite3.OperationalError("database is locked")
+
+        monkeypatch.setattr(service, "_renew", flaky_renew)
+        task = asyncio.create_task(service._renew_lease("job"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+        assert len(renewals) >= 2
+
+    def test_get_unknown_job(self, db_path, async_store):
+        """Unknown job IDs return None."""
+        service = IngestionJobService(db_path, async_store)
+
+        assert service.get_job("missing") is None
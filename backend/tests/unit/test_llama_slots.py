@@ -0,0 +1,100 @@
+"""
+Unit tests for llama.cpp slot pinning and prompt cache counters.
+"""
+import pytest
+
+from services import llama_slots
+from services.llama_slots import LlamaSlots, claim_worker_index
+
+
+@pytest.mark.unit
+class TestLlamaSlots:
+    """Test suite for LlamaSlots."""
+
+    def test_conversations_keep_their_slot(self):
+        """A conversation gets the same slot every turn while it holds it."""
+        slots = LlamaSlots()
+
+        first = [slots.slot_for(conv, 4) for conv in ("a", "b", "c")]
+
+        assert first == [0, 1, 2]
+        assert [slots.slot_for(conv, 4) for conv in ("c", "a", "b")] == [2, 0, 1]
+
+    def test_new_conversation_takes_least_recently_used_slot(self):
+        """With every slot held, a new conversation replaces the least recently used one."""
+        slots = LlamaSlots()
+        for conv in ("a", "b"):
+            slots.slot_for(conv, 2)
+        slots.slot_for("a", 2)
+
+        assert slots.slot_for("c", 2) == 1
+        # "b" lost its slot and is assigned a new one
+        assert slots.slot_for("b", 2) == 0
+        assert slots.stats()["pinned_conversations"] == 2
+
+    def test_fewer_slots_drops_stale_pins(self):
+        """Pins to slots beyond a reduced slot count are reassigned."""
+        slots = LlamaSlots()
+        for conv in ("a", "b", "c", "d"):
+            slots.slot_for(conv, 4)
+
+        # "d" (on slot 3) and "c" (on slot 2) lose their pins; "d" takes the least recently used slot
+        assert slots.slot_for("d", 2) == 0
+        assert slots.slot_for("b", 2) == 1
+        assert slots.stats()["pinned_conversations"] == 2
+
+    def test_busy_slots_are_not_waited_for(self):
+        """A new conversation takes an idle slot; a busy pinned slot is skipped rather than queued behind."""
+        slots = LlamaSlots()
+        for conv in ("a", "b"):
+            slots.slot_for(conv, 2)
+
+        with slots.use("a", 2) as slot_a:
+            assert slot_a == 0
+            slots.slot_for("b", 2)
+            # "a" is now the least recently used pin but its slot is busy, so "c" evicts "b"
+            assert slots.slot_for("c", 2) == 1
+            with slots.use("c", 2):
+                assert slots.stats()["busy_slots"] == 2
+                assert slots.slot_for("d", 2) is None
+                assert slots.slot_for("a", 2) is None
+
+        assert slots.stats()["busy_slots"] == 0
+        assert slots.slot_for("a", 2) == 0
+
+    def test_workers_use_separate_slots(self):
+        """Each worker process pins to its own range of the server's slots."""
+        first, second = LlamaSlots(worker=0), LlamaSlots(worker=1)
+
+        assert [first.slot_for(conv, 2) for conv in ("a", "b", "c")] == [0, 1, 0]
+        assert [second.slot_for(conv, 2) for conv in ("a", "b", "c")] == [2, 3, 2]
+        assert LlamaSlots(worker=None).slot_for("a", 2) is None
+
+    def test_claim_worker_index(self, tmp_path):
+        """Live processes hold distinct indexes; a released index is claimed again."""
+        assert claim_worker_index(str(tmp_path), 1) == 0
+        try:
+            assert claim_worker_index(str(tmp_path), 2) == 0
+            assert claim_worker_index(str(tmp_path), 2) == 1
+            assert claim_worker_index(str(tmp_path), 2) is None
+
+            llama_slots._worker_locks.pop(0).close()
+            assert claim_worker_index(str(tmp_path), 2) == 0
+        finally:
+            while llama_slots._worker_locks:
+                llama_slots._worker_locks.pop().close()
+
+    def test_record_prompt_timings(self):
+        """Evaluated and cached prompt tokens come from cache_n, or tokens_evaluated on older servers."""
+        slots = LlamaSlots()
+
+        slots.record({"timings": {"prompt_n": 20, "cache_n": 380, "prompt_ms": 40.0}})
+        slots.record({"tokens_evaluated": 500, "timings": {"prompt_n": 100, "prompt_ms": 160.0}})
+        slots.record({"content": "no timings"})
+
+        stats = slots.stats()
+        assert stats["requests"] == 2
+        assert stats["prompt_tokens_evaluated"] == 120
+        assert stats["prompt_tokens_cached"] == 780
+        assert stats["cached_ratio"] == round(780 / 900, 4)
+        assert stats["avg_prompt_ms"] == 100.0
@@ -0,0 +1,153 @@
+"""
+Unit tests for the adaptive LLM concurrency limiter.
+"""
+import asyncio
+import pytest
+
+from services.llm_limiter import AdaptiveLimiter, LimiterSlot, LLMLimiters
+
+
+def finished(status=200, first_token_ms=100.0):
+    slot = LimiterSlot()
+    slot.status = status
+    slot.first_token_ms = first_token_ms
+    return slot
+
+
+@pytest.mark.unit
+class TestAdaptiveLimiter:
+    """Test suite for AdaptiveLimiter and LLMLimiters."""
+
+    async def test_queues_beyond_limit_in_fifo_order(self):
+        """Requests over the limit wait and are admitted in arrival order."""
+        limiter = AdaptiveLimiter("local", initial_concurrency=1, max_concurrency=1)
+        order = []
+
+        async def request(name):
+            async with limiter.slot():
+                order.append(name)
+                await asyncio.sleep(0.005)
+
+        await asyncio.gather(*(request(i) for i in range(5)))
+
+        assert order == [0, 1, 2, 3, 4]
+        assert limiter.stats()["queued"] == 4
+        assert limiter.inflight == 0
+
+    async def test_reports_queue_position(self):
+        """Queued requests hear their position, and again as it moves up."""
+        limiter = AdaptiveLimiter("local", initial_concurrency=1, max_concurrency=1)
+        first = await limiter.acquire()
+        positions = []
+
+        async def on_queued(position, wait_ms):
+            positions.append(position)
+
+        async def waiter():
+            async with limiter.slot(on_queued):
+                pass
+
+        blocked = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        third = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        limiter.release(first)
+        await blocked
+        await asyncio.sleep(0)
+        limiter.release(blocked.result())
+        await third
+
+        assert positions == [2, 1]
+
+    async def test_cancelled_waiter_leaves_queue(self):
+        """A request cancelled while queued gives up its place."""
+        limiter = AdaptiveLimiter("local", initial_concurrency=1, max_concurrency=1)
+        held = await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        limiter.release(held)
+
+        assert limiter.stats()["queue_depth"] == 0
+        assert limiter.inflight == 0
+
+    def test_overload_halves_limit_once_per_burst(self):
+        """429/503 responses halve the limit, but a burst of them only once."""
+        limiter = AdaptiveLimiter("cloud:openrouter", initial_concurrency=16, max_concurrency=32)
+        limiter.inflight = 4
+        burst = [finished(status=status, first_token_ms=None) for status in (429, 503, 429)]
+
+        for slot in burst:
+            limiter.release(slot)
+        assert limiter.limit == 8
+        assert limiter.stats()["overloaded"] == 3
+        assert limiter.stats()["decreases"] == 1
+
+        limiter.release(finished(status=429, first_token_ms=None))
+        assert limiter.limit == 4
+
+    def test_slow_first_token_counts_as_overload(self):
+        """A first token slower than the latency target backs off the limit."""
+        limiter = AdaptiveLimiter("local", initial_concurrency=4, latency_target_ms=1000)
+        limiter.inflight = 1
+
+        limiter.release(finished(first_token_ms=2500))
+
+        assert limiter.limit == 2
+        assert limiter.stats()["slow"] == 1
+
+    def test_success_increases_additively_up_to_max(self):
+        """Each success adds 1/limit, never past max_concurrency."""
+        limiter = AdaptiveLimiter("local", initial_concurrency=2, max_concurrency=3)
+        limiter.inflight = 10
+
+        limiter.release(finished())
+        assert limiter.limit == 2.5
+        for _ in range(5):
+            limiter.release(finished())
+        assert limiter.limit == 3
+
+    def test_limits_from_settings(self):
+        """cloud_provider limits override provider_type limits, which override defaults."""
+        limiters = LLMLimiters()
+        user_limits = {
+            "local": {"max_concurrency": 2, "initial_concurrency": 2},
+            "cloud": {"max_concurrency": 10},
+            "openai": {"initial_concurrency": 3},
+        }
+
+        local = limiters.get("local", None, user_limits)
+        openai = limiters.get("cloud", "openai", user_limits)
+        openrouter = limiters.get("cloud", "openrouter", user_limits)
+
+        assert (local.limit, local.max_limit) == (2, 2)
+        assert (openai.limit, openai.max_limit) == (3, 10)
+        assert openrouter.limit == 8
+        assert limiters.get("cloud", "openai") is openai
+        assert set(limiters.stats()) == {"local", "cloud:openai", "cloud:openrouter"}
+
+    def test_changed_limits_reconfigure_in_place(self):
+        """New settings keep the same limiter, clamping its learned limit to the new bounds."""
+        limiters = LLMLimiters()
+        limiter = limiters.get("local", None, {"local": {"max_concurrency": 8, "initial_concurrency": 8}})
+
+        again = limiters.get("local", None, {"local": {"max_concurrency": 2}})
+
+        assert again is limiter
+        assert (limiter.limit, limiter.max_limit) == (2, 2)
+
+    def test_local_limits_split_between_workers(self):
+        """Each worker process gets its share of the local server's slots; cloud limits are per worker."""
+        limiters = LLMLimiters(workers=2)
+
+        local = limiters.get("local", None, {"local": {"max_concurrency": 6, "initial_concurrency": 5}})
+        cloud = limiters.get("cloud", "openai")
+
+        assert (local.limit, local.max_limit) == (2, 3)
+        # Never below one request per worker
+        limiters.get("local", None, {"local": {"max_concurrency": 1}})
+        assert (local.limit, local.max_limit) == (1, 1)
+        assert (cloud.limit, cloud.max_limit) == (8, 32)
@@ -0,0 +1,190 @@
+"""
+Unit tests for LLM provider failover, hedging and health scores.
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from services.llm_router import LLMRouter, ProviderHealth
+
+
+class FakeProvider:
+    """A provider stream queued for `queued` seconds, then waiting `delay` seconds to yield tokens or raise."""
+
+    def __init__(self, name, delay=0.0, tokens=("a", "b"), error=None, queued=0.0):
+        self.name = name
+        self.queued = queued
+        self.delay = delay
+        self.tokens = tokens
+        self.error = error
+        self.started = 0
+        self.closed = 0
+
+    def __call__(self, on_admitted):
+        self.started += 1
+        return self._stream(on_admitted)
+
+    async def _stream(self, on_admitted):
+        try:
+            await asyncio.sleep(self.queued)
+            on_admitted()
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            for token in self.tokens:
+                yield f"{self.name}:{token}"
+        finally:
+            self.closed += 1
+
+    @property
+    def entry(self):
+        return (self.name, self)
+
+
+async def collect(router, providers, **routing):
+    return [token async for token in router.stream([p.entry for p in providers], routing)]
+
+
+@pytest.mark.unit
+class TestLLMRouter:
+    """Test suite for LLMRouter and ProviderHealth."""
+
+    async def test_single_provider_streams_through(self):
+        """Without fallbacks the provider's stream is passed through unchanged."""
+        primary = FakeProvider("cloud:openrouter")
+
+        assert await collect(LLMRouter(), [primary]) == ["cloud:openrouter:a", "cloud:openrouter:b"]
+        assert primary.closed == 1
+
+    async def test_fails_over_on_error(self):
+        """A provider that errors before its first token is replaced by the next one."""
+        router = LLMRouter()
+        primary = FakeProvider("cloud:openrouter", error=RuntimeError("502"))
+        backup = FakeProvider("local")
+
+        assert await collect(router, [primary, backup]) == ["local:a", "local:b"]
+        assert router.stats()["cloud:openrouter"]["errors"] == 1
+        assert router.stats()["local"]["successes"] == 1
+
+    async def test_fails_over_on_first_token_deadline(self):
+        """A provider missing the deadline is abandoned and its stream closed."""
+        router = LLMRouter()
+        primary = FakeProvider("cloud:openrouter", delay=10)
+        backup = FakeProvider("local", delay=0.05)
+
+        tokens = await asyncio.wait_for(collect(router, [primary, backup], ttft_deadline_ms=20), 1)
+
+        assert tokens == ["local:a", "local:b"]
+        assert primary.closed == 1
+        assert router.stats()["cloud:openrouter"]["timeouts"] == 1
+
+    async def test_fails_over_on_empty_response(self):
+        """A provider whose stream ends without a token (an HTTP error body) is not the winner."""
+        router = LLMRouter()
+        primary = FakeProvider("cloud:openrouter", tokens=())
+        backup = FakeProvider("local")
+
+        assert await collect(router, [primary, backup]) == ["local:a", "local:b"]
+        assert router.stats()["cloud:openrouter"]["errors"] == 1
+        assert router.stats()["cloud:openrouter"]["successes"] == 0
+
+    async def test_last_provider_may_answer_empty(self):
+        """An empty answer from the last provider in line is passed through."""
+        primary = FakeProvider("cloud:openrouter", error=RuntimeError("502"))
+        backup = FakeProvider("local", tokens=())
+
+        assert await collect(LLMRouter(), [primary, backup]) == []
+
+    async def test_deadline_starts_after_admission(self):
+        """Time queued in our own concurrency limiter doesn't count against the first-token deadline."""
+        router = LLMRouter()
+        primary = FakeProvider("cloud:openrouter", queued=0.1, delay=0.01)
+        backup = FakeProvider("local")
+
+        tokens = await collect(router, [primary, backup], ttft_deadline_ms=50)
+
+        assert tokens == ["cloud:openrouter:a", "cloud:openrouter:b"]
+        assert backup.started == 0
+        assert router.stats()["cloud:openrouter"]["timeouts"] == 0
+        assert router.health("cloud:openrouter").ttfts[0] < 50
+
+    async def test_deadline_runs_once_admitted(self):
+        """A provider that stalls after admission still misses the deadline."""
+        router = LLMRouter()
+        primary = FakeProvider("cloud:openrouter", queued=0.05, delay=10)
+        backup = FakeProvider("local")
+
+        tokens = await asyncio.wait_for(collect(router, [primary, backup], ttft_deadline_ms=30), 1)
+
+        assert tokens == ["local:a", "local:b"]
+        assert router.stats()["cloud:openrouter"]["timeouts"] == 1
+
+    async def test_all_providers_failing_raises_last_error(self):
+        """When nothing answers the last provider's error is raised."""
+        primary = FakeProvider("cloud:openrouter", error=RuntimeError("first"))
+        backup = FakeProvider("local", error=RuntimeError("last"))
+
+        with pytest.raises(RuntimeError, match="last"):
+            await collect(LLMRouter(), [primary, backup])
+
+    async def test_hedge_keeps_first_provider_to_answer(self):
+        """With hedging, a slow primary is raced against the backup and the loser closed."""
+        router = LLMRouter()
+        for _ in range(10):
+            router.health("cloud:openrouter").success(ttft_ms=30)  # Usually answers in 30 ms
+        primary = FakeProvider("cloud:openrouter", delay=0.3)
+        backup = FakeProvider("local", delay=0.01)
+
+        tokens = await collect(
+            router, [primary, backup], hedge=True, hedge_min_delay_ms=20, ttft_deadline_ms=1000
+        )
+
+        assert tokens == ["local:a", "local:b"]
+        assert backup.started == 1
+        assert primary.closed == 1
+        assert router.stats()["local"]["hedged_wins"] == 1
+        assert router.stats()["cloud:openrouter"]["timeouts"] == 0
+
+    async def test_hedge_not_sent_when_primary_is_fast(self):
+        """The backup is only started once the primary is slower than the hedge delay."""
+        primary = FakeProvider("cloud:openrouter", delay=0.01)
+        backup = FakeProvider("local")
+
+        await collect(LLMRouter(), [primary, backup], hedge=True, hedge_min_delay_ms=200)
+
+        assert backup.started == 0
+
+    async def test_degraded_provider_tried_last(self):
+        """Providers with a low health score are moved behind healthy ones."""
+        router = LLMRouter()
+        for _ in range(3):
+            router.health("cloud:openrouter").failure(timed_out=True)
+        primary = FakeProvider("cloud:openrouter")
+        backup = FakeProvider("local")
+
+        assert await collect(router, [primary, backup]) == ["local:a", "local:b"]
+        assert primary.started == 0
+
+    def test_health_recovers_over_time(self):
+        """An unused degraded provider's score drifts back toward healthy."""
+        with patch("services.llm_router.time.monotonic", return_value=1000.0):
+            health = ProviderHealth()
+            for _ in range(3):
+                health.failure(timed_out=False)
+            degraded = health.score
+        with patch("services.llm_router.time.monotonic", return_value=1060.0):
+            recovered = health.score
+
+        assert degraded < 0.5
+        assert recovered == pytest.approx(1 - (1 - degraded) / 2)
+
+    def test_ttft_percentile_needs_samples(self):
+        """The hedge delay percentile is only used once there's enough history."""
+        health = ProviderHealth()
+        for ms in range(1, 10):
+            health.success(ms * 100)
+        assert health.ttft_percentile(95) is None
+
+        health.success(1000)
+        assert health.ttft_percentile(50) == 500
+        assert health.ttft_percentile(95) == 1000
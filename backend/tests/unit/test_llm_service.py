@@ -6,7 +6,17 @@ from unittest.mock import Mock, AsyncMock, patch
 import httpx
 import json
 
+from services.completion_cache import CompletionCache
+from services.llama_slots import LlamaSlots
 from services.llm_service import LLMService
+from services.http_clients import HTTPClientPool
+
+
+@pytest.fixture(autouse=True)
+def fresh_http_clients():
+    """Give every service its own client pool so patched clients don't leak between tests."""
+    with patch('services.llm_service.get_http_clients', side_effect=HTTPClientPool):
+        yield
 
 
 @pytest.mark.unit
@@ -136,6 +146,11 @@ class TestLLMService:
 
             # Create a mock response object with proper async context manager
             class MockStreamResponse:
+                status_code = 200
+
+                def raise_for_status(self):
+                    pass
+
                 async def aiter_lines(self):
                     async for line in mock_aiter_lines():
                         yield line
@@ -243,6 +258,238 @@ class TestLLMService:
             assert "Current Question: Test question" in result
             assert "Based on the above context" in result
 
+    def test_context_length_from_registry_and_override(self):
+        """Test the context window comes from the provider registry unless configured."""
+        config_service = Mock()
+        config_service.get_llm_config.return_value = {
+            "provider_type": "cloud", "cloud_provider": "openai", "model": "openai/gpt-4o", "max_tokens": 1000
+        }
+        with patch('services.llm_service.get_settings') as mock_settings:
+            mock_settings.return_value.llm_provider = ""
+
+            service = LLMService(config_service=config_service)
+            assert service.context_length == 128000
+            assert service.prompt_budget("x" * 35) == 128000 - 1000 - 10
+
+            config_service.get_llm_config.return_value["model"] = "unknown/model"
+            assert LLMService(config_service=config_service).context_length == 4096
+
+            config_service.get_llm_config.return_value["context_length"] = 32768
+            assert LLMService(config_service=config_service).context_length == 32768
+
+    def test_build_rag_prompt_fits_small_context(self):
+        """Test large tool data is cut so the prompt fits a small model's window."""
+        config_service = Mock()
+        config_service.get_llm_config.return_value = {
+            "provider_type": "local", "base_url": "http://localhost:8080", "context_length": 2048, "max_tokens": 512
+        }
+        with patch('services.llm_service.get_settings') as mock_settings:
+            mock_settings.return_value.llm_provider = "local"
+
+            service = LLMService(config_service=config_service)
+            api_data = {"slack": {"messages": ["lorem ipsum " * 2000]}}
+
+            result = service.build_rag_prompt("Summarize Slack", [], api_data, system_prompt="Be brief.")
+
+            assert "Current Question: Summarize Slack" in result
+            assert len(result) < 2048 * 4
+
+    def test_fallbacks_from_routing_settings(self):
+        """Test fallback providers are built from settings.json and ignore the LLM_PROVIDER override."""
+        config_service = Mock()
+        config_service.get_llm_config.return_value = {"provider_type": "local", "base_url": "http://localhost:8080"}
+        config_service.user_settings = {"llm_routing": {"fallbacks": ["local", "custom"]}}
+        config_service.get_provider_config.side_effect = lambda provider_type, cloud_provider=None: (
+            {"provider_type": "cloud", "cloud_provider": "custom", "base_url": "http://backup:9000/v1", "model": "m"}
+            if provider_type == "cloud" else {"provider_type": "local"}
+        )
+        with patch('services.llm_service.get_settings') as mock_settings:
+            mock_settings.return_value.llm_provider = "local"
+
+            service = LLMService(config_service=config_service)
+            fallbacks = service.fallbacks()
+
+            # "local" is the main provider already, so only the custom one is added
+            assert [f.provider_key for f in fallbacks] == ["cloud:custom"]
+            assert fallbacks[0].base_url == "http://backup:9000/v1"
+            assert fallbacks[0].limiter is not service.limiter
+
+    def test_build_rag_prompt_fits_smallest_fallback_context(self):
+        """Test the prompt is packed for the smallest context window among the fallback providers."""
+        config_service = Mock()
+        config_service.get_llm_config.return_value = {
+            "provider_type": "cloud", "cloud_provider": "custom", "base_url": "http://cloud/v1",
+            "model": "m", "context_length": 128000, "max_tokens": 512,
+        }
+        config_service.user_settings = {"llm_routing": {"fallbacks": ["local"]}}
+        config_service.get_provider_config.return_value = {
+            "provider_type": "local", "base_url": "http://localhost:8080", "context_length": 2048, "max_tokens": 512
+        }
+        with patch('services.llm_service.get_settings') as mock_settings:
+            mock_settings.return_value.llm_provider = ""
+
+            service = LLMService(config_service=config_service)
+            api_data = {"slack": {"messages": ["lorem ipsum " * 2000]}}
+
+            result = service.build_rag_prompt("Summarize Slack", [], api_data, system_prompt="Be brief.")
+
+            assert "Current Question: Summarize Slack" in result
+            assert len(result) < 2048 * 4
+
+    async def test_stream_http_error_raises(self):
+        """Test an HTTP error response raises instead of ending the stream with no tokens."""
+        config_service = Mock()
+        config_service.get_llm_config.return_value = {
+            "provider_type": "cloud", "cloud_provider": "custom", "base_url": "http://cloud/v1", "model": "m"
+        }
+        config_service.user_settings = {}
+        with patch('services.llm_service.get_settings') as mock_settings:
+            mock_settings.return_value.llm_provider = ""
+
+            service = LLMService(config_service=config_service)
+            request = httpx.Request("POST", "http://cloud/v1/chat/completions")
+
+            class MockStream:
+                async def __aenter__(self):
+                    return httpx.Response(502, request=request, text="Bad gateway")
+                async def __aexit__(self, *args):
+                    pass
+
+            with patch('httpx.AsyncClient') as mock_client_class:
+                mock_client = AsyncMock()
+                mock_client.stream = Mock(return_value=MockStream())
+                mock_client_class.return_value = mock_client
+
+                with pytest.raises(httpx.HTTPStatusError):
+                    async for _ in service.generate_stream(prompt="Test"):
+                        pass
+                assert service.limiter.stats()["admitted"] == 1
+
+    async def test_completion_cache_serves_repeated_requests(self, tmp_path):
+        """Test a temperature 0 completion is cached and replayed by generate and generate_stream."""
+        config_service = Mock()
+        config_service.get_llm_config.return_value = {"provider_type": "local", "base_url": "http://localhost:8080"}
+        config_service.user_settings = {}
+        cache = CompletionCache(str(tmp_path / "completions.db"))
+        with patch('services.llm_service.get_settings') as mock_settings:
+            mock_settings.return_value.llm_provider = "local"
+            mock_settings.return_value.llm_base_url = "http://localhost:8080"
+
+            service = LLMService(config_service=config_service, completion_cache=cache)
+
+            mock_response = Mock()
+            mock_response.json.return_value = {"content": "Cached answer"}
+            mock_response.raise_for_status = Mock()
+
+            with patch('httpx.AsyncClient') as mock_client_class:
+                mock_client = AsyncMock()
+                mock_client.post = AsyncMock(return_value=mock_response)
+                mock_client.stream = Mock(side_effect=AssertionError("stream should be served from cache"))
+                mock_client_class.return_value = mock_client
+
+                first = await service.generate(prompt="Test", temperature=0)
+                second = await service.generate(prompt="Test", temperature=0)
+                streamed = [t async for t in service.generate_stream(prompt="Test", temperature=0)]
+                await service.generate(prompt="Test", temperature=0.7)
+
+                assert first == second == "Cached answer"
+                assert streamed == ["Cached answer"]
+                # The sampled request bypasses the cache and goes upstream
+                assert mock_client.post.call_count == 2
+                stats = cache.stats()
+                assert (stats["hits"], stats["misses"], stats["bypassed"]) == (2, 1, 1)
+        cache.close()
+
+    async def test_cloud_request_temperature_overrides_configured(self, tmp_path):
+        """Test a cloud call at temperature 0 is sent at 0 despite the configured 0.7, and cached."""
+        config_service = Mock()
+        config_service.get_llm_config.return_value = {
+            "provider_type": "cloud", "cloud_provider": "custom", "base_url": "http://cloud/v1",
+            "model": "m", "temperature": 0.7,
+        }
+        config_service.user_settings = {}
+        cache = CompletionCache(str(tmp_path / "completions.db"))
+        with patch('services.llm_service.get_settings') as mock_settings:
+            mock_settings.return_value.llm_provider = ""
+
+            service = LLMService(config_service=config_service, completion_cache=cache)
+
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = {"choices": [{"message": {"content": "Cached answer"}}]}
+
+            with patch('httpx.AsyncClient') as mock_client_class:
+                mock_client = AsyncMock()
+                mock_client.post = AsyncMock(return_value=mock_response)
+                mock_client_class.return_value = mock_client
+
+                first = await service.generate(prompt="Test", temperature=0)
+                second = await service.generate(prompt="Test", temperature=0)
+                await service.generate(prompt="Test")
+
+                assert first == second == "Cached answer"
+                payloads = [call.kwargs["json"] for call in mock_client.post.call_args_list]
+                # The repeated temperature 0 call is a cache hit; the default uses the configured 0.7
+                assert [p["temperature"] for p in payloads] == [0, 0.7]
+                assert service.generation_params(temperature=0)["temperature"] == 0
+                assert service.generation_params()["temperature"] == 0.7
+                stats = cache.stats()
+                assert (stats["hits"], stats["misses"], stats["bypassed"]) == (1, 1, 1)
+        cache.close()
+
+    async def test_local_stream_pins_conversation_slot(self):
+        """Test local streams enable cache_prompt, pin each conversation to a slot and record prompt timings."""
+        config_service = Mock()
+        config_service.get_llm_config.return_value = {"provider_type": "local", "base_url": "http://localhost:8080"}
+        config_service.user_settings = {}
+        slots = LlamaSlots()
+        with patch('services.llm_service.get_settings') as mock_settings:
+            mock_settings.return_value.llm_provider = "local"
+            mock_settings.return_value.llm_base_url = "http://localhost:8080"
+            mock_settings.return_value.llama_prompt_cache = True
+            mock_settings.return_value.llama_slot_pinning = True
+
+            service = LLMService(config_service=config_service, llama_slots=slots)
+
+            class MockStreamResponse:
+                status_code = 200
+
+                def raise_for_status(self):
+                    pass
+
+                async def aiter_lines(self):
+                    yield 'data: {"content": "Hi", "stop": false}'
+                    yield 'data: {"content": "", "stop": true, "timings": {"prompt_n": 12, "cache_n": 300}}'
+
+            class MockStream:
+                async def __aenter__(self):
+                    return MockStreamResponse()
+                async def __aexit__(self, *args):
+                    pass
+
+            with patch('httpx.AsyncClient') as mock_client_class:
+                mock_client = AsyncMock()
+                mock_client.stream = Mock(side_effect=lambda *args, **kwargs: MockStream())
+                mock_client_class.return_value = mock_client
+
+                for conversation_id in ("conv-a", "conv-b", "conv-a"):
+                    async for _ in service.generate_stream(prompt="Test", conversation_id=conversation_id):
+                        pass
+
+                payloads = [call.kwargs["json"] for call in mock_client.stream.call_args_list]
+                assert all(p["cache_prompt"] is True for p in payloads)
+                assert [p["id_slot"] for p in payloads] == [0, 1, 0]
+                stats = slots.stats()
+                assert (stats["requests"], stats["prompt_tokens_evaluated"], stats["prompt_tokens_cached"]) == (3, 36, 900)
+                # Slots are only busy while a request runs
+                assert stats["busy_slots"] == 0
+
+                mock_settings.return_value.llama_slot_pinning = False
+                service = LLMService(config_service=config_service, llama_slots=slots)
+                async for _ in service.generate_stream(prompt="Test", conversation_id="conv-a"):
+                    pass
+                assert "id_slot" not in mock_client.stream.call_args.kwargs["json"]
+
     async def test_generate_http_error(self):
         """Test handling of HTTP errors during generation."""
         with patch('services.llm_service.get_settings') as mock_settings:
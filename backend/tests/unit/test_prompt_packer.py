@@ -0,0 +1,128 @@
+"""
+Unit tests for the token-budgeted RAG prompt packer.
+"""
+import pytest
+
+from services.prompt_packer import (
+    PROMPT_OVERHEAD_TOKENS,
+    TRUNCATION_MARK,
+    estimate_tokens,
+    pack_rag_prompt,
+    truncate_to_tokens,
+)
+
+CHUNKS = [
+    {"content": f"Chunk {i} " + "alpha beta gamma " * 40, "metadata": {"filename": f"doc{i}.txt"}}
+    for i in range(5)
+]
+HISTORY = [
+    {"role": "user" if i % 2 == 0 else "assistant", "content": f"Turn {i} " + "delta " * 30}
+    for i in range(6)
+]
+API_DATA = {"notion": {"results": ["page " * 200]}, "crypto": {"price": 50000}}
+
+
+@pytest.mark.unit
+class TestPromptPacker:
+    """Test suite for pack_rag_prompt and helpers."""
+
+    def test_estimate_tokens(self):
+        """The estimate scales with UTF-8 length and is zero for empty text."""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("a" * 35) == 10
+        assert estimate_tokens("漢字") > estimate_tokens("ab")
+
+    def test_truncate_to_tokens_is_deterministic_and_bounded(self):
+        """Truncation keeps the head of the text, marks it, and fits the limit."""
+        text = "word " * 500
+
+        first = truncate_to_tokens(text, 50)
+
+        assert first == truncate_to_tokens(text, 50)
+        assert first.endswith(TRUNCATION_MARK)
+        assert text.startswith(first[: -len(TRUNCATION_MARK)])
+        assert estimate_tokens(first) <= 50
+        assert truncate_to_tokens("short", 50) == "short"
+
+    def test_large_budget_includes_everything(self):
+        """With room to spare, the prompt has every section in the usual order."""
+        prompt = pack_rag_prompt("What now?", CHUNKS, API_DATA, HISTORY, 100_000)
+
+        assert prompt.index("Conversation History:") < prompt.index("Current Question: What now?")
+        assert prompt.index("Current Question:") < prompt.index("Document Context:")
+        assert prompt.index("Document Context:") < prompt.index("External Data:")
+        assert all(f"[Source: doc{i}.txt]" in prompt for i in range(5))
+        assert all(f"Turn {i}" in prompt for i in range(6))
+        assert '"price": 50000' in prompt
+        assert TRUNCATION_MARK not in prompt
+
+    def test_stable_first_puts_the_question_last(self):
+        """With stable_first, sections run from history to tool data and the question comes last."""
+        prompt = pack_rag_prompt("What now?", CHUNKS, API_DATA, HISTORY, 100_000, stable_first=True)
+
+        assert prompt.index("Conversation History:") < prompt.index("Document Context:")
+        assert prompt.index("Document Context:") < prompt.index("External Data:")
+        assert prompt.index("External Data:") < prompt.index("Current Question: What now?")
+        # Only the parts after the history change between questions
+        other = pack_rag_prompt("Why?", CHUNKS, API_DATA, HISTORY, 100_000, stable_first=True)
+        assert other[: prompt.index("Current Question:")] == prompt[: prompt.index("Current Question:")]
+
+    def test_stable_first_history_is_a_prefix_of_the_next_turn(self):
+        """Consecutive turns share the history prefix, dropping old messages a block at a time."""
+        conversation = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"Turn {i} " + "delta " * 5, "position": i}
+            for i in range(16)
+        ]
+
+        def history_section(turn_end):
+            # The last ten messages, as the chat router fetches them
+            prompt = pack_rag_prompt("Q?", [], None, conversation[max(0, turn_end - 10):turn_end], 100_000, stable_first=True)
+            return prompt[: prompt.index("Current Question:")].rstrip()
+
+        turns = [history_section(end) for end in (8, 10, 12, 14, 16)]
+        # Turns 10 -> 12 and 14 -> 16 only append; the window moves up a block in between
+        assert turns[2].startswith(turns[1])
+        assert turns[4].startswith(turns[3])
+        assert "Turn 3 " not in turns[1] and "Turn 4 " in turns[2]
+        assert all(h.count("Turn") >= 6 for h in turns)
+
+    def test_small_budget_fills_by_priority(self):
+        """Chunks are packed before history, and history before tool data."""
+        chunk_tokens = estimate_tokens(f"[Source: doc0.txt]\n{CHUNKS[0]['content']}")
+        budget = PROMPT_OVERHEAD_TOKENS + 10 + chunk_tokens * 2 + 60
+
+        prompt = pack_rag_prompt("What now?", CHUNKS, API_DATA, HISTORY, budget)
+
+        assert "Current Question: What now?" in prompt
+        assert "[Source: doc0.txt]" in prompt and "[Source: doc1.txt]" in prompt
+        assert "[Source: doc3.txt]" not in prompt
+        assert "Turn" not in prompt
+        assert "External Data:" not in prompt
+        assert estimate_tokens(prompt) <= budget
+
+    def test_history_keeps_most_recent_messages(self):
+        """When history doesn't all fit, the oldest messages are dropped first."""
+        budget = PROMPT_OVERHEAD_TOKENS + 10 + estimate_tokens("User: " + HISTORY[0]["content"]) * 2 + 5
+
+        prompt = pack_rag_prompt("Q?", [], None, HISTORY, budget)
+
+        assert "Turn 5" in prompt and "Turn 4" in prompt
+        assert "Turn 0" not in prompt
+        assert prompt.index("Turn 4") < prompt.index("Turn 5")
+
+    def test_oversized_tool_data_is_compacted_and_cut(self):
+        """Tool data that doesn't fit as indented JSON is packed compactly, cutting the overflow."""
+        budget = PROMPT_OVERHEAD_TOKENS + 10 + 200
+
+        prompt = pack_rag_prompt("Q?", [], API_DATA, None, budget)
+
+        assert 'External Data:\n"notion": {"results":["page page' in prompt
+        assert TRUNCATION_MARK in prompt
+        assert estimate_tokens(prompt) <= budget
+
+    def test_question_always_included(self):
+        """Even a budget too small for anything else keeps the (truncated) question."""
+        prompt = pack_rag_prompt("Why " * 400, CHUNKS, API_DATA, HISTORY, 10)
+
+        assert "Current Question: Why Why" in prompt
+        assert "Document Context:" not in prompt
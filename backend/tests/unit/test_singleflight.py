@@ -0,0 +1,107 @@
+"""
+Unit tests for single-flight broadcasting of in-flight answers.
+"""
+import asyncio
+
+import pytest
+
+from services.singleflight import SingleFlight
+
+
+async def collect(subscription):
+    events = [event async for event in subscription.events()]
+    await subscription.leave()
+    return events
+
+
+def producer(calls, tokens, delay=0.005, closed=None):
+    async def produce(channel):
+        calls.append(True)
+        try:
+            for token in tokens:
+                await asyncio.sleep(delay)
+                channel.publish(token)
+        finally:
+            if closed is not None:
+                closed.append(True)
+    return produce
+
+
+@pytest.mark.unit
+class TestSingleFlight:
+    """Test suite for SingleFlight and Broadcast."""
+
+    async def test_followers_share_the_leaders_stream(self):
+        """Identical requests run one producer and all receive every event."""
+        flights, calls = SingleFlight(), []
+        produce = producer(calls, ["a", "b", "c"])
+
+        leader = flights.join("q", produce)
+        followers = [flights.join("q", produce) for _ in range(3)]
+
+        results = await asyncio.gather(*(collect(s) for s in [leader] + followers))
+
+        assert calls == [True]
+        assert leader.leader and not any(f.leader for f in followers)
+        assert results == [["a", "b", "c"]] * 4
+        assert flights.stats() == {"leaders": 1, "followers": 3, "abandoned": 0, "inflight": 0}
+
+    async def test_late_follower_replays_earlier_events(self):
+        """A follower joining mid-stream first gets what was already published."""
+        flights, calls = SingleFlight(), []
+        produce = producer(calls, ["a", "b", "c"], delay=0.01)
+
+        leader = flights.join("q", produce)
+        leading = asyncio.create_task(collect(leader))
+        await asyncio.sleep(0.025)
+        follower = flights.join("q", produce)
+
+        assert await collect(follower) == ["a", "b", "c"]
+        assert await leading == ["a", "b", "c"]
+        assert calls == [True]
+
+    async def test_leader_leaving_keeps_followers_streaming(self):
+        """The producer runs while anyone is subscribed and stops when the last one leaves."""
+        flights, calls, closed = SingleFlight(), [], []
+        produce = producer(calls, ["t"] * 1000, closed=closed)
+
+        leader = flights.join("q", produce)
+        follower = flights.join("q", produce)
+        await asyncio.sleep(0.02)
+        assert await leader.leave() is False
+        await asyncio.sleep(0.02)
+
+        assert closed == []
+        assert await follower.leave() is True
+
+        assert closed == [True]
+        assert flights.stats()["abandoned"] == 1
+        # A new request starts a fresh flight rather than joining the stopped one
+        assert flights.join("q", producer(calls, [])).leader is True
+
+    async def test_producer_error_reaches_every_subscriber(self):
+        """An exception in the producer is raised to the leader and followers."""
+        flights = SingleFlight()
+
+        async def failing(channel):
+            channel.publish("partial")
+            await asyncio.sleep(0.005)
+            raise ValueError("upstream failed")
+
+        subscriptions = [flights.join("q", failing) for _ in range(2)]
+
+        for subscription in subscriptions:
+            events = []
+            with pytest.raises(ValueError, match="upstream failed"):
+                async for event in subscription.events():
+                    events.append(event)
+            assert events == ["partial"]
+
+    async def test_finished_flight_is_not_rejoined(self):
+        """Requests after the answer finished start their own flight."""
+        flights, calls = SingleFlight(), []
+
+        assert await collect(flights.join("q", producer(calls, ["a"]))) == ["a"]
+        assert await collect(flights.join("q", producer(calls, ["b"]))) == ["b"]
+        assert calls == [True, True]
+        assert flights.stats()["leaders"] == 2
@@ -0,0 +1,108 @@
+"""
+Unit tests for ToolResultCache.
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from services.tool_cache import ToolResultCache
+
+
+@pytest.fixture
+def cache():
+    return ToolResultCache(ttls={"crypto": 60}, default_ttl=10, stale_seconds=30)
+
+
+@pytest.mark.unit
+class TestToolResultCache:
+    """Test suite for ToolResultCache."""
+
+    async def test_fresh_result_is_served_from_cache(self, cache):
+        """A result within its TTL is returned without calling upstream again."""
+        fetch = AsyncMock(return_value={"price": 1})
+
+        assert await cache.get_or_fetch("crypto", {"symbol": "bitcoin"}, fetch) == {"price": 1}
+        assert await cache.get_or_fetch("crypto", {"symbol": "bitcoin"}, fetch) == {"price": 1}
+
+        fetch.assert_awaited_once()
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    async def test_key_normalizes_string_params(self, cache):
+        """Case and surrounding whitespace don't create separate entries."""
+        fetch = AsyncMock(return_value={"temp": 20})
+
+        await cache.get_or_fetch("weather", {"city": "London"}, fetch)
+        await cache.get_or_fetch("weather", {"city": " london "}, fetch)
+        await cache.get_or_fetch("crypto", {"city": "london"}, fetch)
+
+        assert fetch.await_count == 2
+
+    async def test_stale_result_served_while_refreshing(self, cache):
+        """An expired result inside the stale window is returned and refreshed in the background."""
+        fetch = AsyncMock(side_effect=[{"price": 1}, {"price": 2}])
+
+        with patch("services.tool_cache.time.time", return_value=1000.0):
+            await cache.get_or_fetch("crypto", {"symbol": "bitcoin"}, fetch)
+        with patch("services.tool_cache.time.time", return_value=1070.0):
+            stale = await cache.get_or_fetch("crypto", {"symbol": "bitcoin"}, fetch)
+            await asyncio.sleep(0)
+            fresh = await cache.get_or_fetch("crypto", {"symbol": "bitcoin"}, fetch)
+
+        assert stale == {"price": 1}
+        assert fresh == {"price": 2}
+        assert cache.stats()["stale_hits"] == 1
+        assert fetch.await_count == 2
+
+    async def test_result_past_stale_window_is_refetched(self, cache):
+        """Beyond TTL plus the stale window, callers wait for a new result."""
+        fetch = AsyncMock(side_effect=[{"price": 1}, {"price": 2}])
+
+        with patch("services.tool_cache.time.time", return_value=1000.0):
+            await cache.get_or_fetch("crypto", {"symbol": "bitcoin"}, fetch)
+        with patch("services.tool_cache.time.time", return_value=1100.0):
+            result = await cache.get_or_fetch("crypto", {"symbol": "bitcoin"}, fetch)
+
+        assert result == {"price": 2}
+        assert cache.stats()["misses"] == 2
+
+    async def test_concurrent_requests_share_one_fetch(self, cache):
+        """Identical concurrent requests are coalesced into one upstream call."""
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"stories": [calls]}
+
+        results = await asyncio.gather(*(
+            cache.get_or_fetch("hackernews", {"limit": 10}, fetch) for _ in range(5)
+        ))
+
+        assert calls == 1
+        assert all(r == {"stories": [1]} for r in results)
+        assert cache.stats()["coalesced"] == 4
+        assert cache.stats()["inflight"] == 0
+
+    async def test_caller_timeout_does_not_cancel_shared_fetch(self, cache):
+        """A caller giving up doesn't abort the fetch other callers are waiting on."""
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return {"commits": []}
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(cache.get_or_fetch("github", {"repo": "a/b"}, fetch), 0.01)
+
+        assert await cache.get_or_fetch("github", {"repo": "a/b"}, fetch) == {"commits": []}
+        assert cache.stats()["coalesced"] == 1
+
+    async def test_errors_are_not_cached(self, cache):
+        """Error results and exceptions are returned but never stored."""
+        fetch = AsyncMock(side_effect=[{"error": "rate limited"}, RuntimeError("boom"), {"temp": 20}])
+
+        assert await cache.get_or_fetch("weather", {"city": "Paris"}, fetch) == {"error": "rate limited"}
+        with pytest.raises(RuntimeError):
+            await cache.get_or_fetch("weather", {"city": "Paris"}, fetch)
+        assert await cache.get_or_fetch("weather", {"city": "Paris"}, fetch) == {"temp": 20}
+        assert cache.stats()["entries"] == 1
@@ -0,0 +1,130 @@
+"""
+Unit tests for the vector backends.
+"""
+import numpy as np
+import pytest
+from unittest.mock import Mock, patch
+
+from services.vector_backends import ChromaBackend, NumpyFlatBackend, create_vector_backend
+import services.vector_backends as vector_backends
+
+
+@pytest.fixture
+def flat(tmp_path):
+    return NumpyFlatBackend(str(tmp_path / "flat"))
+
+
+def add_sample(backend):
+    backend.add(
+        ["a", "b", "c"],
+        ["alpha", "beta", "gamma"],
+        [[1.0, 0.0, 0.0], [0.8, 0.6, 0.0], [0.0, 0.0, 2.0]],
+        [{"filename": "one.txt", "chunk_index": 0}, {"filename": "two.txt"}, {"filename": "one.txt"}],
+    )
+
+
+@pytest.mark.unit
+class TestNumpyFlatBackend:
+    """Test suite for NumpyFlatBackend."""
+
+    def test_query_returns_top_k_by_cosine(self, flat):
+        """Results are ordered by cosine similarity and limited to n_results."""
+        add_sample(flat)
+
+        results = flat.query([1.0, 0.0, 0.0], n_results=2)
+
+        assert [r["id"] for r in results] == ["a", "b"]
+        assert results[0]["score"] == pytest.approx(1.0)
+        assert results[1]["score"] == pytest.approx(0.8)
+        assert results[0]["content"] == "alpha"
+        assert results[0]["metadata"] == {"filename": "one.txt", "chunk_index": 0}
+
+    def test_query_applies_file_filters(self, flat):
+        """Filename filters restrict candidates before ranking."""
+        add_sample(flat)
+
+        results = flat.query([1.0, 0.0, 0.0], n_results=5, file_filters=["one.txt"])
+
+        assert [r["id"] for r in results] == ["a", "c"]
+        assert flat.query([1.0, 0.0, 0.0], file_filters=["missing.txt"]) == []
+
+    def test_empty_index(self, flat):
+        """An empty index returns no results."""
+        assert flat.query([1.0, 0.0, 0.0]) == []
+        assert flat.count() == 0
+
+    def test_delete_compacts_and_persists(self, tmp_path, flat):
+        """Deleted chunks disappear and the index reloads from disk."""
+        add_sample(flat)
+
+        flat.delete_filename("one.txt")
+
+        assert flat.count() == 1
+        assert [r["id"] for r in flat.query([1.0, 0.0, 0.0])] == ["b"]
+        assert flat._rows == 1  # two of three rows deleted triggers compaction
+
+        flat.add(["d"], ["delta"], [[0.0, 1.0, 0.0]], [{"filename": "three.txt"}])
+        reopened = NumpyFlatBackend(str(tmp_path / "flat"))
+
+        assert reopened.count() == 2
+        assert sorted(reopened.list_filenames()) == ["three.txt", "two.txt"]
+        assert [r["id"] for r in reopened.query([0.0, 1.0, 0.0], n_results=1)] == ["d"]
+
+    def test_worker_processes_share_index(self, tmp_path, flat):
+        """Backends on the same directory (one per worker) see each other's writes without clashing rows."""
+        other = NumpyFlatBackend(str(tmp_path / "flat"))
+        add_sample(flat)
+
+        other.add(["d"], ["delta"], [[0.0, 1.0, 0.0]], [{"filename": "three.txt"}])
+
+        assert other.count() == 4
+        assert flat.count() == 4
+        assert [r["id"] for r in flat.query([0.0, 1.0, 0.0], n_results=1)] == ["d"]
+
+        other.delete_filename("one.txt")  # Compacts and renumbers the rows
+
+        assert [r["id"] for r in flat.query([1.0, 0.0, 0.0])] == ["b", "d"]
+        flat.add(["e"], ["epsilon"], [[0.0, 0.0, 1.0]], [{"filename": "four.txt"}])
+        assert [r["id"] for r in other.query([0.0, 0.0, 1.0], n_results=1)] == ["e"]
+        assert other.count() == flat.count() == 3
+
+    def test_grows_past_initial_capacity(self, flat):
+        """Adds beyond the preallocated capacity are kept."""
+        n = vector_backends.FLAT_INDEX_MIN_CAPACITY + 10
+        vectors = np.random.default_rng(0).normal(size=(n, 4)).tolist()
+        flat.add([str(i) for i in range(n)], ["x"] * n, vectors, [{"filename": "big.txt"}] * n)
+
+        assert flat.count() == n
+        assert flat.query(vectors[-1], n_results=1)[0]["id"] == str(n - 1)
+
+    def test_float16_storage(self, tmp_path):
+        """Half-precision storage still ranks correctly."""
+        backend = NumpyFlatBackend(str(tmp_path / "flat16"), dtype="float16")
+        add_sample(backend)
+
+        assert backend._matrix.dtype == np.float16
+        assert [r["id"] for r in backend.query([0.0, 0.0, 1.0], n_results=1)] == ["c"]
+
+    def test_get(self, flat):
+        """get returns chunks in the requested order, or all chunks."""
+        add_sample(flat)
+
+        assert [r["id"] for r in flat.get(["c", "a", "zzz"])] == ["c", "a"]
+        assert [r["content"] for r in flat.get()] == ["alpha", "beta", "gamma"]
+
+
+@pytest.mark.unit
+class TestCreateVectorBackend:
+    """Test suite for create_vector_backend."""
+
+    def test_selects_numpy_backend(self, tmp_path):
+        settings = Mock(vector_backend="numpy", numpy_index_dir=str(tmp_path / "flat"), numpy_index_dtype="float32")
+
+        assert isinstance(create_vector_backend(settings), NumpyFlatBackend)
+
+    @patch('services.vector_backends.chromadb.PersistentClient')
+    def test_defaults_to_chroma(self, mock_chroma):
+        settings = Mock(vector_backend="chroma", chroma_persist_dir="/tmp/chroma")
+
+        assert isinstance(create_vector_backend(settings), ChromaBackend)
+        mock_chroma.assert_called_once()
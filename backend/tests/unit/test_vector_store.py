@@ -6,6 +6,28 @@ from unittest.mock import Mock, MagicMock, patch
 import numpy as np
 
 from services.vector_store import VectorStoreService
+from services.embedding_cache import EmbeddingCache
+from services.bm25_index import BM25Index
+
+
+@pytest.fixture(autouse=True)
+def isolated_embedding_cache(tmp_path):
+    """Give every test a fresh on-disk embedding cache."""
+    def make_cache(*args, **kwargs):
+        return EmbeddingCache(str(tmp_path / "embedding_cache.db"))
+
+    with patch('services.vector_store.EmbeddingCache', side_effect=make_cache):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_lexical_index(tmp_path):
+    """Give every test a fresh on-disk BM25 index."""
+    def make_index(*args, **kwargs):
+        return BM25Index(str(tmp_path / "bm25_index.db"))
+
+    with patch('services.vector_store.BM25Index', side_effect=make_index):
+        yield
 
 
 @pytest.mark.unit
@@ -14,7 +36,7 @@ class TestVectorStoreService:
 
     @patch('services.vector_store.get_settings')
     @patch('sentence_transformers.SentenceTransformer')
-    @patch('services.vector_store.chromadb.PersistentClient')
+    @patch('services.vector_backends.chromadb.PersistentClient')
     def test_init(self, mock_chroma, mock_transformer, mock_settings):
         """Test VectorStoreService initialization."""
         mock_settings.return_value.chroma_persist_dir = "/tmp/chroma"
@@ -27,15 +49,15 @@ class TestVectorStoreService:
 
         service = VectorStoreService()
 
-        assert service.client == mock_client
-        assert service.collection == mock_collection
+        assert service.backend.client == mock_client
+        assert service.backend.collection == mock_collection
         assert service.embedding_model is None  # Lazy loading - not loaded yet
         assert service.embedding_model_name == "test-model"
         mock_chroma.assert_called_once()
         # SentenceTransformer should NOT be called during init (lazy loading)
         mock_transformer.assert_not_called()
 
-    @patch('services.vector_store.chromadb.PersistentClient')
+    @patch('services.vector_backends.chromadb.PersistentClient')
     @patch('sentence_transformers.SentenceTransformer')
     @patch('services.vector_store.get_settings')
     def test_add_documents(self, mock_settings, mock_transformer, mock_chroma):
@@ -72,7 +94,7 @@ class TestVectorStoreService:
         assert len(call_args["ids"]) == 2
         assert len(call_args["embeddings"]) == 2
 
-    @patch('services.vector_store.chromadb.PersistentClient')
+    @patch('services.vector_backends.chromadb.PersistentClient')
     @patch('sentence_transformers.SentenceTransformer')
     @patch('services.vector_store.get_settings')
     def test_search(self, mock_settings, mock_transformer, mock_chroma):
@@ -109,7 +131,7 @@ class TestVectorStoreService:
         mock_model.encode.assert_called_once_with(["test query"])
         mock_collection.query.assert_called_once()
 
-    @patch('services.vector_store.chromadb.PersistentClient')
+    @patch('services.vector_backends.chromadb.PersistentClient')
     @patch('sentence_transformers.SentenceTransformer')
     @patch('services.vector_store.get_settings')
     def test_delete_document(self, mock_settings, mock_transformer, mock_chroma):
@@ -127,7 +149,7 @@ class TestVectorStoreService:
 
         mock_collection.delete.assert_called_once_with(where={"filename": "test.txt"})
 
-    @patch('services.vector_store.chromadb.PersistentClient')
+    @patch('services.vector_backends.chromadb.PersistentClient')
     @patch('sentence_transformers.SentenceTransformer')
     @patch('services.vector_store.get_settings')
     def test_list_documents(self, mock_settings, mock_transformer, mock_chroma):
@@ -160,7 +182,7 @@ class TestVectorStoreService:
 
         mock_collection.get.assert_called_once_with(include=["metadatas"])
 
-    @patch('services.vector_store.chromadb.PersistentClient')
+    @patch('services.vector_backends.chromadb.PersistentClient')
     @patch('sentence_transformers.SentenceTransformer')
     @patch('services.vector_store.get_settings')
     def test_list_documents_empty(self, mock_settings, mock_transformer, mock_chroma):
@@ -182,7 +204,7 @@ class TestVectorStoreService:
 
     @patch('services.vector_store.get_settings')
     @patch('sentence_transformers.SentenceTransformer')
-    @patch('services.vector_store.chromadb.PersistentClient')
+    @patch('services.vector_backends.chromadb.PersistentClient')
     def test_reload_embedding_model(self, mock_chroma, mock_transformer, mock_settings):
         """Test reloading embedding model."""
         mock_settings.return_value.chroma_persist_dir = "/tmp/chroma"
@@ -204,7 +226,7 @@ class TestVectorStoreService:
         assert mock_transformer.call_count == 1
         mock_transformer.assert_called_with("new-model")
 
-    @patch('services.vector_store.chromadb.PersistentClient')
+    @patch('services.vector_backends.chromadb.PersistentClient')
     @patch('sentence_transformers.SentenceTransformer')
     @patch('services.vector_store.get_settings')
     def test_search_no_results(self, mock_settings, mock_transformer, mock_chroma):
@@ -232,3 +254,102 @@ class TestVectorStoreService:
         results = service.search("test query")
 
         assert results == []
+
+    @patch('services.vector_backends.chromadb.PersistentClient')
+    @patch('sentence_transformers.SentenceTransformer')
+    @patch('services.vector_store.get_settings')
+    def test_add_documents_reuses_cached_embeddings(self, mock_settings, mock_transformer, mock_chroma):
+        """Test repeated chunks and queries are served from the embedding cache."""
+        mock_settings.return_value.chroma_persist_dir = "/tmp/chroma"
+        mock_settings.return_value.embedding_model = "test-model"
+
+        mock_client = Mock()
+        mock_collection = Mock()
+        mock_client.get_or_create_collection.return_value = mock_collection
+        mock_chroma.return_value = mock_client
+
+        mock_model = Mock()
+        mock_model.encode.side_effect = lambda texts: np.array([[float(len(t)), 0.5] for t in texts])
+        mock_transformer.return_value = mock_model
+
+        service = VectorStoreService()
+        service.add_documents(["Disclaimer text", "Body one"], [{"filename": "a.txt"}] * 2)
+        service.add_documents(["Disclaimer  text", "Body two"], [{"filename": "b.txt"}] * 2)
+
+        # Only the new chunk is encoded; whitespace differences hit the cache
+        assert mock_model.encode.call_args_list[-1][0][0] == ["Body two"]
+        embeddings = mock_collection.add.call_args[1]["embeddings"]
+        assert embeddings[0] == [15.0, 0.5]
+
+        mock_collection.query.return_value = {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+        service.search("Body one")
+        assert mock_model.encode.call_count == 2
+
+    @patch('services.vector_backends.chromadb.PersistentClient')
+    @patch('sentence_transformers.SentenceTransformer')
+    @patch('services.vector_store.get_settings')
+    def test_hybrid_search_finds_exact_terms(self, mock_settings, mock_transformer, mock_chroma):
+        """Test hybrid search fuses keyword matches with vector results."""
+        mock_settings.return_value.chroma_persist_dir = "/tmp/chroma"
+        mock_settings.return_value.embedding_model = "test-model"
+        mock_settings.return_value.retrieval_mode = "hybrid"
+        mock_settings.return_value.hybrid_candidates = 10
+
+        mock_client = Mock()
+        mock_collection = Mock()
+        mock_client.get_or_create_collection.return_value = mock_collection
+        mock_chroma.return_value = mock_client
+
+        mock_model = Mock()
+        mock_model.encode.side_effect = lambda texts: np.array([[0.1, 0.2] for _ in texts])
+        mock_transformer.return_value = mock_model
+
+        service = VectorStoreService()
+        chunks = ["Restart the service to recover.", "Error ERR-1042 means the disk is full."]
+        metadata = [{"filename": "ops.txt"}, {"filename": "errors.txt"}]
+        service.add_documents(chunks, metadata)
+        ids = mock_collection.add.call_args[1]["ids"]
+        stored = dict(zip(ids, zip(chunks, metadata)))
+
+        # The vector retriever only surfaces the semantically close chunk
+        mock_collection.query.return_value = {
+            "ids": [[ids[0]]],
+            "documents": [[chunks[0]]],
+            "metadatas": [[metadata[0]]],
+            "distances": [[0.3]]
+        }
+        mock_collection.get.side_effect = lambda ids, include: {
+            "ids": ids,
+            "documents": [stored[i][0] for i in ids],
+            "metadatas": [stored[i][1] for i in ids],
+        }
+
+        results = service.search("what does err-1042 mean", n_results=2)
+
+        assert {r["content"] for r in results} == set(chunks)
+        assert mock_collection.query.call_args[1]["n_results"] == 10
+
+        vector_only = service.search("what does err-1042 mean", n_results=2, mode="vector")
+        assert [r["content"] for r in vector_only] == [chunks[0]]
+
+    @patch('services.vector_backends.chromadb.PersistentClient')
+    @patch('sentence_transformers.SentenceTransformer')
+    @patch('services.vector_store.get_settings')
+    def test_delete_document_removes_lexical_entries(self, mock_settings, mock_transformer, mock_chroma):
+        """Test deleting a document drops its chunks from the BM25 index."""
+        mock_settings.return_value.chroma_persist_dir = "/tmp/chroma"
+        mock_settings.return_value.embedding_model = "test-model"
+
+        mock_client = Mock()
+        mock_collection = Mock()
+        mock_collection.count.return_value = 1
+        mock_client.get_or_create_collection.return_value = mock_collection
+        mock_chroma.return_value = mock_client
+
+        service = VectorStoreService()
+        service.add_documents(["Invoice INV-77 is overdue."], [{"filename": "billing.txt"}], embeddings=[[0.1]])
+        assert service.lexical_index.search("INV-77")
+
+        service.delete_document("billing.txt")
+
+        assert service.lexical_index.search("INV-77") == []
@@ -173,7 +173,7 @@ export function LLMProviderSelector({ onSave }) {
         throw new Error(error.detail || 'Failed to save settings');
       }
 
-      setStatus({ type: 'success', message: 'Settings saved! Restart backend to apply.' });
+      setStatus({ type: 'success', message: 'Settings saved and applied.' });
       if (onSave) onSave();
     } catch (error) {
       setStatus({ type: 'error', message: error.message });
@@ -1,6 +1,6 @@
 import { useState, useRef, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { Send, Loader2, Sparkles, SlidersHorizontal, Plus } from 'lucide-react';
+import { Send, Square, Loader2, Sparkles, SlidersHorizontal, Plus } from 'lucide-react';
 import { Button } from '../components/ui/Button';
 import { Input } from '../components/ui/Input';
 import { ChatMessage } from '../components/ui/ChatMessage';
@@ -186,6 +186,13 @@ export default function ChatPage() {
         }
     };
 
+    const handleStop = () => {
+        // The server stops generating and replies with an 'end' frame marked cancelled
+        if (wsRef.current?.readyState === WebSocket.OPEN) {
+            wsRef.current.send(JSON.stringify({ type: 'cancel' }));
+        }
+    };
+
     const startNewChat = () => {
         setMessages([]);
         setError(null);
@@ -385,9 +392,15 @@ export default function ChatPage() {
                             onKeyDown={e => e.key === 'Enter' && handleSend()}
                             autoFocus
                         />
-                        <Button size="icon" onClick={handleSend} disabled={isLoading || !input.trim()} className="rounded-lg">
-                            <Send size={18} />
-                        </Button>
+                        {isLoading ? (
+                            <Button size="icon" onClick={handleStop} className="rounded-lg" title="Stop generating">
+                                <Square size={16} />
+                            </Button>
+                        ) : (
+                            <Button size="icon" onClick={handleSend} disabled={!input.trim()} className="rounded-lg">
+                                <Send size={18} />
+                            </Button>
+                        )}
                     </div>
                 </div>
             </div>
@@ -1,6 +1,6 @@
 import { useState } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
-import { uploadDocument, listDocuments, deleteDocument } from '../utils/api';
+import { uploadDocument, getIngestionJob, listDocuments, deleteDocument } from '../utils/api';
 import { Card, CardHeader, CardTitle, CardContent } from '../components/ui/Card';
 import { Button } from '../components/ui/Button';
 import { Upload, FileText, Trash2, Loader2, CheckCircle, X, File } from 'lucide-react';
@@ -35,7 +35,18 @@ export default function DocumentsPage() {
         setUploading(true);
         try {
             const res = await uploadDocument(previewFile);
-            setUploadStatus({ type: 'success', message: `Indexed ${res.data.filename} (${res.data.chunks_created} chunks)` });
+            // Ingestion runs in the background; poll the job until it finishes
+            let job = (await getIngestionJob(res.data.job_id)).data;
+            while (job.status === 'queued' || job.status === 'running') {
+                setUploadStatus({ type: 'success', message: `Processing ${job.filename}: ${job.stage} (${Math.round(job.progress * 100)}%)` });
+                await new Promise((resolve) => setTimeout(resolve, 1000));
+                job = (await getIngestionJob(res.data.job_id)).data;
+            }
+            if (job.status === 'failed') {
+                setUploadStatus({ type: 'error', message: job.error || 'Upload failed' });
+                return;
+            }
+            setUploadStatus({ type: 'success', message: `Indexed ${job.filename} (${job.chunks_created} chunks)` });
             queryClient.invalidateQueries(['documents']);
             setPreviewFile(null);
         } catch (err) {
@@ -15,6 +15,7 @@ export const uploadDocument = async (file) => {
   });
 };
 
+export const getIngestionJob = (jobId) => api.get(`/api/documents/jobs/${jobId}`);
 export const listDocuments = () => api.get('/api/documents/list');
 export const deleteDocument = (filename) => api.delete(`/api/documents/${filename}`);
 
@@ -0,0 +1,131 @@
+"""Benchmark ConversationService throughput.
+
+Compares the original per-call ``sqlite3.connect`` with a rollback journal
+("before") against the pooled WAL connections ("after"), and against those
+with write-behind message persistence ("write-behind"). One op is a chat
+turn: get_history plus two add_message calls. The concurrent run adds reader
+threads listing conversations while writers add turns.
+
+Usage: python scripts/bench_conversations.py [--turns 2000] [--threads 4]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from services.conversation_service import ConversationService  # noqa: E402
+
+
+class WriteBehindService(ConversationService):
+    """Pooled connections with add_message buffered and flushed in batches"""
+
+    def __init__(self, db_path: str):
+        super().__init__(db_path=db_path)
+        self.start_write_behind()
+
+
+class PerCallConnectionService(ConversationService):
+    """The pre-pooling behaviour: a fresh default-journal connection per call"""
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def close(self):
+        pass
+
+
+def make_service(cls, directory: str) -> ConversationService:
+    db_path = os.path.join(directory, f"{cls.__name__}.db")
+    if cls is PerCallConnectionService:
+        # Journal mode is persistent; make sure the baseline runs in rollback mode
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("PRAGMA journal_mode = DELETE")
+    return cls(db_path=db_path)
+
+
+def chat_turns(service: ConversationService, conversation_ids, turns: int):
+    for i in range(turns):
+        conversation_id = conversation_ids[i % len(conversation_ids)]
+        service.get_history(conversation_id, limit=10)
+        service.add_message(conversation_id, "user", f"Question {i} about the knowledge base")
+        service.add_message(conversation_id, "assistant", f"Answer {i} " + "lorem ipsum " * 40)
+
+
+def run_serial(service: ConversationService, turns: int) -> float:
+    conversation_ids = [service.create_conversation() for _ in range(50)]
+    started = time.perf_counter()
+    chat_turns(service, conversation_ids, turns)
+    return turns / (time.perf_counter() - started)
+
+
+def run_concurrent(service: ConversationService, turns: int, threads: int) -> float:
+    conversation_ids = [service.create_conversation() for _ in range(50)]
+    per_thread = turns // threads
+    stop = threading.Event()
+    reads = [0]
+
+    def reader():
+        while not stop.is_set():
+            service.list_conversations(limit=50)
+            reads[0] += 1
+
+    writers = [
+        threading.Thread(target=chat_turns, args=(service, conversation_ids, per_thread))
+        for _ in range(threads)
+    ]
+    readers = [threading.Thread(target=reader) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in writers + readers:
+        t.start()
+    for t in writers:
+        t.join()
+    stop.set()
+    for t in readers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return (per_thread * threads + reads[0]) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_conversations_")
+    try:
+        print(f"{'':<14}{'serial turns/s':>18}{'concurrent ops/s':>20}")
+        results = {}
+        runs = (
+            ("before", PerCallConnectionService),
+            ("after", ConversationService),
+            ("write-behind", WriteBehindService),
+        )
+        for label, cls in runs:
+            serial_service = make_service(cls, directory)
+            serial = run_serial(serial_service, args.turns)
+            serial_service.close()
+            concurrent_service = make_service(cls, tempfile.mkdtemp(dir=directory))
+            concurrent = run_concurrent(concurrent_service, args.turns, args.threads)
+            concurrent_service.close()
+            results[label] = (serial, concurrent)
+            print(f"{label:<14}{serial:>18,.0f}{concurrent:>20,.0f}")
+
+        before = results["before"]
+        for label in ("after", "write-behind"):
+            after = results[label]
+            print(f"{'vs before':<14}{after[0] / before[0]:>17.1f}x{after[1] / before[1]:>19.1f}x  ({label})")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()